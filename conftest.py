@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Shared fixtures for the PRISM round-trip tests
+Writes small synthetic archives laid out like the real daily zips
+"""
+
+import zipfile
+import numpy as np
+import pytest
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import Iterable
+
+NROWS, NCOLS = 621, 1405
+HEADER = ("BYTEORDER      I\nLAYOUT         BIL\nNROWS          621\nNCOLS          1405\n"
+          "NBANDS         1\nNBITS          32\nPIXELTYPE      FLOAT\nULXMAP         -125\n"
+          "ULYMAP         49.9166666666687\nXDIM           0.0416666666667\n"
+          "YDIM           0.0416666666667\nNODATA         {nodata}\n")
+
+
+def day_values(day: int) -> np.ndarray:
+    """Expected float32 grid of day number `day` (NaN outside the land ellipse)"""
+    yy, xx = np.mgrid[0:NROWS, 0:NCOLS]
+    land = ((xx - 700) ** 2 / 700 ** 2 + (yy - 310) ** 2 / 330 ** 2) < 1
+    data = np.round(10 * np.sin(day / 30.0) + yy * 0.0005 + xx * 0.0001, 2).astype('float32')
+    data[~land] = np.nan
+    return data
+
+
+def write_day(directory: Path, variable: str, date: datetime, values: np.ndarray,
+              nodata: float = -9999.0) -> Path:
+    """Write one PRISM daily BIL zip"""
+    stem = f"PRISM_{variable}_stable_4kmD2_{date:%Y%m%d}_bil"
+    data = np.where(np.isnan(values), nodata, values).astype('<f4')
+    valid = values[~np.isnan(values)]
+    path = directory / f"{stem}.zip"
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(f"{stem}.bil", data.tobytes())
+        zf.writestr(f"{stem}.hdr", HEADER.format(nodata=f"{nodata:g}"))
+        zf.writestr(f"{stem}.prj", 'GEOGCS["NAD83"]')
+        zf.writestr(f"{stem}.stx", f"1 {valid.min():.4f} {valid.max():.4f} "
+                                   f"{valid.mean():.4f} {valid.std():.4f}\n")
+    return path
+
+
+def write_archive(root: Path, variable: str, start: datetime, n_days: int,
+                  skip: Iterable[int] = ()) -> Path:
+    """Write n_days daily zips of one variable under root/variable, leaving out `skip`"""
+    directory = Path(root) / variable
+    directory.mkdir(parents=True, exist_ok=True)
+    for day in range(n_days):
+        if day not in skip:
+            write_day(directory, variable, start + timedelta(days=day), day_values(day))
+    return directory
+
+
+# 1981-12-01 .. 1982-01-14; tmin lacks 1981-12-15 and 1982-01-03
+START = datetime(1981, 12, 1)
+N_DAYS = 45
+TMIN_GAPS = (14, 33)
+
+
+@pytest.fixture(scope='session')
+def prism_archive(tmp_path_factory) -> Path:
+    """Read-only archive with tmin (two gaps) and tmax (complete) subdirectories"""
+    root = tmp_path_factory.mktemp('prism_daily')
+    write_archive(root, 'tmin', START, N_DAYS, skip=TMIN_GAPS)
+    write_archive(root, 'tmax', START, N_DAYS)
+    return root
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 """
-Convert all PRISM temperature data (1981-2000) to Zarr stores
+Convert all PRISM temperature data (1981-2000) to a single Zarr store
 """
 
 from pathlib import Path
@@ -8,6 +8,7 @@ from datetime import datetime
 import logging
 import sys
 from prism_to_zarr import PRISMToZarrConverter
+from prism_catalog import PRISMFileCatalog
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -35,17 +36,22 @@ def main():
     # Initialize converter with time-optimized chunking
     converter = PRISMToZarrConverter(resolution='4km', chunk_strategy='time_optimized')
 
+    # Persistent catalog of the raw archive (only new files are parsed)
+    catalog = PRISMFileCatalog(input_base / "prism_catalog.sqlite")
+    catalog.update(input_base)
+
     # Variables to process
     variables = ['tmin', 'tmax', 'tmean']
 
-    # Check if we should clean existing stores
-    for variable in variables:
-        output_zarr = output_base / f"{variable}_1981_2000.zarr"
-        if output_zarr.exists():
-            logger.warning(f"Removing existing Zarr store: {output_zarr}")
-            import shutil
-            shutil.rmtree(output_zarr)
+    # All variables go into one store with shared coordinates
+    output_zarr = output_base / "prism_temp_1981_2000.zarr"
 
+    # An existing store is resumed from its checkpoint: a partially appended
+    # batch is rolled back and dates already converted are skipped
+    if output_zarr.exists():
+        logger.info(f"Resuming existing Zarr store: {output_zarr}")
+
+    available = []
     for variable in variables:
         var_dir = input_base / variable
 
@@ -54,49 +60,54 @@ def main():
             continue
 
         # Count available files
-        zip_files = list(var_dir.glob("*.zip"))
+        zip_files = catalog.lookup(variable, start_date, end_date)
         logger.info(f"Found {len(zip_files)} files for {variable}")
 
         if not zip_files:
             logger.warning(f"No zip files found for {variable}, skipping")
             continue
 
-        # Output zarr path
-        output_zarr = output_base / f"{variable}_1981_2000.zarr"
-
-        print(f"\n{'='*70}")
-        print(f"Processing {variable.upper()}")
-        print(f"Input: {var_dir}")
-        print(f"Output: {output_zarr}")
-        print(f"{'='*70}")
-
-        try:
-            # Process the entire time series
-            converter.process_time_series(
-                var_dir,
-                variable,
-                start_date,
-                end_date,
-                output_zarr,
-                batch_days=365  # Process one year at a time
-            )
-
-            # Get info about the created store
-            if output_zarr.exists():
-                info = converter.get_zarr_info(output_zarr)
-                print(f"\n✓ Successfully created {variable} Zarr store:")
-                print(f"  - Dimensions: {info['dimensions']}")
-                print(f"  - Time range: {info['time_range'][0]} to {info['time_range'][1]}")
-                print(f"  - Size: {info['size_mb']:.2f} MB")
-                print(f"  - Chunks: {info['chunks'].get(variable, 'N/A')}")
-
-        except Exception as e:
-            logger.error(f"Error processing {variable}: {e}")
-            continue
+        available.append(variable)
+
+    if not available:
+        print("No temperature data found. Please run download scripts first.")
+        return
+
+    print(f"\n{'='*70}")
+    print(f"Processing {', '.join(v.upper() for v in available)}")
+    print(f"Input: {input_base}")
+    print(f"Output: {output_zarr}")
+    print(f"{'='*70}")
+
+    try:
+        # Process the entire time series, reading every variable per date in one pass
+        converter.process_time_series(
+            input_base,
+            available,
+            start_date,
+            end_date,
+            output_zarr,
+            batch_days=365,  # Process one year at a time
+            catalog=catalog
+        )
+
+        # Get info about the created store
+        if output_zarr.exists():
+            info = converter.get_zarr_info(output_zarr)
+            print(f"\n✓ Successfully created Zarr store:")
+            print(f"  - Variables: {info['variables']}")
+            print(f"  - Dimensions: {info['dimensions']}")
+            print(f"  - Time range: {info['time_range'][0]} to {info['time_range'][1]}")
+            print(f"  - Size: {info['size_mb']:.2f} MB")
+            for variable in available:
+                print(f"  - Chunks ({variable}): {info['chunks'].get(variable, 'N/A')}")
+
+    except Exception as e:
+        logger.error(f"Error processing {', '.join(available)}: {e}")
 
     print(f"\n{'='*70}")
     print("Conversion complete!")
-    print(f"Zarr stores created in: {output_base}")
+    print(f"Zarr store created in: {output_base}")
     print(f"{'='*70}")
 
 
@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""
+PRISM Temporal Aggregates
+Monthly and annual statistics accumulated from the daily data while it is
+converted, written to sibling Zarr stores
+"""
+
+import calendar
+import numpy as np
+import xarray as xr
+import zarr
+from pathlib import Path
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+import logging
+from prism_manifest import PRISMChunkManifest
+from prism_storage import Location, as_location, is_remote, store_exists, store_name, with_name
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def aggregate_path(zarr_path: Location, frequency: str) -> Location:
+    """
+    Sibling store holding the aggregates of a daily store
+
+    Parameters:
+    -----------
+    zarr_path : Location
+        Daily Zarr store path or URL
+    frequency : str
+        'monthly' or 'annual'
+
+    Returns:
+    --------
+    Location: e.g. tmin_1981_2000_monthly.zarr next to tmin_1981_2000.zarr
+    """
+    zarr_path = as_location(zarr_path)
+    name = Path(store_name(zarr_path))
+    return with_name(zarr_path, f"{name.stem}_{frequency}{name.suffix}")
+
+
+class PRISMAggregator:
+    """
+    Accumulates monthly and annual statistics of daily PRISM grids
+
+    Batches (or regions) are folded day by day into per-period running
+    sums, valid-day counts, minima and maxima, so the daily data is only
+    read once. A period is written as soon as all its days have been seen.
+    Periods still incomplete at the end of a run (at the ends of the axis,
+    across an append or next to regions written by an earlier run) are
+    recomputed from the daily store by finish().
+
+    Every aggregate store has one period per time chunk (so parallel
+    writers never share a chunk) and the daily store's spatial chunks.
+    Variables are '<variable>_<statistic>', plus a '<variable>_days'
+    coordinate counting the days with data in each period.
+    """
+
+    FREQUENCIES = ('monthly', 'annual')
+    STATISTICS = ('mean', 'min', 'max')
+    SUM_VARIABLES = ('ppt',)
+
+    def __init__(self, converter, output_zarr: Location, variables: List[str],
+                 frequencies: Tuple[str, ...] = FREQUENCIES):
+        """
+        Initialize aggregator
+
+        Parameters:
+        -----------
+        converter : PRISMToZarrConverter
+            Converter writing the daily store (grid, chunks and codecs)
+        output_zarr : Location
+            Daily Zarr store path or URL
+        variables : List[str]
+            Variable names
+        frequencies : Tuple[str, ...]
+            Aggregation periods ('monthly', 'annual')
+        """
+        unknown = [frequency for frequency in frequencies if frequency not in self.FREQUENCIES]
+        if unknown:
+            raise ValueError(f"Unknown aggregate frequencies: {', '.join(unknown)}")
+
+        self.converter = converter
+        self.output_zarr = as_location(output_zarr)
+        self.variables = list(variables)
+        self.frequencies = tuple(frequencies)
+        self.origin = {}
+
+        # Open periods: (frequency, variable, key) -> running statistics
+        self.partials = {}
+        # Periods to recompute from the daily store in finish()
+        self.stale = set()
+        # Days with data of written periods: (frequency, variable, key) -> count
+        self.days = {}
+
+    def statistics(self, variable: str) -> List[str]:
+        """Statistics stored for a variable"""
+        return list(self.STATISTICS) + (['sum'] if variable in self.SUM_VARIABLES else [])
+
+    def period_key(self, date: datetime, frequency: str) -> Tuple[int, ...]:
+        """(year, month) of a monthly period, (year,) of an annual one"""
+        return (date.year, date.month) if frequency == 'monthly' else (date.year,)
+
+    def period_length(self, key: Tuple[int, ...]) -> int:
+        """Number of calendar days in a period"""
+        if len(key) == 2:
+            return calendar.monthrange(*key)[1]
+        return 366 if calendar.isleap(key[0]) else 365
+
+    def period_start(self, key: Tuple[int, ...]) -> datetime:
+        """First day of a period"""
+        return datetime(key[0], key[1] if len(key) == 2 else 1, 1)
+
+    def period_index(self, key: Tuple[int, ...], frequency: str) -> int:
+        """Index of a period in its aggregate store"""
+        origin = self.origin[frequency]
+        if frequency == 'monthly':
+            return (key[0] - origin[0]) * 12 + key[1] - origin[1]
+        return key[0] - origin[0]
+
+    def period_keys(self, first: datetime, last: datetime, frequency: str) -> List[Tuple[int, ...]]:
+        """Keys of all periods from the one holding first to the one holding last"""
+        if frequency == 'annual':
+            return [(year,) for year in range(first.year, last.year + 1)]
+        return [(year, month)
+                for year in range(first.year, last.year + 1)
+                for month in range(1, 13)
+                if (first.year, first.month) <= (year, month) <= (last.year, last.month)]
+
+    def create_template(self, keys: List[Tuple[int, ...]], frequency: str) -> xr.Dataset:
+        """
+        Lazy, NaN-filled aggregate dataset for a list of periods
+
+        Parameters:
+        -----------
+        keys : List[Tuple[int, ...]]
+            Period keys in order
+        frequency : str
+            'monthly' or 'annual'
+
+        Returns:
+        --------
+        xr.Dataset: Dask-backed dataset (nothing is computed on write)
+        """
+        import dask.array as dsa
+
+        converter = self.converter
+        shape = (len(keys), len(converter.lat), len(converter.lon))
+        spatial = converter.chunk_config
+        chunks = (1, min(spatial['lat'], shape[1]), min(spatial['lon'], shape[2]))
+
+        ds = xr.Dataset(coords={'time': [self.period_start(key) for key in keys],
+                                'lat': converter.lat, 'lon': converter.lon})
+        for variable in self.variables:
+            info = converter.VARIABLE_INFO.get(variable, {})
+            for statistic in self.statistics(variable):
+                attrs = dict(info, cell_methods=f"time: {statistic}",
+                             long_name=f"{frequency.capitalize()} {statistic} of "
+                                       f"{info.get('long_name', variable)}")
+                ds[f"{variable}_{statistic}"] = (('time', 'lat', 'lon'),
+                                                 dsa.full(shape, np.nan, dtype='float32', chunks=chunks),
+                                                 attrs)
+            ds.coords[f"{variable}_days"] = ('time', np.zeros(len(keys), dtype='int16'),
+                                             {'long_name': f"Days with {variable} data in the period"})
+        converter.set_attributes(ds)
+        ds.attrs.update(frequency=frequency, daily_store=store_name(self.output_zarr))
+        return ds
+
+    def store(self, location: Location, read_only: bool = False):
+        """zarr store (or path string) of the daily or an aggregate store"""
+        return self.converter.zarr_store(location, read_only)
+
+    def exists(self, location: Location) -> bool:
+        """Whether a store exists"""
+        return store_exists(location, self.converter.store_options(location))
+
+    def encoding(self) -> Dict[str, Dict]:
+        """Encoding of the aggregate variables (the daily store's codecs, unpacked)"""
+        encoding = {}
+        for variable in self.variables:
+            try:
+                codecs = self.converter.codec_encoding(variable, 'float32')
+            except ValueError:
+                # Delta pipelines only apply to packed integers
+                codecs = {}
+            for statistic in self.statistics(variable):
+                encoding[f"{variable}_{statistic}"] = dict(codecs)
+        return encoding
+
+    def initialize(self, dates: List[Optional[datetime]], overwrite: bool = False) -> None:
+        """
+        Create the aggregate stores, or extend them to cover new dates
+
+        Aggregate stores created for a daily store that already holds
+        earlier days start at its first day; those periods are filled by
+        finish().
+
+        Parameters:
+        -----------
+        dates : List[Optional[datetime]]
+            Dates of the daily axis written by this run (None for padding)
+        overwrite : bool
+            Replace existing aggregate stores (the daily store is new)
+        """
+        real = [date for date in dates if date is not None]
+        first, last = real[0], real[-1]
+
+        backfill = None
+        if not overwrite and self.exists(self.output_zarr):
+            daily = xr.open_zarr(self.store(self.output_zarr, read_only=True))
+            start = daily.indexes['time'][0]
+            daily.close()
+            if datetime(start.year, start.month, start.day) < first:
+                backfill = datetime(start.year, start.month, start.day)
+
+        for frequency in self.frequencies:
+            path = aggregate_path(self.output_zarr, frequency)
+            if self.exists(path) and not overwrite:
+                existing = xr.open_zarr(self.store(path, read_only=True))
+                start = existing.indexes['time'][0]
+                n_periods = existing.sizes['time']
+                missing = [name for name in self.variables if f"{name}_days" not in existing.coords]
+                existing.close()
+                if missing:
+                    raise ValueError(f"Aggregate store {path} has no {', '.join(missing)}; "
+                                     f"remove it to rebuild")
+
+                self.origin[frequency] = self.period_key(start, frequency)
+                keys = self.period_keys(self.period_start(self.origin[frequency]), last, frequency)
+                if len(keys) > n_periods:
+                    self.create_template(keys[n_periods:], frequency).to_zarr(
+                        self.store(path), mode='a', append_dim='time')
+                    zarr.consolidate_metadata(self.store(path))
+                continue
+
+            keys = self.period_keys(backfill or first, last, frequency)
+            self.origin[frequency] = keys[0]
+            if backfill:
+                # Periods of days converted before aggregates were requested
+                self.stale.update((frequency, variable, key)
+                                  for key in self.period_keys(backfill, first, frequency)
+                                  for variable in self.variables)
+            logger.info(f"Creating {frequency} aggregate store {path} ({len(keys)} periods)")
+            self.create_template(keys, frequency).to_zarr(self.store(path), mode='w',
+                                                          encoding=self.encoding(), compute=False)
+            zarr.consolidate_metadata(self.store(path))
+
+    def max_partials(self) -> int:
+        """
+        Open periods held at once: per frequency and variable, the period
+        cut by the start of the batches (or region) and the current one
+        """
+        return 2 * len(self.frequencies) * len(self.variables)
+
+    def memory(self) -> int:
+        """
+        Bytes held by open periods (max_partials of them), plus the one
+        being written
+
+        Returns:
+        --------
+        int: Estimated bytes
+        """
+        grid = len(self.converter.lat) * len(self.converter.lon)
+        # float64 sum, int16 count, float32 min and max; float64 mean while writing
+        return (self.max_partials() + 1) * grid * 18 + grid * 8
+
+    def new_partial(self) -> Dict:
+        """Empty running statistics of one period"""
+        shape = (len(self.converter.lat), len(self.converter.lon))
+        return {'sum': np.zeros(shape, dtype='float64'), 'count': np.zeros(shape, dtype='int16'),
+                'min': np.full(shape, np.nan, dtype='float32'),
+                'max': np.full(shape, np.nan, dtype='float32'),
+                'covered': 0, 'available': 0}
+
+    def fold_day(self, partial: Dict, day: np.ndarray, available: bool) -> None:
+        """Fold one day (NaN for nodata) into running statistics"""
+        partial['covered'] += 1
+        if not available:
+            return
+        partial['available'] += 1
+        valid = ~np.isnan(day)
+        np.add(partial['sum'], day, out=partial['sum'], where=valid)
+        partial['count'] += valid
+        np.fmin(partial['min'], day, out=partial['min'])
+        np.fmax(partial['max'], day, out=partial['max'])
+
+    def add(self, variable: str, data: np.ndarray, dates: List[Optional[datetime]],
+            available: np.ndarray) -> None:
+        """
+        Fold a batch of days of one variable into the open periods, writing
+        each period as soon as its last day is folded in
+
+        Parameters:
+        -----------
+        variable : str
+            Variable name
+        data : np.ndarray
+            (time, lat, lon) float32 batch, NaN for nodata
+        dates : List[Optional[datetime]]
+            Date of every step (None for calendar padding, which is skipped)
+        available : np.ndarray
+            Per-day mask of the days read
+        """
+        for i, date in enumerate(dates):
+            if date is None:
+                continue
+            for frequency in self.frequencies:
+                key = (frequency, variable, self.period_key(date, frequency))
+                if key not in self.partials:
+                    self.partials[key] = self.new_partial()
+                self.fold_day(self.partials[key], data[i], bool(available[i]))
+                if self.partials[key]['covered'] >= self.period_length(key[2]):
+                    self.write_period(*key, self.partials.pop(key))
+
+    def merge(self, partials: Dict, days: Dict) -> None:
+        """
+        Merge the output of take_partials() from another aggregator
+
+        Periods that would take the open periods past max_partials are
+        recomputed from the daily store by finish() instead of held.
+
+        Parameters:
+        -----------
+        partials : Dict
+            (frequency, variable, key) -> running statistics
+        days : Dict
+            (frequency, variable, key) -> days with data of written periods
+        """
+        self.days.update(days)
+        for key, other in partials.items():
+            if key in self.stale:
+                continue
+            partial = self.partials.get(key)
+            if partial is None:
+                if len(self.partials) >= self.max_partials():
+                    self.stale.add(key)
+                else:
+                    self.partials[key] = other
+                continue
+            partial['sum'] += other['sum']
+            partial['count'] += other['count']
+            np.fmin(partial['min'], other['min'], out=partial['min'])
+            np.fmax(partial['max'], other['max'], out=partial['max'])
+            partial['covered'] += other['covered']
+            partial['available'] += other['available']
+
+    def write_period(self, frequency: str, variable: str, key: Tuple[int, ...], partial: Dict) -> None:
+        """
+        Write the statistics of one period into its aggregate store
+
+        Parameters:
+        -----------
+        frequency : str
+            'monthly' or 'annual'
+        variable : str
+            Variable name
+        key : Tuple[int, ...]
+            Period key
+        partial : Dict
+            Running statistics of the period
+        """
+        count = partial['count']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = {'mean': np.where(count > 0, partial['sum'] / count, np.nan),
+                      'min': partial['min'], 'max': partial['max'],
+                      'sum': np.where(count > 0, partial['sum'], np.nan)}
+
+        ds = xr.Dataset({f"{variable}_{statistic}": (('time', 'lat', 'lon'),
+                                                     values[statistic][np.newaxis].astype('float32'))
+                         for statistic in self.statistics(variable)})
+        index = self.period_index(key, frequency)
+        ds.to_zarr(self.store(aggregate_path(self.output_zarr, frequency)),
+                   region={'time': slice(index, index + 1)})
+        self.days[(frequency, variable, key)] = partial['available']
+
+    def flush(self) -> int:
+        """
+        Write and drop every open period whose days have all been seen
+
+        Returns:
+        --------
+        int: Number of periods written
+        """
+        complete = [key for key, partial in self.partials.items()
+                    if partial['covered'] >= self.period_length(key[2])]
+        for key in complete:
+            self.write_period(*key, self.partials.pop(key))
+        return len(complete)
+
+    def take_partials(self) -> Tuple[Dict, Dict]:
+        """
+        Hand over (and forget) the open periods and the day counts of the
+        written ones, e.g. from a region worker to the parent
+
+        Returns:
+        --------
+        Tuple[Dict, Dict]: Running statistics and day counts, both keyed by
+                           (frequency, variable, key)
+        """
+        partials, self.partials = self.partials, {}
+        days, self.days = self.days, {}
+        return partials, days
+
+    def period_positions(self, times, key: Tuple[int, ...]) -> np.ndarray:
+        """Positions of a period's days on the daily store's time axis"""
+        in_period = times.year == key[0]
+        if len(key) == 2:
+            in_period &= times.month == key[1]
+        return np.flatnonzero(in_period)
+
+    def recompute(self, frequency: str, variable: str, key: Tuple[int, ...],
+                  daily: xr.Dataset, slab_days: int = 8) -> Dict:
+        """
+        Running statistics of one period read back from the daily store
+
+        Parameters:
+        -----------
+        frequency : str
+            'monthly' or 'annual'
+        variable : str
+            Variable name
+        key : Tuple[int, ...]
+            Period key
+        daily : xr.Dataset
+            Daily store opened without dask
+        slab_days : int
+            Days decoded at once
+
+        Returns:
+        --------
+        Dict: Running statistics over the days of the period in the store
+        """
+        positions = self.period_positions(daily.indexes['time'], key)
+
+        partial = self.new_partial()
+        mask_name = self.converter.availability_name(variable)
+        if len(positions) == 0:
+            return partial
+
+        start, stop = int(positions[0]), int(positions[-1]) + 1
+        for a in range(start, stop, slab_days):
+            b = min(a + slab_days, stop)
+            data = daily[variable].isel(time=slice(a, b)).values.astype('float32')
+            available = daily[mask_name].values[a:b]
+            for day, ok in zip(data, available):
+                self.fold_day(partial, day, bool(ok))
+        return partial
+
+    def finish(self, manifest: bool = True) -> None:
+        """
+        Write the periods left open, recomputing from the daily store those
+        with days this run did not see, then write the per-period day
+        counts and consolidate the aggregate stores
+
+        Parameters:
+        -----------
+        manifest : bool
+            Rebuild <store>.manifest.json of each (local) aggregate store
+        """
+        incomplete = sorted(set(self.partials) | self.stale)
+        if incomplete:
+            daily = xr.open_zarr(self.store(self.output_zarr, read_only=True), chunks=None)
+            times = daily.indexes['time']
+            recomputed = 0
+            try:
+                for frequency, variable, key in incomplete:
+                    partial = self.partials.pop((frequency, variable, key), None)
+                    # Periods cut by the ends of the axis were seen in full
+                    if partial is None or partial['covered'] < len(self.period_positions(times, key)):
+                        partial = self.recompute(frequency, variable, key, daily)
+                        recomputed += 1
+                    self.write_period(frequency, variable, key, partial)
+            finally:
+                daily.close()
+            if recomputed:
+                logger.info(f"Recomputed {recomputed} partial periods from {self.output_zarr}")
+        self.partials, self.stale = {}, set()
+
+        for frequency in self.frequencies:
+            path = aggregate_path(self.output_zarr, frequency)
+            group = zarr.open_group(self.store(path), mode='r+', use_consolidated=False)
+            for variable in self.variables:
+                counts = group[f"{variable}_days"]
+                values = counts[:]
+                for (freq, name, key), available in self.days.items():
+                    if freq == frequency and name == variable:
+                        values[self.period_index(key, frequency)] = available
+                counts[:] = values
+            zarr.consolidate_metadata(self.store(path))
+            if manifest and not is_remote(path):
+                PRISMChunkManifest(path).build()
+        self.days = {}
+
+
+def main():
+    """
+    Show the aggregate stores next to a daily store
+    """
+    zarr_path = Path("./zarr_stores/prism_temp_1981_2000.zarr")
+    for frequency in PRISMAggregator.FREQUENCIES:
+        path = aggregate_path(zarr_path, frequency)
+        if not path.exists():
+            print(f"No {frequency} aggregates at {path}; convert with aggregates=True")
+            continue
+        ds = xr.open_zarr(path)
+        print(f"\n{frequency.capitalize()} aggregates ({path}):")
+        print(ds)
+        ds.close()
+
+
+if __name__ == "__main__":
+    main()
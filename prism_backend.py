@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+PRISM xarray Backend
+Opens a directory of PRISM daily zips as a lazy (time, lat, lon) dataset,
+decoding a day only when a chunk that contains it is computed
+"""
+
+import threading
+import concurrent.futures
+import numpy as np
+import xarray as xr
+from xarray.backends import BackendArray, BackendEntrypoint
+from xarray.core import indexing
+from pathlib import Path
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple, Union
+import logging
+from prism_to_zarr import PRISMToZarrConverter
+from prism_catalog import ARCHIVE_PATTERNS, PRISMFileCatalog
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class PRISMBackendArray(BackendArray):
+    """
+    Lazy (time, lat, lon) array over one variable's daily files
+
+    Indexing decodes only the selected days with PRISMToZarrConverter.
+    read_day_into. Days without a file, or whose file cannot be read,
+    come back as NaN.
+    """
+
+    def __init__(self, converter: PRISMToZarrConverter, variable: str,
+                 days: List[Tuple[Optional[Path], Optional[datetime]]], read_workers: int = 4):
+        """
+        Initialize backend array
+
+        Parameters:
+        -----------
+        converter : PRISMToZarrConverter
+            Converter supplying the grid and the decoders
+        variable : str
+            Variable name
+        days : List[Tuple[Optional[Path], Optional[datetime]]]
+            (file path, date) for every time step, in order
+        read_workers : int
+            Threads decoding the days of one selection
+        """
+        self.converter = converter
+        self.variable = variable
+        self.days = days
+        self.read_workers = read_workers
+        self.shape = (len(days), len(converter.lat), len(converter.lon))
+        self.dtype = np.dtype('float32')
+
+    def __getitem__(self, key: indexing.ExplicitIndexer) -> np.ndarray:
+        return indexing.explicit_indexing_adapter(
+            key, self.shape, indexing.IndexingSupport.BASIC, self._raw_indexing_method
+        )
+
+    def _raw_indexing_method(self, key: Tuple) -> np.ndarray:
+        """
+        Decode the selected days and apply the spatial selection
+
+        Parameters:
+        -----------
+        key : Tuple
+            Basic (integer or slice) indexer per dimension
+
+        Returns:
+        --------
+        np.ndarray: Selected values (float32, NaN for nodata)
+        """
+        time_key, space_key = key[0], key[1:]
+        steps = np.arange(self.shape[0])[time_key]
+        scalar = steps.ndim == 0
+        steps = np.atleast_1d(steps)
+
+        # Whole days are decoded (the files are not tiled), then cut down
+        space_shape = tuple(len(range(size)[k]) for size, k in zip(self.shape[1:], space_key)
+                            if isinstance(k, slice))
+        out = np.full((len(steps),) + space_shape, np.nan, dtype=self.dtype)
+        buffers = threading.local()
+
+        def read(k):
+            if not hasattr(buffers, 'day'):
+                buffers.day = np.empty(self.shape[1:], dtype=self.dtype)
+            file_path, file_date = self.days[steps[k]]
+            if self.converter.read_day_into(buffers.day, file_path, file_date, self.variable):
+                out[k] = buffers.day[space_key]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.read_workers) as executor:
+            list(executor.map(read, range(len(steps))))
+
+        return out[0] if scalar else out
+
+
+class PRISMBackendEntrypoint(BackendEntrypoint):
+    """
+    xarray backend for directories of PRISM daily BIL (or COG) zips
+
+    Pass the class as the engine, e.g.
+    xr.open_dataset('prism_data/daily', engine=PRISMBackendEntrypoint,
+    variables=['tmin', 'tmax'], start_date='1981-01-01',
+    end_date='1981-12-31', chunks={}). With chunks={} each dask chunk
+    holds time_chunk days.
+    """
+
+    description = "Open directories of PRISM daily zip files lazily"
+    open_dataset_parameters = ('filename_or_obj', 'drop_variables', 'variables', 'start_date',
+                               'end_date', 'resolution', 'catalog', 'time_chunk', 'read_workers')
+
+    def open_dataset(self, filename_or_obj: Union[str, Path], *,
+                     drop_variables=None,
+                     variables: Union[str, List[str]] = 'tmin',
+                     start_date: Union[str, datetime] = '1981-01-01',
+                     end_date: Union[str, datetime] = '2024-12-31',
+                     resolution: str = '4km',
+                     catalog: Optional[Union[PRISMFileCatalog, str, Path]] = None,
+                     time_chunk: int = 1,
+                     read_workers: int = 4) -> xr.Dataset:
+        """
+        Open the daily files of one or more variables as a lazy dataset
+
+        Parameters:
+        -----------
+        filename_or_obj : Union[str, Path]
+            Directory containing PRISM zips, or per-variable subdirectories
+        drop_variables : Optional[List[str]]
+            Variables to leave out
+        variables : Union[str, List[str]]
+            Variable name, or several variables sharing one time axis
+        start_date : Union[str, datetime]
+            Start date
+        end_date : Union[str, datetime]
+            End date
+        resolution : str
+            PRISM data resolution ('4km' or '800m')
+        catalog : Optional[Union[PRISMFileCatalog, str, Path]]
+            File catalog (or its SQLite path) to look the files up in
+        time_chunk : int
+            Days per dask chunk preferred with chunks={}
+        read_workers : int
+            Threads decoding the days of one chunk
+
+        Returns:
+        --------
+        xr.Dataset: Dataset on a complete daily axis, with a
+                    '<variable>_available' coordinate marking days that
+                    have a file (the file is only decoded on access)
+        """
+        converter = PRISMToZarrConverter(resolution)
+        owned = catalog is not None and not isinstance(catalog, PRISMFileCatalog)
+        if owned:
+            catalog = PRISMFileCatalog(catalog)
+        if isinstance(start_date, str):
+            start_date = datetime.fromisoformat(start_date)
+        if isinstance(end_date, str):
+            end_date = datetime.fromisoformat(end_date)
+
+        variables = [variables] if isinstance(variables, str) else list(variables)
+        variables = [variable for variable in variables if variable not in (drop_variables or [])]
+        try:
+            files = {variable: converter.find_files(Path(filename_or_obj), variable,
+                                                    start_date, end_date, catalog)
+                     for variable in variables}
+        finally:
+            # File paths are resolved up front; nothing is looked up on access
+            if owned:
+                catalog.close()
+        files = {variable: entries for variable, entries in files.items() if entries}
+        if not files:
+            raise FileNotFoundError(f"No {', '.join(variables)} files in {filename_or_obj} between "
+                                    f"{start_date:%Y-%m-%d} and {end_date:%Y-%m-%d}")
+        days, times = converter.build_time_axis(files)
+
+        data_vars = {}
+        for variable in files:
+            backend_array = PRISMBackendArray(converter, variable, days[variable], read_workers)
+            data = indexing.LazilyIndexedArray(backend_array)
+            data_vars[variable] = xr.Variable(('time', 'lat', 'lon'), data,
+                                              converter.VARIABLE_INFO.get(variable, {}))
+            data_vars[variable].encoding['preferred_chunks'] = {
+                'time': time_chunk, 'lat': len(converter.lat), 'lon': len(converter.lon)}
+
+        ds = xr.Dataset(data_vars, coords={'time': list(times), 'lat': converter.lat, 'lon': converter.lon})
+        for variable in files:
+            mask = np.array([file_path is not None for file_path, _ in days[variable]])
+            ds.coords[converter.availability_name(variable)] = (
+                'time', mask, {'long_name': f"{variable} file present for this day"})
+        converter.set_attributes(ds)
+        ds.attrs['original_format'] = 'BIL (opened lazily)'
+
+        return ds
+
+    def guess_can_open(self, filename_or_obj) -> bool:
+        """Directories holding PRISM zips (or exported COGs), directly or per variable"""
+        try:
+            path = Path(filename_or_obj)
+        except TypeError:
+            return False
+        return path.is_dir() and any(any(path.glob(pattern)) or any(path.glob(f"*/{pattern}"))
+                                     for pattern in ARCHIVE_PATTERNS)
+
+
+def open_prism_dataset(input_dir: Union[str, Path], variables: Union[str, List[str]],
+                       start_date: Union[str, datetime], end_date: Union[str, datetime],
+                       chunks: Optional[Dict] = None, **kwargs) -> xr.Dataset:
+    """
+    Open PRISM daily zips lazily with PRISMBackendEntrypoint
+
+    Parameters:
+    -----------
+    input_dir : Union[str, Path]
+        Directory containing PRISM zips, or per-variable subdirectories
+    variables : Union[str, List[str]]
+        Variable name or names
+    start_date : Union[str, datetime]
+        Start date
+    end_date : Union[str, datetime]
+        End date
+    chunks : Optional[Dict]
+        Dask chunks ({} for time_chunk days per chunk, the default)
+    **kwargs
+        Other PRISMBackendEntrypoint.open_dataset parameters
+
+    Returns:
+    --------
+    xr.Dataset: Dask-backed dataset
+    """
+    return xr.open_dataset(input_dir, engine=PRISMBackendEntrypoint, variables=variables,
+                           start_date=start_date, end_date=end_date,
+                           chunks={} if chunks is None else chunks, **kwargs)
+
+
+def main():
+    """
+    Demonstrate lazy access to the zip archive
+    """
+    input_dir = Path("./prism_data/daily/tmin")
+    if not input_dir.exists():
+        print(f"No PRISM zips found at {input_dir}")
+        return
+
+    ds = open_prism_dataset(input_dir, 'tmin', '1981-01-01', '1981-12-31', time_chunk=30)
+    print(ds)
+
+    # Only the 31 January files are decoded
+    january = ds['tmin'].sel(time=slice('1981-01-01', '1981-01-31')).mean('time').compute()
+    print(f"January mean over the grid: {float(january.mean()):.2f} °C")
+
+    point = ds['tmin'].sel(lat=40.0, lon=-105.0, method='nearest').compute()
+    print(f"Point series: {int(point.notnull().sum())} days with data")
+
+
+if __name__ == "__main__":
+    main()
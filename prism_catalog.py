@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""
+PRISM Archive Catalogs
+SQLite indexes over a local archive of PRISM zip files
+"""
+
+import os
+import sqlite3
+import concurrent.futures
+from pathlib import Path
+from datetime import datetime
+from typing import List, Dict, Optional, Sequence, Tuple, Union
+import logging
+from process_prism_data import PRISMProcessor
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Daily inputs: PRISM's BIL zips and COGs written by PRISMCOGExporter
+ARCHIVE_SUFFIXES = ('_bil.zip', '_cog.tif')
+ARCHIVE_PATTERNS = tuple(f"PRISM_*{suffix}" for suffix in ARCHIVE_SUFFIXES)
+
+
+def scan_archive(input_dir: Union[str, Path], pattern: Union[str, Sequence[str]] = ARCHIVE_PATTERNS,
+                 recursive: bool = True) -> List[Tuple[Path, int, int]]:
+    """
+    List archive files with the stat fields used for incremental updates
+
+    Parameters:
+    -----------
+    input_dir : Union[str, Path]
+        Root directory of the archive
+    pattern : Union[str, Sequence[str]]
+        Glob pattern(s) for PRISM files
+    recursive : bool
+        Descend into subdirectories (e.g. one directory per variable)
+
+    Returns:
+    --------
+    List[Tuple[Path, int, int]]: (path, size in bytes, mtime in ns) per file
+    """
+    input_dir = Path(input_dir)
+    patterns = [pattern] if isinstance(pattern, str) else pattern
+
+    entries = []
+    for pattern in patterns:
+        for path in (input_dir.rglob(pattern) if recursive else input_dir.glob(pattern)):
+            st = path.stat()
+            entries.append((path.resolve(), st.st_size, st.st_mtime_ns))
+
+    return entries
+
+
+def file_date(metadata: Dict) -> Optional[str]:
+    """
+    ISO date of the first day covered by a parsed PRISM filename
+
+    Parameters:
+    -----------
+    metadata : Dict
+        Output of PRISMProcessor.parse_filename
+
+    Returns:
+    --------
+    Optional[str]: 'YYYY-MM-DD', or None if the filename carried no date
+    """
+    if 'year' not in metadata:
+        return None
+    return datetime(metadata['year'], metadata.get('month', 1),
+                    metadata.get('day', 1)).date().isoformat()
+
+
+def diff_entries(conn: sqlite3.Connection, table: str, input_dir: Union[str, Path],
+                 entries: List[Tuple[Path, int, int]]) -> Tuple[List, List]:
+    """
+    Compare a fresh archive scan against the rows already in a catalog table
+
+    Parameters:
+    -----------
+    conn : sqlite3.Connection
+        Catalog database
+    table : str
+        Table with path, size and mtime_ns columns
+    input_dir : Union[str, Path]
+        Root directory that was scanned
+    entries : List[Tuple[Path, int, int]]
+        Output of scan_archive
+
+    Returns:
+    --------
+    Tuple[List, List]: Entries that are new or changed, and (path,) tuples
+                       of rows under input_dir whose file no longer exists
+    """
+    root = str(Path(input_dir).resolve())
+    known = {row[0]: (row[1], row[2])
+             for row in conn.execute(f"SELECT path, size, mtime_ns FROM {table}")}
+    on_disk = {str(path) for path, _, _ in entries}
+
+    todo = [e for e in entries if known.get(str(e[0])) != (e[1], e[2])]
+    stale = [(p,) for p in known if p not in on_disk and p.startswith(root + os.sep)]
+
+    return todo, stale
+
+
+class PRISMStatsIndex:
+    """
+    Queryable index of per-file summary statistics
+
+    Statistics come from the sidecar files shipped inside every PRISM zip
+    (.stx, .aux.xml, .xml), so building the index never decodes a grid.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS stats (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime_ns INTEGER,
+            variable TEXT,
+            stability TEXT,
+            resolution TEXT,
+            temporal TEXT,
+            date TEXT,
+            min REAL,
+            max REAL,
+            mean REAL,
+            std REAL,
+            source TEXT
+        );
+        CREATE INDEX IF NOT EXISTS stats_variable_date ON stats (variable, date);
+    """
+
+    COLUMNS = ['path', 'size', 'mtime_ns', 'variable', 'stability', 'resolution',
+               'temporal', 'date', 'min', 'max', 'mean', 'std', 'source']
+
+    def __init__(self, db_path: Union[str, Path], resolution: str = '4km'):
+        """
+        Initialize index
+
+        Parameters:
+        -----------
+        db_path : Union[str, Path]
+            SQLite database file (created if missing)
+        resolution : str
+            PRISM data resolution ('4km' or '800m')
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.processor = PRISMProcessor(resolution)
+
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(self.SCHEMA)
+
+    def close(self) -> None:
+        """Close the database connection"""
+        self.conn.close()
+
+    def _read_entry(self, path: Path, size: int, mtime_ns: int) -> Tuple:
+        """Read the sidecar statistics of one zip into a table row"""
+        metadata = self.processor.parse_filename(path.name)
+        try:
+            stats = self.processor.read_zip_statistics(path)
+        except Exception as e:
+            logger.warning(f"Could not read sidecars from {path.name}: {e}")
+            stats = {}
+
+        return (str(path), size, mtime_ns, metadata.get('variable'),
+                metadata.get('stability'), metadata.get('resolution'),
+                metadata.get('temporal'), file_date(metadata),
+                stats.get('min'), stats.get('max'), stats.get('mean'),
+                stats.get('std'), stats.get('source'))
+
+    def build(self, input_dir: Union[str, Path], pattern: str = "PRISM_*_bil.zip",
+              recursive: bool = True, max_workers: int = 8) -> int:
+        """
+        Index (or incrementally refresh) the statistics of an archive
+
+        Files whose size and modification time are unchanged since the last
+        build are skipped; entries for deleted files are dropped.
+
+        Parameters:
+        -----------
+        input_dir : Union[str, Path]
+            Root directory of the archive
+        pattern : str
+            Glob pattern for PRISM zip files
+        recursive : bool
+            Descend into subdirectories
+        max_workers : int
+            Number of threads reading sidecars
+
+        Returns:
+        --------
+        int: Number of files (re)indexed
+        """
+        entries = scan_archive(input_dir, pattern, recursive)
+        todo, stale = diff_entries(self.conn, 'stats', input_dir, entries)
+
+        rows = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for row in executor.map(lambda e: self._read_entry(*e), todo):
+                rows.append(row)
+
+        with self.conn:
+            self.conn.executemany("DELETE FROM stats WHERE path = ?", stale)
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO stats VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                rows
+            )
+
+        missing = sum(1 for row in rows if row[-1] is None)
+        if missing:
+            logger.warning(f"{missing} files had no readable statistics sidecar")
+        logger.info(f"Indexed {len(rows)} files ({len(entries) - len(rows)} unchanged, "
+                    f"{len(stale)} removed)")
+        return len(rows)
+
+    def query(self, variable: Optional[str] = None,
+              start_date: Optional[datetime] = None,
+              end_date: Optional[datetime] = None,
+              min_below: Optional[float] = None,
+              max_above: Optional[float] = None,
+              stability: Optional[str] = None) -> List[Dict]:
+        """
+        Select indexed files by variable, date and value range
+
+        Parameters:
+        -----------
+        variable : Optional[str]
+            Variable name (e.g., 'tmin', 'ppt')
+        start_date : Optional[datetime]
+            First date to include
+        end_date : Optional[datetime]
+            Last date to include
+        min_below : Optional[float]
+            Only files whose minimum is below this value
+        max_above : Optional[float]
+            Only files whose maximum is above this value
+        stability : Optional[str]
+            Stability label ('stable', 'provisional', 'early')
+
+        Returns:
+        --------
+        List[Dict]: Matching rows ordered by variable and date
+        """
+        clauses, params = [], []
+        for column, op, value in [
+            ('variable', '=', variable),
+            ('stability', '=', stability),
+            ('date', '>=', start_date.date().isoformat() if start_date else None),
+            ('date', '<=', end_date.date().isoformat() if end_date else None),
+            ('min', '<', min_below),
+            ('max', '>', max_above),
+        ]:
+            if value is not None:
+                clauses.append(f"{column} {op} ?")
+                params.append(value)
+
+        sql = "SELECT * FROM stats"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY variable, date"
+
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def summary(self, variable: Optional[str] = None) -> List[Dict]:
+        """
+        Archive-wide statistics per variable
+
+        Parameters:
+        -----------
+        variable : Optional[str]
+            Restrict to one variable
+
+        Returns:
+        --------
+        List[Dict]: File count, date range, extreme values and the number of
+                    files without sidecar statistics, per variable
+        """
+        sql = """
+            SELECT variable,
+                   COUNT(*) AS files,
+                   MIN(date) AS first_date,
+                   MAX(date) AS last_date,
+                   MIN(min) AS min,
+                   MAX(max) AS max,
+                   AVG(mean) AS mean_of_means,
+                   SUM(source IS NULL) AS missing_statistics
+            FROM stats
+        """
+        params = []
+        if variable is not None:
+            sql += " WHERE variable = ?"
+            params.append(variable)
+        sql += " GROUP BY variable ORDER BY variable"
+
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+
+class PRISMFileCatalog:
+    """
+    Persistent date -> path catalog of a local PRISM archive
+
+    Filenames are parsed once, when a file first appears (or changes), and
+    stored with indexes on variable, date, stability and resolution so that
+    the file set for any date range is a single indexed lookup.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime_ns INTEGER,
+            variable TEXT,
+            stability TEXT,
+            resolution TEXT,
+            temporal TEXT,
+            date TEXT
+        );
+        CREATE INDEX IF NOT EXISTS files_lookup
+            ON files (variable, temporal, date, stability, resolution);
+    """
+
+    COLUMNS = ['path', 'size', 'mtime_ns', 'variable', 'stability', 'resolution',
+               'temporal', 'date']
+
+    def __init__(self, db_path: Union[str, Path] = ':memory:', resolution: str = '4km'):
+        """
+        Initialize catalog
+
+        Parameters:
+        -----------
+        db_path : Union[str, Path]
+            SQLite database file (created if missing); ':memory:' keeps the
+            catalog for the lifetime of this object only
+        resolution : str
+            PRISM data resolution ('4km' or '800m')
+        """
+        self.db_path = Path(db_path)
+        if str(db_path) != ':memory:':
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.processor = PRISMProcessor(resolution)
+
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(self.SCHEMA)
+
+    def close(self) -> None:
+        """Close the database connection"""
+        self.conn.close()
+
+    def update(self, input_dir: Union[str, Path], pattern: Union[str, Sequence[str]] = ARCHIVE_PATTERNS,
+               recursive: bool = True) -> int:
+        """
+        Add new or changed files under input_dir and drop deleted ones
+
+        Parameters:
+        -----------
+        input_dir : Union[str, Path]
+            Root directory of the archive
+        pattern : Union[str, Sequence[str]]
+            Glob pattern(s) for PRISM files (BIL zips and exported COGs)
+        recursive : bool
+            Descend into subdirectories
+
+        Returns:
+        --------
+        int: Number of files (re)cataloged
+        """
+        entries = scan_archive(input_dir, pattern, recursive)
+        todo, stale = diff_entries(self.conn, 'files', input_dir, entries)
+
+        rows = []
+        for path, size, mtime_ns in todo:
+            metadata = self.processor.parse_filename(path.name)
+            date = file_date(metadata)
+            if date is None:
+                logger.warning(f"Could not parse date from {path.name}")
+                continue
+            rows.append((str(path), size, mtime_ns, metadata['variable'],
+                         metadata['stability'], metadata['resolution'],
+                         metadata['temporal'], date))
+
+        with self.conn:
+            self.conn.executemany("DELETE FROM files WHERE path = ?", stale)
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO files VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                rows
+            )
+
+        logger.info(f"Cataloged {len(rows)} files ({len(entries) - len(todo)} unchanged, "
+                    f"{len(stale)} removed)")
+        return len(rows)
+
+    def _where(self, variable: str, temporal: str, stability: Optional[str],
+               resolution: Optional[str]) -> Tuple[str, List]:
+        """Build the WHERE clause shared by lookups"""
+        clauses, params = ["variable = ?", "temporal = ?"], [variable, temporal]
+        if stability is not None:
+            clauses.append("stability = ?")
+            params.append(stability)
+        if resolution is not None:
+            # Labels carry a dataset suffix, e.g. '4kmD2' for resolution '4km'
+            clauses.append("resolution LIKE ?")
+            params.append(f"{resolution}%")
+        return " AND ".join(clauses), params
+
+    def lookup(self, variable: str, start_date: datetime, end_date: datetime,
+               stability: Optional[str] = 'stable', resolution: Optional[str] = '4km',
+               temporal: str = 'daily') -> List[Tuple[Path, datetime]]:
+        """
+        Resolve the files covering a date range
+
+        When several files exist for one date (e.g. different dataset
+        versions such as 4kmD1 and 4kmD2), the latest label wins. Within a
+        label, the BIL zip wins over a COG exported from it.
+
+        Parameters:
+        -----------
+        variable : str
+            Variable name (e.g., 'tmin', 'ppt')
+        start_date : datetime
+            First date to include
+        end_date : datetime
+            Last date to include
+        stability : Optional[str]
+            Stability label to match (None for any)
+        resolution : Optional[str]
+            Resolution prefix to match (None for any)
+        temporal : str
+            Temporal resolution ('daily', 'monthly', 'annual')
+
+        Returns:
+        --------
+        List[Tuple[Path, datetime]]: (file path, date) pairs in date order
+        """
+        where, params = self._where(variable, temporal, stability, resolution)
+        sql = (f"SELECT path, date FROM files WHERE {where} AND date >= ? AND date <= ? "
+               f"ORDER BY date, resolution, path LIKE '%_bil.zip'")
+        params += [start_date.date().isoformat(), end_date.date().isoformat()]
+
+        by_date = {}
+        for row in self.conn.execute(sql, params):
+            by_date[row['date']] = Path(row['path'])
+
+        return [(path, datetime.fromisoformat(date)) for date, path in by_date.items()]
+
+    def date_range(self, variable: str, stability: Optional[str] = 'stable',
+                   resolution: Optional[str] = '4km',
+                   temporal: str = 'daily') -> Optional[Tuple[datetime, datetime]]:
+        """
+        First and last cataloged date of a variable
+
+        Parameters:
+        -----------
+        variable : str
+            Variable name
+        stability : Optional[str]
+            Stability label to match (None for any)
+        resolution : Optional[str]
+            Resolution prefix to match (None for any)
+        temporal : str
+            Temporal resolution ('daily', 'monthly', 'annual')
+
+        Returns:
+        --------
+        Optional[Tuple[datetime, datetime]]: Date range, or None if no files
+        """
+        where, params = self._where(variable, temporal, stability, resolution)
+        row = self.conn.execute(
+            f"SELECT MIN(date), MAX(date) FROM files WHERE {where}", params
+        ).fetchone()
+
+        if row[0] is None:
+            return None
+        return datetime.fromisoformat(row[0]), datetime.fromisoformat(row[1])
+
+    def variables(self) -> List[str]:
+        """List the cataloged variables"""
+        return [row[0] for row in
+                self.conn.execute("SELECT DISTINCT variable FROM files ORDER BY variable")]
+
+
+def main():
+    """
+    Example usage of the file catalog and statistics index
+    """
+    print("="*60)
+    print("PRISM Archive Catalogs")
+    print("="*60)
+
+    input_base = Path("./prism_daily_temp_1981_2000")
+    if not input_base.exists():
+        print(f"Archive not found at {input_base}")
+        print("Please run the download scripts first")
+        return
+
+    catalog = PRISMFileCatalog(input_base / "prism_catalog.sqlite")
+    catalog.update(input_base)
+    for variable in catalog.variables():
+        print(f"{variable}: {catalog.date_range(variable)}")
+    catalog.close()
+
+    index = PRISMStatsIndex(input_base / "prism_stats.sqlite")
+    index.build(input_base)
+
+    for row in index.summary():
+        print(f"\n{row['variable']}: {row['files']} files, "
+              f"{row['first_date']} to {row['last_date']}")
+        if row['min'] is not None:
+            print(f"  Range: {row['min']:.2f} to {row['max']:.2f}")
+        print(f"  Files without statistics: {row['missing_statistics']}")
+
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
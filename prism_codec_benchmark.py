@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+PRISM Zarr Codec Benchmark
+Measures compression ratio, write throughput and read latency of codec
+pipelines on real PRISM data, to choose per-variable codecs
+"""
+
+import time
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import xarray as xr
+import zarr
+from pathlib import Path
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple, Union
+import logging
+from prism_to_zarr import PRISMToZarrConverter
+from prism_catalog import PRISMFileCatalog
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class PRISMCodecBenchmark:
+    """
+    Benchmarks codec pipelines on a sample of decoded PRISM days
+
+    Every pipeline writes the same sample with the converter's chunking,
+    so the numbers reflect the chunks a real conversion would produce.
+    """
+
+    def __init__(self, resolution: str = '4km', chunk_strategy: str = 'time_optimized',
+                 repeats: int = 5):
+        """
+        Initialize benchmark
+
+        Parameters:
+        -----------
+        resolution : str
+            PRISM data resolution ('4km' or '800m')
+        chunk_strategy : str
+            Converter chunking strategy to benchmark with
+        repeats : int
+            Number of timed reads per latency measurement (median reported)
+        """
+        self.resolution = resolution
+        self.chunk_strategy = chunk_strategy
+        self.repeats = repeats
+        self.converter = PRISMToZarrConverter(resolution, chunk_strategy)
+
+    def load_sample(self, files: List[Tuple[Path, datetime]], variable: str,
+                    read_workers: int = 4) -> xr.Dataset:
+        """
+        Decode sample days into memory
+
+        Parameters:
+        -----------
+        files : List[Tuple[Path, datetime]]
+            (file path, date) pairs, e.g. from PRISMFileCatalog.lookup
+        variable : str
+            Variable name
+        read_workers : int
+            Number of threads decoding files
+
+        Returns:
+        --------
+        xr.Dataset: In-memory sample with NaN for nodata
+        """
+        files = sorted(files, key=lambda entry: entry[1])
+        data, available = self.converter.read_batch(files, variable, read_workers=read_workers)
+        times = [file_date for (_, file_date), ok in zip(files, available) if ok]
+        return self.converter.create_batch_dataset({variable: data[available]}, times)
+
+    def land_points(self, sample: xr.Dataset, variable: str, n: int) -> List[Tuple[int, int]]:
+        """
+        Pick random (row, col) cells with data for point-series reads
+
+        Parameters:
+        -----------
+        sample : xr.Dataset
+            Sample dataset
+        variable : str
+            Variable name
+        n : int
+            Number of cells
+
+        Returns:
+        --------
+        List[Tuple[int, int]]: Grid indices
+        """
+        rows, cols = np.nonzero(np.isfinite(sample[variable].isel(time=0).values))
+        rng = np.random.default_rng(0)
+        picks = rng.choice(len(rows), size=min(n, len(rows)), replace=False)
+        return [(int(rows[i]), int(cols[i])) for i in picks]
+
+    def median_seconds(self, func) -> float:
+        """Median wall time of repeated calls"""
+        timings = []
+        for _ in range(self.repeats):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return float(np.median(timings))
+
+    def run_codec(self, sample: xr.Dataset, variable: str, codec: Union[str, Dict],
+                  store_path: Path, points: List[Tuple[int, int]]) -> Dict:
+        """
+        Write the sample with one pipeline and time reads back
+
+        Parameters:
+        -----------
+        sample : xr.Dataset
+            In-memory sample
+        variable : str
+            Variable name
+        codec : Union[str, Dict]
+            CODEC_CONFIGS name or pipeline dict
+        store_path : Path
+            Scratch store path (overwritten)
+        points : List[Tuple[int, int]]
+            Cells used for point-series reads
+
+        Returns:
+        --------
+        Dict: Measurements for this pipeline
+        """
+        converter = PRISMToZarrConverter(self.resolution, self.chunk_strategy, codec_strategy=codec)
+        n_times = len(sample.time)
+        encoding = {variable: converter.variable_encoding(variable, converter.time_chunk(n_times))}
+
+        raw_bytes = sample[variable].nbytes
+        start = time.perf_counter()
+        sample.to_zarr(store_path, mode='w', encoding=encoding)
+        write_seconds = time.perf_counter() - start
+
+        array = zarr.open_group(str(store_path), mode='r')[variable]
+        stored_bytes = array.nbytes_stored() if callable(array.nbytes_stored) else array.nbytes_stored
+
+        # Lossless check against the in-memory sample
+        restored = array[:]
+        max_error = float(np.nanmax(np.abs(restored - sample[variable].values)))
+
+        rng = np.random.default_rng(1)
+        days = iter(rng.integers(0, n_times, size=self.repeats))
+        map_seconds = self.median_seconds(lambda: array[int(next(days))])
+
+        cells = iter(points * self.repeats)
+        point_seconds = self.median_seconds(lambda: array[(slice(None),) + next(cells)])
+
+        return {
+            'variable': variable,
+            'codec': codec if isinstance(codec, str) else str(codec),
+            'ratio': raw_bytes / stored_bytes,
+            'stored_mb': stored_bytes / 1024 ** 2,
+            'write_mb_s': raw_bytes / 1024 ** 2 / write_seconds,
+            'map_read_ms': map_seconds * 1000,
+            'point_read_ms': point_seconds * 1000,
+            'max_error': max_error
+        }
+
+    def run(self, samples: Dict[str, List[Tuple[Path, datetime]]],
+            codecs: Optional[List[Union[str, Dict]]] = None,
+            work_dir: Optional[Union[str, Path]] = None) -> pd.DataFrame:
+        """
+        Benchmark codec pipelines for each variable
+
+        Parameters:
+        -----------
+        samples : Dict[str, List[Tuple[Path, datetime]]]
+            Sample files per variable
+        codecs : Optional[List[Union[str, Dict]]]
+            Pipelines to compare (all CODEC_CONFIGS if None)
+        work_dir : Optional[Union[str, Path]]
+            Scratch directory for the stores (a temporary directory if None);
+            use the filesystem the real stores live on
+
+        Returns:
+        --------
+        pd.DataFrame: One row per variable and pipeline
+        """
+        codecs = codecs or list(PRISMToZarrConverter.CODEC_CONFIGS)
+        if work_dir is not None:
+            Path(work_dir).mkdir(parents=True, exist_ok=True)
+        scratch = Path(tempfile.mkdtemp(prefix='prism_codecs_', dir=work_dir))
+
+        results = []
+        try:
+            for variable, files in samples.items():
+                sample = self.load_sample(files, variable)
+                points = self.land_points(sample, variable, self.repeats)
+                logger.info(f"Benchmarking {variable}: {len(sample.time)} days, "
+                            f"{sample[variable].nbytes / 1024 ** 2:.0f} MB raw")
+
+                for codec in codecs:
+                    store_path = scratch / f"{variable}.zarr"
+                    results.append(self.run_codec(sample, variable, codec, store_path, points))
+                    shutil.rmtree(store_path, ignore_errors=True)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+        return pd.DataFrame(results)
+
+
+def main():
+    """
+    Benchmark the codec pipelines on one month of each temperature variable
+    """
+    print("="*60)
+    print("PRISM Zarr Codec Benchmark")
+    print("="*60)
+
+    input_base = Path("./prism_daily_temp_1981_2000")
+    if not input_base.exists():
+        print(f"Archive not found at {input_base}")
+        print("Please run the download scripts first")
+        return
+
+    catalog = PRISMFileCatalog(input_base / "prism_catalog.sqlite")
+    catalog.update(input_base)
+
+    samples = {variable: catalog.lookup(variable, datetime(1990, 1, 1), datetime(1990, 1, 31))
+               for variable in ['tmin', 'tmax', 'tmean']}
+    samples = {variable: files for variable, files in samples.items() if files}
+
+    benchmark = PRISMCodecBenchmark(chunk_strategy='balanced')
+    results = benchmark.run(samples, work_dir=Path("./zarr_stores"))
+
+    pd.set_option('display.width', 120)
+    print(results.round(3).to_string(index=False))
+    results.to_csv("codec_benchmark.csv", index=False)
+    print("\nResults saved to codec_benchmark.csv")
+
+
+if __name__ == "__main__":
+    main()
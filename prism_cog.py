@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+PRISM Cloud-Optimized GeoTIFF Tools
+Bulk export of PRISM BIL data to tiled, compressed COGs with overviews,
+and windowed/overview reads of COG inputs
+"""
+
+import os
+import concurrent.futures
+import numpy as np
+from pathlib import Path
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple, Union
+import logging
+from tqdm import tqdm
+from process_prism_data import PRISMProcessor
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def _export_worker(exporter: 'PRISMCOGExporter', file_path: Path,
+                   output_path: Path) -> Tuple[str, int]:
+    """Process pool entry point: export one file and report its size"""
+    exporter.export_file(file_path, output_path)
+    return str(output_path), output_path.stat().st_size
+
+
+class PRISMCOGExporter:
+    """
+    Writes PRISM grids as Cloud-Optimized GeoTIFFs
+
+    Requires rasterio (GDAL >= 3.1 for the COG driver).
+    """
+
+    def __init__(self, resolution: str = '4km', compress: str = 'DEFLATE',
+                 level: int = 6, blocksize: int = 256,
+                 overview_resampling: str = 'average'):
+        """
+        Initialize exporter
+
+        Parameters:
+        -----------
+        resolution : str
+            PRISM data resolution ('4km' or '800m')
+        compress : str
+            GDAL compression method ('DEFLATE', 'ZSTD', 'LZW', ...)
+        level : int
+            Compression level
+        blocksize : int
+            Internal tile size in pixels
+        overview_resampling : str
+            Resampling used for the internal overviews
+        """
+        self.processor = PRISMProcessor(resolution)
+        self.resolution = resolution
+        self.specs = self.processor.specs
+        self.compress = compress
+        self.level = level
+        self.blocksize = blocksize
+        self.overview_resampling = overview_resampling
+
+    def cog_profile(self, metadata: Dict) -> Dict:
+        """
+        Build the rasterio creation profile for one grid
+
+        Parameters:
+        -----------
+        metadata : Dict
+            Metadata including grid specifications
+
+        Returns:
+        --------
+        Dict: Keyword arguments for rasterio.open(..., 'w')
+        """
+        from rasterio.transform import from_origin
+
+        transform = from_origin(
+            metadata['xllcorner'],
+            metadata['yllcorner'] + metadata['nrows'] * metadata['cellsize'],
+            metadata['cellsize'],
+            metadata['cellsize']
+        )
+
+        return {
+            'driver': 'COG',
+            'width': metadata['ncols'],
+            'height': metadata['nrows'],
+            'count': 1,
+            'dtype': 'float32',
+            'crs': 'EPSG:4269',  # NAD83
+            'transform': transform,
+            'nodata': metadata['nodata_value'],
+            'compress': self.compress,
+            'level': self.level,
+            'predictor': 3,  # Floating point predictor
+            'blocksize': self.blocksize,
+            'overviews': 'AUTO',
+            'overview_resampling': self.overview_resampling,
+            'bigtiff': 'IF_SAFER'
+        }
+
+    def write_cog(self, data: np.ndarray, output_path: Union[str, Path],
+                  metadata: Dict) -> None:
+        """
+        Write one 2D grid to a Cloud-Optimized GeoTIFF
+
+        Parameters:
+        -----------
+        data : np.ndarray
+            2D array of climate data (masked values are written as nodata)
+        output_path : Union[str, Path]
+            Output COG path
+        metadata : Dict
+            Metadata including grid specifications
+        """
+        import rasterio
+
+        if np.ma.isMaskedArray(data):
+            data = data.filled(metadata['nodata_value'])
+
+        tmp_path = Path(f"{output_path}.tmp")
+        with rasterio.open(tmp_path, 'w', **self.cog_profile(metadata)) as dst:
+            dst.write(data.astype('float32', copy=False), 1)
+            dst.update_tags(**{f"PRISM_{key.upper()}": metadata[key]
+                               for key in ('variable', 'date_str', 'stability', 'resolution')
+                               if key in metadata})
+
+        # Only complete files ever appear under the final name
+        os.replace(tmp_path, output_path)
+
+    def output_name(self, file_path: Path) -> str:
+        """
+        COG filename for a PRISM zip ('..._bil.zip' -> '..._cog.tif')
+
+        Parameters:
+        -----------
+        file_path : Path
+            Source PRISM file
+
+        Returns:
+        --------
+        str: Output filename (still parseable by PRISMProcessor.parse_filename)
+        """
+        stem = file_path.name
+        for suffix in ('.zip', '.bil'):
+            if stem.endswith(suffix):
+                stem = stem[:-len(suffix)]
+        if stem.endswith('_bil'):
+            stem = stem[:-len('_bil')]
+        return f"{stem}_cog.tif"
+
+    def export_file(self, file_path: Path, output_path: Path) -> None:
+        """
+        Export a single PRISM zip to a COG using the in-memory reader
+
+        Parameters:
+        -----------
+        file_path : Path
+            PRISM zip file
+        output_path : Path
+            Output COG path
+        """
+        data = self.processor.read_bil_from_zip(file_path)
+        metadata = self.processor.parse_filename(file_path.name)
+        metadata.update(self.specs)
+        self.write_cog(data, output_path, metadata)
+
+    def export(self, files: List[Union[Path, Tuple[Path, datetime]]],
+               output_dir: Union[str, Path], max_workers: Optional[int] = None,
+               overwrite: bool = False) -> Dict:
+        """
+        Export many PRISM zips to COGs across a process pool
+
+        Outputs are written to output_dir/<variable>/<year>/.
+
+        Parameters:
+        -----------
+        files : List[Union[Path, Tuple[Path, datetime]]]
+            PRISM zip paths, or (path, date) pairs from PRISMFileCatalog.lookup
+        output_dir : Union[str, Path]
+            Base output directory
+        max_workers : Optional[int]
+            Number of worker processes (defaults to the CPU count)
+        overwrite : bool
+            Re-export files whose COG already exists
+
+        Returns:
+        --------
+        Dict: Counts of exported, skipped and failed files and bytes written
+        """
+        output_dir = Path(output_dir)
+        results = {'exported': 0, 'skipped': 0, 'failed': 0, 'bytes': 0}
+
+        jobs = []
+        for entry in files:
+            file_path = Path(entry[0] if isinstance(entry, tuple) else entry)
+            metadata = self.processor.parse_filename(file_path.name)
+            target_dir = output_dir / metadata.get('variable', 'unknown') / str(metadata.get('year', ''))
+            output_path = target_dir / self.output_name(file_path)
+
+            if output_path.exists() and not overwrite:
+                results['skipped'] += 1
+                continue
+
+            target_dir.mkdir(parents=True, exist_ok=True)
+            jobs.append((file_path, output_path))
+
+        logger.info(f"Exporting {len(jobs)} files to COG ({results['skipped']} already exist)")
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(_export_worker, self, file_path, output_path): file_path
+                       for file_path, output_path in jobs}
+
+            for future in tqdm(concurrent.futures.as_completed(futures),
+                               total=len(futures), desc="Exporting COGs"):
+                try:
+                    _, size = future.result()
+                    results['exported'] += 1
+                    results['bytes'] += size
+                except Exception as e:
+                    logger.error(f"Error exporting {futures[future].name}: {e}")
+                    results['failed'] += 1
+
+        logger.info(f"Exported {results['exported']} COGs "
+                    f"({results['bytes'] / (1024 * 1024):.1f} MB), {results['failed']} failed")
+        return results
+
+
+class PRISMCOGReader:
+    """
+    Reads PRISM grids from Cloud-Optimized GeoTIFFs
+
+    Windows are expanded to whole internal tiles and overview levels are
+    read directly, so regional or coarse jobs only decompress the tiles
+    they need. Requires rasterio.
+    """
+
+    def __init__(self, resolution: str = '4km'):
+        """
+        Initialize reader
+
+        Parameters:
+        -----------
+        resolution : str
+            PRISM data resolution ('4km' or '800m')
+        """
+        self.processor = PRISMProcessor(resolution)
+        self.specs = self.processor.specs
+
+    def dataset_path(self, file_path: Union[str, Path]) -> str:
+        """
+        GDAL path of a COG, looking inside zip deliverables when needed
+
+        Parameters:
+        -----------
+        file_path : Union[str, Path]
+            .tif/.tiff file, or a zip containing one
+
+        Returns:
+        --------
+        str: Path rasterio can open without extracting anything
+        """
+        import zipfile
+
+        file_path = Path(file_path)
+        if file_path.suffix != '.zip':
+            return str(file_path)
+
+        with zipfile.ZipFile(file_path, 'r') as zip_ref:
+            members = [m for m in zip_ref.namelist() if m.lower().endswith(('.tif', '.tiff'))]
+        if not members:
+            raise ValueError(f"No GeoTIFF found in {file_path}")
+
+        return f"/vsizip/{file_path.resolve()}/{members[0]}"
+
+    def tile_window(self, src, bounds: Tuple[float, float, float, float]):
+        """
+        Pixel window covering bounds, expanded to whole internal tiles
+
+        Parameters:
+        -----------
+        src : rasterio.DatasetReader
+            Open dataset (full resolution or overview level)
+        bounds : Tuple[float, float, float, float]
+            (min_lon, min_lat, max_lon, max_lat)
+
+        Returns:
+        --------
+        rasterio.windows.Window: Tile-aligned window clipped to the grid
+        """
+        from rasterio.windows import Window, from_bounds
+
+        block_rows, block_cols = src.block_shapes[0]
+        window = from_bounds(*bounds, transform=src.transform)
+
+        row_start = max(0, int(np.floor(window.row_off / block_rows)) * block_rows)
+        col_start = max(0, int(np.floor(window.col_off / block_cols)) * block_cols)
+        row_stop = min(src.height, int(np.ceil((window.row_off + window.height) / block_rows)) * block_rows)
+        col_stop = min(src.width, int(np.ceil((window.col_off + window.width) / block_cols)) * block_cols)
+
+        if row_stop <= row_start or col_stop <= col_start:
+            raise ValueError(f"Bounds {bounds} do not intersect the grid")
+
+        return Window(col_start, row_start, col_stop - col_start, row_stop - row_start)
+
+    def read(self, file_path: Union[str, Path],
+             bounds: Optional[Tuple[float, float, float, float]] = None,
+             overview_level: Optional[int] = None) -> Tuple[np.ndarray, Dict]:
+        """
+        Read a (windowed, optionally coarsened) grid from a COG
+
+        Parameters:
+        -----------
+        file_path : Union[str, Path]
+            .tif/.tiff file, or a zip containing one
+        bounds : Optional[Tuple[float, float, float, float]]
+            (min_lon, min_lat, max_lon, max_lat) to read; the window is
+            expanded to whole tiles. Full grid if None.
+        overview_level : Optional[int]
+            Internal overview to read (0 is the first 2x reduction).
+            Full resolution if None.
+
+        Returns:
+        --------
+        Tuple[np.ndarray, Dict]: Masked data array and metadata with the grid
+                                 specifications of the returned window
+        """
+        import rasterio
+
+        open_kwargs = {} if overview_level is None else {'overview_level': overview_level}
+        with rasterio.open(self.dataset_path(file_path), **open_kwargs) as src:
+            window = self.tile_window(src, bounds) if bounds is not None else None
+            data = src.read(1, window=window, masked=True)
+            transform = src.window_transform(window) if window is not None else src.transform
+            nodata = src.nodata if src.nodata is not None else self.specs['nodata_value']
+
+        metadata = self.processor.parse_filename(Path(file_path).name)
+        metadata.update({
+            'ncols': data.shape[1],
+            'nrows': data.shape[0],
+            'xllcorner': transform.c,
+            'yllcorner': transform.f + data.shape[0] * transform.e,
+            'cellsize': transform.a,
+            'nodata_value': nodata,
+            'overview_level': overview_level
+        })
+
+        return data, metadata
+
+
+def main():
+    """
+    Example usage of the bulk COG exporter
+    """
+    from prism_catalog import PRISMFileCatalog
+
+    print("="*60)
+    print("PRISM Bulk COG Export")
+    print("="*60)
+
+    input_base = Path("./prism_daily_temp_1981_2000")
+    output_base = Path("./prism_cogs")
+
+    if not input_base.exists():
+        print(f"Archive not found at {input_base}")
+        print("Please run the download scripts first")
+        return
+
+    catalog = PRISMFileCatalog(input_base / "prism_catalog.sqlite")
+    catalog.update(input_base)
+
+    # Export the 1980s of daily minimum temperature
+    files = catalog.lookup('tmin', datetime(1981, 1, 1), datetime(1990, 12, 31))
+
+    exporter = PRISMCOGExporter(resolution='4km')
+    results = exporter.export(files, output_base)
+
+    print(f"\nExported: {results['exported']}")
+    print(f"Skipped: {results['skipped']}")
+    print(f"Failed: {results['failed']}")
+
+
+if __name__ == "__main__":
+    main()
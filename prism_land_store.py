@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+PRISM Land-Cell Stores
+Converts a gridded PRISM Zarr store into a compact (cell, time) layout
+holding only land cells, for fast point time series
+"""
+
+import shutil
+import argparse
+import concurrent.futures
+import numpy as np
+import dask.array
+import xarray as xr
+import zarr
+from pathlib import Path
+from typing import List, Optional, Union
+import logging
+from tqdm import tqdm
+from prism_rechunk import PRISMRechunker, parse_memory
+from prism_manifest import PRISMChunkManifest
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class PRISMLandStore:
+    """
+    Builds land-only (cell, time) stores from gridded (time, lat, lon) stores
+
+    Cells are the grid points with data, in row-major order. The store
+    keeps a 2D 'cell_index' coordinate mapping (row, col) to the cell
+    number (-1 for ocean and nodata), plus the latitude and longitude of
+    every cell. Chunks span many years of a few cells, so one point
+    history is one chunk read. An optional hot tier writes each variable
+    as an uncompressed (cell, time) float32 .npy file, where a point
+    history is a single contiguous memory-mapped row.
+    """
+
+    LAYOUT = 'land_cells'
+
+    def __init__(self, max_mem: Union[int, str] = '2GB', max_workers: int = 4):
+        """
+        Initialize builder
+
+        Parameters:
+        -----------
+        max_mem : Union[int, str]
+            Memory cap shared by all workers, in bytes or as e.g. '2GB'
+        max_workers : int
+            Maximum number of blocks copied concurrently
+        """
+        self.max_mem = parse_memory(max_mem)
+        self.max_workers = max_workers
+        self.rechunker = PRISMRechunker(max_mem=self.max_mem, max_workers=max_workers)
+
+    def land_mask(self, ds: xr.Dataset, variables: List[str]) -> np.ndarray:
+        """
+        Grid cells with data
+
+        PRISM's nodata mask is fixed per grid, so the first day with any
+        data is read for each variable and the masks are combined.
+
+        Parameters:
+        -----------
+        ds : xr.Dataset
+            Gridded dataset (opened without dask)
+        variables : List[str]
+            Variables to include
+
+        Returns:
+        --------
+        np.ndarray: 2D boolean mask
+        """
+        mask = np.zeros((ds.sizes['lat'], ds.sizes['lon']), dtype=bool)
+        for variable in variables:
+            for t in range(ds.sizes['time']):
+                day = np.isfinite(ds[variable].isel(time=t).values)
+                if day.any():
+                    mask |= day
+                    break
+            else:
+                logger.warning(f"{variable} has no data, ignored for the land mask")
+
+        if not mask.any():
+            raise ValueError("Source store has no data to build a land mask from")
+        return mask
+
+    def copy_cells(self, source: zarr.Array, dest: zarr.Array, rows: np.ndarray,
+                   cols: np.ndarray, scratch: zarr.Group, name: str) -> None:
+        """
+        Gather the land cells of one array into the (cell, time) layout
+
+        Pass one reads whole-grid time blocks and writes the land cells of
+        each block. If the target's time chunks are longer than a block
+        that fits in memory, pass one writes an intermediate array and
+        pass two merges time with PRISMRechunker.copy_blocks.
+
+        Parameters:
+        -----------
+        source : zarr.Array
+            Gridded (time, lat, lon) array
+        dest : zarr.Array
+            (cell, time) array
+        rows : np.ndarray
+            Grid row of every cell
+        cols : np.ndarray
+            Grid column of every cell
+        scratch : zarr.Group
+            Group for the intermediate array
+        name : str
+            Variable name
+        """
+        n_times = source.shape[0]
+        n_cells = len(rows)
+        itemsize = source.dtype.itemsize
+        cell_chunk, time_chunk = dest.chunks
+
+        # A time block holds the decoded grid, the gathered cells and their transpose
+        read_bytes = int(np.prod(source.chunks)) * itemsize
+        day_bytes = (source.shape[1] * source.shape[2] + 2 * n_cells) * itemsize
+        block_days = min((source.shards or source.chunks)[0], n_times,
+                         (self.max_mem - read_bytes) // day_bytes)
+        if block_days < 1:
+            raise ValueError(f"One day of {name} needs {(read_bytes + day_bytes) / 1024 ** 2:.0f} MB, "
+                             f"more than the {self.max_mem / 1024 ** 2:.0f} MB memory cap")
+
+        if time_chunk <= block_days:
+            # Blocks of whole target chunks: write the target directly
+            block_days = block_days // time_chunk * time_chunk
+            first = dest
+        else:
+            first = scratch.create_array(name, shape=dest.shape, chunks=(cell_chunk, block_days),
+                                         dtype=dest.dtype, fill_value=dest.fill_value)
+
+        for start in tqdm(range(0, n_times, block_days), desc=f"Gathering {name} cells"):
+            stop = min(start + block_days, n_times)
+            block = source[start:stop]
+            first[:, start:stop] = np.ascontiguousarray(block[:, rows, cols].T)
+            del block
+
+        if first is not dest:
+            self.rechunker.copy_blocks(first, dest, dest.chunks, dest.chunks,
+                                       desc=f"Merging {name} time blocks")
+            del scratch[name]
+
+    def write_hot_tier(self, output_zarr: Path, variable: str, hot_path: Path) -> Path:
+        """
+        Write one variable as an uncompressed (cell, time) float32 .npy file
+
+        Parameters:
+        -----------
+        output_zarr : Path
+            Land-cell store
+        variable : str
+            Variable name
+        hot_path : Path
+            .npy file to write
+
+        Returns:
+        --------
+        Path: Path of the .npy file
+        """
+        ds = xr.open_zarr(output_zarr, chunks=None)
+        da = ds[variable]
+        cell_chunk = da.encoding['chunks'][0]
+        n_cells, n_times = da.shape
+
+        hot_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = hot_path.with_name(hot_path.name + '.tmp')
+        hot = np.lib.format.open_memmap(tmp_path, mode='w+', dtype='<f4', shape=(n_cells, n_times))
+
+        def copy(start):
+            cells = slice(start, min(start + cell_chunk, n_cells))
+            hot[cells] = da.isel(cell=cells).values
+
+        # Each task decodes one chunk column of cells
+        workers = max(1, min(self.max_workers,
+                             self.max_mem // (cell_chunk * n_times * (da.dtype.itemsize + 4))))
+        starts = range(0, n_cells, cell_chunk)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            for _ in tqdm(executor.map(copy, starts), total=len(starts),
+                          desc=f"Writing {variable} hot tier"):
+                pass
+
+        hot.flush()
+        del hot
+        ds.close()
+        tmp_path.replace(hot_path)
+        logger.info(f"Wrote hot tier {hot_path} ({n_cells * n_times * 4 / 1024 ** 3:.2f} GB)")
+        return hot_path
+
+    def build(self, source: Union[str, Path], target: Union[str, Path],
+              variables: Optional[List[str]] = None, cell_chunk: int = 128,
+              time_chunk: int = -1, hot_dir: Optional[Union[str, Path]] = None,
+              overwrite: bool = False) -> Path:
+        """
+        Build a land-cell store from a gridded store
+
+        Parameters:
+        -----------
+        source : Union[str, Path]
+            Gridded Zarr store
+        target : Union[str, Path]
+            Output land-cell store
+        variables : Optional[List[str]]
+            Variables to copy (all gridded variables if None)
+        cell_chunk : int
+            Cells per chunk
+        time_chunk : int
+            Time steps per chunk (-1 for the whole series, so a point
+            history is a single chunk)
+        hot_dir : Optional[Union[str, Path]]
+            Directory for the uncompressed .npy hot tier (none if None)
+        overwrite : bool
+            Replace an existing target store
+
+        Returns:
+        --------
+        Path: Path of the land-cell store
+        """
+        source = Path(source)
+        target = Path(target)
+        if target.exists():
+            if not overwrite:
+                raise FileExistsError(f"Target store already exists: {target}")
+            shutil.rmtree(target)
+
+        src_ds = xr.open_zarr(source)
+        grid_vars = [var for var in src_ds.data_vars if src_ds[var].dims == ('time', 'lat', 'lon')]
+        variables = variables or grid_vars
+        missing = [var for var in variables if var not in grid_vars]
+        if missing:
+            raise ValueError(f"Variables not gridded in {source}: {missing}")
+
+        decoded = xr.open_zarr(source, chunks=None)
+        mask = self.land_mask(decoded, variables)
+        decoded.close()
+
+        rows, cols = np.nonzero(mask)
+        n_cells = len(rows)
+        n_times = src_ds.sizes['time']
+        cell_index = np.full(mask.shape, -1, dtype=np.int32)
+        cell_index[rows, cols] = np.arange(n_cells, dtype=np.int32)
+        logger.info(f"{n_cells} land cells of {mask.size} ({n_cells / mask.size:.0%})")
+
+        chunks = (min(cell_chunk, n_cells), n_times if time_chunk == -1 else min(time_chunk, n_times))
+
+        # Create the target with its coordinates and metadata, but no data yet
+        template = xr.Dataset(
+            coords={
+                'cell': np.arange(n_cells, dtype=np.int32),
+                'time': src_ds['time'],
+                'lat': ('cell', src_ds['lat'].values[rows]),
+                'lon': ('cell', src_ds['lon'].values[cols]),
+                'grid_lat': ('row', src_ds['lat'].values),
+                'grid_lon': ('col', src_ds['lon'].values),
+                'cell_index': (('row', 'col'), cell_index)
+            },
+            # Pyramid levels are gridded, so the metadata listing them is dropped
+            attrs=dict({key: value for key, value in src_ds.attrs.items() if key != 'multiscales'},
+                       layout=self.LAYOUT, source_store=str(source))
+        )
+        # Per-day availability masks stay valid for every cell
+        template = template.assign_coords({name: src_ds[name].load() for name in src_ds.coords
+                                           if src_ds[name].dims == ('time',) and name != 'time'})
+        encoding = {}
+        for var in variables:
+            da = src_ds[var]
+            template[var] = xr.DataArray(dask.array.zeros((n_cells, n_times), chunks=chunks, dtype=da.dtype),
+                                         dims=('cell', 'time'), attrs=da.attrs)
+            encoding[var] = {key: value for key, value in da.encoding.items()
+                             if key not in ('chunks', 'preferred_chunks', 'shards', 'coordinates')}
+            encoding[var]['chunks'] = chunks
+
+        hot_paths = {}
+        if hot_dir is not None:
+            hot_paths = {var: str((Path(hot_dir) / f"{target.stem}_{var}.npy").resolve())
+                         for var in variables}
+            template.attrs['hot_tier'] = hot_paths
+
+        logger.info(f"Creating {target} with chunks {chunks}")
+        template.to_zarr(target, mode='w', encoding=encoding, compute=False)
+
+        src_group = zarr.open_group(str(source), mode='r')
+        dst_group = zarr.open_group(str(target), mode='r+')
+        scratch_path = target.with_name(target.name + '.cells-tmp')
+        scratch = zarr.open_group(str(scratch_path), mode='w')
+
+        try:
+            for var in variables:
+                self.copy_cells(src_group[var], dst_group[var], rows, cols, scratch, var)
+        except BaseException:
+            # A partially written target is unusable
+            shutil.rmtree(target, ignore_errors=True)
+            raise
+        finally:
+            src_ds.close()
+            shutil.rmtree(scratch_path, ignore_errors=True)
+
+        zarr.consolidate_metadata(str(target))
+        PRISMChunkManifest(target).build(max_workers=self.max_workers)
+
+        for var, hot_path in hot_paths.items():
+            self.write_hot_tier(target, var, Path(hot_path))
+
+        logger.info(f"Built land-cell store {target}")
+        return target
+
+
+def main():
+    """
+    Command line interface for building a land-cell store
+    """
+    parser = argparse.ArgumentParser(description="Build a land-only (cell, time) PRISM Zarr store")
+    parser.add_argument('source', type=Path, help="Gridded Zarr store")
+    parser.add_argument('target', type=Path, help="Output land-cell store")
+    parser.add_argument('--variables', nargs='+', help="Variables to copy (default: all)")
+    parser.add_argument('--cell-chunk', type=int, default=128, help="Cells per chunk (default: 128)")
+    parser.add_argument('--time-chunk', type=int, default=-1,
+                        help="Time steps per chunk (default: -1, the whole series)")
+    parser.add_argument('--hot-dir', type=Path, help="Write an uncompressed .npy hot tier here")
+    parser.add_argument('--max-mem', default='2GB', help="Memory cap (default: 2GB)")
+    parser.add_argument('--workers', type=int, default=4, help="Parallel blocks (default: 4)")
+    parser.add_argument('--overwrite', action='store_true', help="Replace an existing target")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("PRISM Land-Cell Store")
+    print("="*60)
+    print(f"Source: {args.source}")
+    print(f"Target: {args.target}")
+
+    builder = PRISMLandStore(max_mem=args.max_mem, max_workers=args.workers)
+    builder.build(args.source, args.target, variables=args.variables,
+                  cell_chunk=args.cell_chunk, time_chunk=args.time_chunk,
+                  hot_dir=args.hot_dir, overwrite=args.overwrite)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+PRISM Zarr Chunk Manifests
+Records a content hash and byte size for every stored chunk, and verifies
+stores against them without decompressing anything
+"""
+
+import os
+import json
+import hashlib
+import itertools
+import argparse
+import concurrent.futures
+import pandas as pd
+import zarr
+from pathlib import Path
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple, Union
+import logging
+from tqdm import tqdm
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class PRISMChunkManifest:
+    """
+    Per-chunk sha256 manifest of a Zarr store, kept next to the store
+
+    Entries map store keys (e.g. 'tmin/c/3/0/0' or 'tmin/zarr.json') to
+    [sha256, size]. Chunks that zarr did not store because they only
+    hold the fill value are listed as None, so a missing chunk file can
+    be told apart from one that was never written.
+    """
+
+    BLOCK_SIZE = 8 * 1024 ** 2
+
+    def __init__(self, zarr_path: Union[str, Path]):
+        """
+        Initialize manifest
+
+        Parameters:
+        -----------
+        zarr_path : Union[str, Path]
+            Zarr store path
+        """
+        self.zarr_path = Path(zarr_path)
+        self.manifest_path = self.zarr_path.with_name(self.zarr_path.name + '.manifest.json')
+        self.journal_path = self.zarr_path.with_name(self.zarr_path.name + '.manifest.journal')
+
+    def hash_file(self, path: Path) -> Optional[List]:
+        """
+        sha256 and size of one stored file, read sequentially
+
+        Parameters:
+        -----------
+        path : Path
+            File path
+
+        Returns:
+        --------
+        Optional[List]: [hex digest, size in bytes], or None if absent
+        """
+        digest = hashlib.sha256()
+        try:
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(self.BLOCK_SIZE), b''):
+                    digest.update(block)
+        except FileNotFoundError:
+            return None
+        return [digest.hexdigest(), path.stat().st_size]
+
+    def members(self) -> Tuple[List[Tuple[str, zarr.Array]], List[str]]:
+        """
+        Arrays and subgroups of the store at any depth (e.g. pyramid levels)
+
+        Returns:
+        --------
+        Tuple[List[Tuple[str, zarr.Array]], List[str]]: (path, array) pairs
+                                                        and subgroup paths
+        """
+        group = zarr.open_group(str(self.zarr_path), mode='r', use_consolidated=False)
+        arrays, groups = [], []
+        for path, member in group.members(max_depth=None):
+            if isinstance(member, zarr.Array):
+                arrays.append((path, member))
+            else:
+                groups.append(path)
+        return arrays, groups
+
+    def chunk_keys(self, name: str, array: zarr.Array,
+                   start: Optional[int] = None, stop: Optional[int] = None) -> List[str]:
+        """
+        Store keys of an array's chunks (of its shards, if sharded: the
+        inner chunks live inside the shard objects)
+
+        Parameters:
+        -----------
+        name : str
+            Array name
+        array : zarr.Array
+            Array
+        start : Optional[int]
+            First index along the first dimension (all chunks if None)
+        stop : Optional[int]
+            End index along the first dimension
+
+        Returns:
+        --------
+        List[str]: Chunk keys of the chunks overlapping [start, stop)
+        """
+        stored = array.shards or array.chunks
+        grid = [-(-size // chunk) for size, chunk in zip(array.shape, stored)]
+        ranges = [range(n) for n in grid]
+        if grid and start is not None:
+            first = stored[0]
+            ranges[0] = range(start // first, min(-(-stop // first), grid[0]))
+
+        encoding = array.metadata.chunk_key_encoding
+        return [f"{name}/{encoding.encode_chunk_key(coords)}" for coords in itertools.product(*ranges)]
+
+    def hash_chunks(self, names: Optional[List[str]] = None, start: Optional[int] = None,
+                    stop: Optional[int] = None, max_workers: int = 4) -> Dict[str, Optional[List]]:
+        """
+        Hash the stored chunks of arrays, optionally only along a time range
+
+        Parameters:
+        -----------
+        names : Optional[List[str]]
+            Array paths to hash, e.g. 'tmin' or '1/tmin' (all arrays if None)
+        start : Optional[int]
+            First time index written (all chunks if None)
+        stop : Optional[int]
+            End time index written
+        max_workers : int
+            Threads hashing files
+
+        Returns:
+        --------
+        Dict[str, Optional[List]]: Manifest entries
+        """
+        keys = []
+        for name, array in self.members()[0]:
+            if names is not None and name not in names:
+                continue
+            dims = array.metadata.dimension_names or ()
+            timed = start is not None and dims and dims[0] == 'time'
+            keys.extend(self.chunk_keys(name, array, start if timed else None, stop if timed else None))
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            hashes = executor.map(lambda key: self.hash_file(self.zarr_path / key), keys)
+            return dict(zip(keys, hashes))
+
+    def load(self) -> Dict:
+        """
+        Load the manifest, with entries recorded since the last finish()
+
+        Returns:
+        --------
+        Dict: Manifest with 'chunks' entries (empty if none was written)
+        """
+        manifest = {'store': self.zarr_path.name, 'chunks': {}}
+        if self.manifest_path.exists():
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        if self.journal_path.exists():
+            with open(self.journal_path) as f:
+                for line in f:
+                    # A line cut short by an interrupted run is dropped;
+                    # its chunks are hashed again when rewritten
+                    try:
+                        manifest['chunks'].update(json.loads(line))
+                    except json.JSONDecodeError:
+                        pass
+        return manifest
+
+    def record(self, entries: Dict[str, Optional[List]]) -> None:
+        """
+        Append chunk entries to the manifest's journal
+
+        Costs only the entries given, so recording every batch of a long
+        conversion stays linear; finish() folds the journal into the
+        manifest.
+
+        Parameters:
+        -----------
+        entries : Dict[str, Optional[List]]
+            Entries from hash_chunks
+        """
+        if not entries:
+            return
+        with open(self.journal_path, 'a') as f:
+            f.write(json.dumps(entries, sort_keys=True) + '\n')
+
+    def finish(self) -> None:
+        """
+        Write the manifest with the journal merged and metadata refreshed
+
+        Entries of chunks that no longer exist in the store's chunk grid
+        (e.g. after a rolled-back append) are pruned, and metadata
+        documents, which change on every write, are hashed once here.
+        """
+        manifest = self.load()
+        chunks = manifest['chunks']
+
+        arrays, groups = self.members()
+        valid = {'zarr.json'} | {f"{path}/zarr.json" for path in groups}
+        for name, array in arrays:
+            valid.add(f"{name}/zarr.json")
+            valid.update(self.chunk_keys(name, array))
+        for key in [key for key in chunks if key not in valid]:
+            del chunks[key]
+
+        for key in sorted(valid):
+            if key.endswith('zarr.json'):
+                chunks[key] = self.hash_file(self.zarr_path / key)
+
+        manifest.update(store=self.zarr_path.name, updated=datetime.now().isoformat())
+        tmp_path = self.manifest_path.with_name(self.manifest_path.name + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=0, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+        self.journal_path.unlink(missing_ok=True)
+
+    def build(self, max_workers: int = 4) -> int:
+        """
+        Hash every chunk of the store into a fresh manifest
+
+        Parameters:
+        -----------
+        max_workers : int
+            Threads hashing files
+
+        Returns:
+        --------
+        int: Number of entries
+        """
+        self.manifest_path.unlink(missing_ok=True)
+        self.journal_path.unlink(missing_ok=True)
+        self.record(self.hash_chunks(max_workers=max_workers))
+        self.finish()
+        n_entries = len(self.load()['chunks'])
+        logger.info(f"Wrote manifest {self.manifest_path} ({n_entries} entries)")
+        return n_entries
+
+    def verify(self, max_workers: int = 8) -> pd.DataFrame:
+        """
+        Check every stored file against the manifest, without decompressing
+
+        Parameters:
+        -----------
+        max_workers : int
+            Threads hashing files
+
+        Returns:
+        --------
+        pd.DataFrame: One row per problem with the key and a status:
+                      'missing', 'size_mismatch', 'hash_mismatch',
+                      'unexpected' (a chunk listed as unwritten exists) or
+                      'unlisted' (a file the manifest does not know)
+        """
+        if not self.manifest_path.exists():
+            raise FileNotFoundError(f"No manifest for {self.zarr_path}: {self.manifest_path}")
+
+        chunks = self.load()['chunks']
+        keys = sorted(chunks)
+
+        def check(key):
+            expected = chunks[key]
+            path = self.zarr_path / key
+            if expected is None:
+                return 'unexpected' if path.exists() else None
+            if not path.exists():
+                return 'missing'
+            if path.stat().st_size != expected[1]:
+                return 'size_mismatch'
+            return 'hash_mismatch' if self.hash_file(path)[0] != expected[0] else None
+
+        problems = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for key, status in zip(keys, tqdm(executor.map(check, keys), total=len(keys),
+                                              desc=f"Verifying {self.zarr_path.name}")):
+                if status:
+                    problems.append({'key': key, 'status': status})
+
+        for path in self.zarr_path.rglob('*'):
+            key = path.relative_to(self.zarr_path).as_posix()
+            if path.is_file() and key not in chunks:
+                problems.append({'key': key, 'status': 'unlisted'})
+
+        n_bytes = sum(entry[1] for entry in chunks.values() if entry)
+        logger.info(f"Verified {len(keys)} entries ({n_bytes / 1024 ** 2:.1f} MB): "
+                    f"{len(problems)} problems")
+        return pd.DataFrame(problems, columns=['key', 'status'])
+
+
+def main():
+    """
+    Command line interface for building and verifying manifests
+    """
+    parser = argparse.ArgumentParser(description="Chunk checksum manifests for PRISM Zarr stores")
+    parser.add_argument('command', choices=['build', 'verify'], help="Build a manifest or verify against one")
+    parser.add_argument('stores', type=Path, nargs='+', help="Zarr stores")
+    parser.add_argument('--workers', type=int, default=8, help="Hashing threads (default: 8)")
+    args = parser.parse_args()
+
+    failed = False
+    for store in args.stores:
+        manifest = PRISMChunkManifest(store)
+        if args.command == 'build':
+            manifest.build(max_workers=args.workers)
+            continue
+
+        problems = manifest.verify(max_workers=args.workers)
+        if len(problems):
+            failed = True
+            print(f"{store}: {len(problems)} problems")
+            print(problems.head(20).to_string(index=False))
+        else:
+            print(f"{store}: OK")
+
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
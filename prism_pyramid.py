@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+PRISM Spatial Multiscale Pyramid
+Coarsened copies of the daily grids (2x, 4x, 8x, ...) stored as groups of
+the daily store, for maps and large-area summaries
+"""
+
+import argparse
+import numpy as np
+import xarray as xr
+import zarr
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+import logging
+from prism_storage import Location, as_location, store_name, zarr_store
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def coarsen_grid(data: np.ndarray, levels: int, slab_days: int = 8) -> List[np.ndarray]:
+    """
+    NaN-aware block means of (time, lat, lon) grids at factors 2, 4, 8, ...
+
+    Each level sums the valid values and counts of 2 x 2 blocks of the
+    level below, so every coarse cell is the exact mean of the valid fine
+    cells it covers. Grids with an odd size get a partial last block.
+
+    Parameters:
+    -----------
+    data : np.ndarray
+        (time, lat, lon) float32 grids, NaN for nodata
+    levels : int
+        Number of coarsened levels
+    slab_days : int
+        Days coarsened at once (bounds the temporaries)
+
+    Returns:
+    --------
+    List[np.ndarray]: float32 (time, lat, lon) grid of each level, finest first
+    """
+    n_times, ny, nx = data.shape
+    shapes = []
+    for _ in range(levels):
+        ny, nx = -(-ny // 2), -(-nx // 2)
+        shapes.append((ny, nx))
+    out = [np.empty((n_times,) + shape, dtype='float32') for shape in shapes]
+
+    for a in range(0, n_times, slab_days):
+        b = min(a + slab_days, n_times)
+        valid = ~np.isnan(data[a:b])
+        sums = np.where(valid, data[a:b], 0).astype('float32')
+        counts = valid.astype('uint16')
+        for level, (ny, nx) in enumerate(shapes):
+            # Zero padding adds nothing to the sums or the counts
+            pad = ((0, 0), (0, 2 * ny - sums.shape[1]), (0, 2 * nx - sums.shape[2]))
+            sums = np.pad(sums, pad).reshape(b - a, ny, 2, nx, 2).sum(axis=(2, 4))
+            counts = np.pad(counts, pad).reshape(b - a, ny, 2, nx, 2).sum(axis=(2, 4), dtype='uint16')
+            with np.errstate(invalid='ignore', divide='ignore'):
+                out[level][a:b] = np.where(counts > 0, sums / counts, np.nan)
+    return out
+
+
+def coarsen_coordinate(values: np.ndarray, factor: int) -> np.ndarray:
+    """Centres of blocks of factor coordinates (a partial last block is averaged as is)"""
+    n = -(-len(values) // factor)
+    padded = np.full(n * factor, np.nan)
+    padded[:len(values)] = values
+    return np.nanmean(padded.reshape(n, factor), axis=1)
+
+
+class PRISMPyramid:
+    """
+    Spatial multiscale pyramid inside a daily PRISM store
+
+    Level k is the group '<k>' of the daily store, holding every variable
+    on a grid coarsened 2**k times in each direction by NaN-aware block
+    means, on the store's own time axis. Each day is one inner chunk, in
+    shards of a write unit of days, so a map reads one small chunk. The
+    root group carries 'multiscales' metadata listing the base arrays
+    ('.') and the levels with their scale factors.
+    """
+
+    METHOD = 'nanmean'
+
+    # Shard length (days) used when the daily store has a single time chunk
+    DEFAULT_SPAN = 365
+
+    def __init__(self, converter, output_zarr: Location, variables: List[str], levels: int = 3,
+                 span: Optional[int] = None):
+        """
+        Initialize pyramid
+
+        Parameters:
+        -----------
+        converter : PRISMToZarrConverter
+            Converter writing the daily store (grid and codecs)
+        output_zarr : Location
+            Daily Zarr store path or URL
+        variables : List[str]
+            Variable names
+        levels : int
+            Number of coarsened levels (factors 2, 4, ... 2**levels)
+        span : Optional[int]
+            Days per shard, normally the daily store's write unit
+        """
+        if levels < 1:
+            raise ValueError(f"levels must be at least 1, got {levels}")
+        self.converter = converter
+        self.output_zarr = as_location(output_zarr)
+        self.variables = list(variables)
+        self.levels = levels
+        self.span = span or self.DEFAULT_SPAN
+
+    def store(self, read_only: bool = False):
+        """zarr store (or path string) of the daily store"""
+        return self.converter.zarr_store(self.output_zarr, read_only)
+
+    def level_coords(self, level: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Latitudes and longitudes of a level's cell centres"""
+        factor = 2 ** level
+        return (coarsen_coordinate(self.converter.lat, factor),
+                coarsen_coordinate(self.converter.lon, factor))
+
+    def array_names(self) -> List[str]:
+        """Store paths of every array of the pyramid"""
+        return [f"{level}/{name}" for level in range(1, self.levels + 1)
+                for name in self.variables + ['time', 'lat', 'lon']]
+
+    def memory(self, days: Optional[int] = None) -> int:
+        """
+        Bytes held while coarsening a block of days of one variable
+
+        Parameters:
+        -----------
+        days : Optional[int]
+            Days written at once (a batch or region; one shard if None)
+
+        Returns:
+        --------
+        int: Estimated bytes (about a third of the block's grid as output,
+             plus the slab temporaries)
+        """
+        grid = len(self.converter.lat) * len(self.converter.lon)
+        return (days or self.span) * grid * 4 // 3 + 8 * grid * 12
+
+    def create_template(self, level: int, times: List, start: int = 0) -> xr.Dataset:
+        """
+        Lazy, NaN-filled dataset of one level
+
+        Parameters:
+        -----------
+        level : int
+            Pyramid level (1 is the finest coarsened level)
+        times : List
+            Time steps to cover
+        start : int
+            Index of the first step in the store (dask chunks follow the shards)
+
+        Returns:
+        --------
+        xr.Dataset: Dask-backed dataset (nothing is computed on write)
+        """
+        import dask.array as dsa
+
+        lat, lon = self.level_coords(level)
+        shape = (len(times), len(lat), len(lon))
+        first = min(self.span - start % self.span, shape[0])
+        rest = shape[0] - first
+        time_chunks = ((first,) + (self.span,) * (rest // self.span)
+                       + ((rest % self.span,) if rest % self.span else ()))
+        ds = xr.Dataset(coords={'time': list(times), 'lat': lat, 'lon': lon})
+        for variable in self.variables:
+            attrs = dict(self.converter.VARIABLE_INFO.get(variable, {}),
+                         cell_methods=f"lat: lon: mean ({2 ** level}x{2 ** level} blocks)")
+            ds[variable] = (('time', 'lat', 'lon'),
+                            dsa.full(shape, np.nan, dtype='float32', chunks=(time_chunks,) + shape[1:]),
+                            attrs)
+        self.converter.set_attributes(ds)
+        ds.attrs.update(multiscale_level=level, scale_factor=2 ** level)
+        return ds
+
+    def encoding(self, level: int) -> Dict[str, Dict]:
+        """Encoding of a level: one day per inner chunk, span days per shard"""
+        lat, lon = self.level_coords(level)
+        encoding = {}
+        for variable in self.variables:
+            try:
+                codecs = self.converter.codec_encoding(variable, 'float32')
+            except ValueError:
+                # Delta pipelines only apply to packed integers
+                codecs = {}
+            encoding[variable] = dict(codecs, chunks=(1, len(lat), len(lon)),
+                                      shards=(self.span, len(lat), len(lon)))
+        return encoding
+
+    def level_length(self, level: int) -> Optional[int]:
+        """
+        Time length of an existing level holding every variable, None
+        otherwise; existing levels also set the shard length used
+        """
+        try:
+            group = zarr.open_group(self.store(), mode='r', path=str(level),
+                                    use_consolidated=False)
+        except (FileNotFoundError, zarr.errors.GroupNotFoundError):
+            return None
+        names = set(group.array_keys())
+        if not all(variable in names for variable in self.variables) or 'time' not in names:
+            return None
+        array = group[self.variables[0]]
+        self.span = (array.shards or array.chunks)[0]
+        return group['time'].shape[0]
+
+    def initialize(self, times: List, offset: int = 0, overwrite: bool = False) -> bool:
+        """
+        Create the levels, or extend them to cover new time steps
+
+        Levels missing days the daily store already holds (stores
+        converted before the pyramid was requested) are filled from it.
+
+        Parameters:
+        -----------
+        times : List
+            Time steps written by this run, starting at index offset
+        offset : int
+            Time steps the daily store held before this run
+        overwrite : bool
+            Replace existing levels
+
+        Returns:
+        --------
+        bool: True if a level was created (it holds no data yet)
+        """
+        axis = list(times)
+        if offset:
+            daily = xr.open_zarr(self.store(read_only=True), consolidated=False)
+            axis = list(daily.indexes['time'][:offset]) + axis
+            daily.close()
+
+        fill_from, created = offset, False
+        for level in range(1, self.levels + 1):
+            length = None if overwrite else self.level_length(level)
+            if length is None or length > len(axis):
+                logger.info(f"Creating pyramid level {level} ({2 ** level}x) in {self.output_zarr}")
+                self.create_template(level, axis).to_zarr(
+                    self.store(), group=str(level), mode='w', encoding=self.encoding(level),
+                    compute=False, consolidated=False)
+                fill_from, created = 0, True
+                continue
+            if length > offset and length < len(axis):
+                # Steps past the daily store were left by an interrupted run
+                group = zarr.open_group(self.store(), mode='r+', path=str(level),
+                                        use_consolidated=False)
+                for name in self.variables + ['time']:
+                    group[name].resize((offset,) + group[name].shape[1:])
+                length = offset
+            if length < len(axis):
+                self.create_template(level, axis[length:], length).to_zarr(
+                    self.store(), group=str(level), mode='a', append_dim='time',
+                    compute=False, consolidated=False)
+            fill_from = min(fill_from, length)
+
+        if fill_from < offset:
+            self.fill(fill_from, offset)
+        return created
+
+    def write(self, data: Dict[str, np.ndarray], start: int) -> None:
+        """
+        Coarsen a block of days and write it into every level
+
+        Parameters:
+        -----------
+        data : Dict[str, np.ndarray]
+            (time, lat, lon) float32 grids per variable, NaN for nodata
+        start : int
+            Index of the first day in the store
+        """
+        for variable, values in data.items():
+            region = {'time': slice(start, start + len(values))}
+            for level, coarse in enumerate(coarsen_grid(values, self.levels), 1):
+                xr.Dataset({variable: (('time', 'lat', 'lon'), coarse)}).to_zarr(
+                    self.store(), group=str(level), region=region, consolidated=False)
+
+    def fill(self, start: int, stop: int) -> None:
+        """
+        Build the levels of a range of days from the daily store
+
+        Parameters:
+        -----------
+        start : int
+            First time index
+        stop : int
+            End time index
+        """
+        logger.info(f"Building pyramid levels for time steps {start}:{stop} from {self.output_zarr}")
+        daily = xr.open_zarr(self.store(read_only=True), chunks=None, consolidated=False)
+        try:
+            for a in range(start, stop, self.span):
+                b = min((a // self.span + 1) * self.span, stop)
+                for variable in self.variables:
+                    values = daily[variable].isel(time=slice(a, b)).values.astype('float32')
+                    self.write({variable: values}, a)
+        finally:
+            daily.close()
+
+    def finish(self) -> None:
+        """Record the multiscales metadata on the root group"""
+        datasets = [{'path': '.', 'level': 0,
+                     'coordinateTransformations': [{'type': 'scale', 'scale': [1, 1, 1]}]}]
+        for level in range(1, self.levels + 1):
+            factor = 2 ** level
+            datasets.append({'path': str(level), 'level': level,
+                             'coordinateTransformations': [{'type': 'scale', 'scale': [1, factor, factor]}]})
+
+        group = zarr.open_group(self.store(), mode='r+', use_consolidated=False)
+        group.attrs['multiscales'] = [{
+            'version': '0.4',
+            'name': Path(store_name(self.output_zarr)).stem,
+            'type': self.METHOD,
+            'axes': [{'name': 'time', 'type': 'time'},
+                     {'name': 'lat', 'type': 'space', 'unit': 'degree'},
+                     {'name': 'lon', 'type': 'space', 'unit': 'degree'}],
+            'datasets': datasets,
+            'metadata': {'method': 'NaN-aware 2x2 block mean of the level below',
+                         'variables': self.variables}
+        }]
+
+
+def read_multiscales(zarr_path: Location, storage_options: Optional[Dict] = None) -> List[Dict]:
+    """
+    Levels listed in a store's multiscales metadata
+
+    Parameters:
+    -----------
+    zarr_path : Location
+        Daily Zarr store path or URL
+    storage_options : Optional[Dict]
+        fsspec options for URLs
+
+    Returns:
+    --------
+    List[Dict]: 'path', 'level' and 'factor' of every level, base first
+                (only the base if the store has no pyramid); listed levels
+                missing from the store are skipped with a warning
+    """
+    group = zarr.open_group(zarr_store(as_location(zarr_path), storage_options, read_only=True), mode='r')
+    multiscales = group.attrs.get('multiscales') or [{'datasets': [{'path': '.', 'level': 0}]}]
+    levels = []
+    for dataset in multiscales[0]['datasets']:
+        if dataset['path'] != '.' and dataset['path'] not in group:
+            logger.warning(f"{zarr_path} lists pyramid level {dataset['path']}, which it does not contain")
+            continue
+        scale = dataset.get('coordinateTransformations', [{'scale': [1, 1, 1]}])[0]['scale']
+        levels.append({'path': dataset['path'], 'level': dataset.get('level', len(levels)),
+                       'factor': int(scale[-1])})
+    return levels
+
+
+def main():
+    """
+    Command line interface for adding a pyramid to an existing store
+    """
+    from prism_to_zarr import PRISMToZarrConverter
+    from prism_manifest import PRISMChunkManifest
+
+    parser = argparse.ArgumentParser(description="Add a spatial multiscale pyramid to a PRISM Zarr store")
+    parser.add_argument('store', type=Path, help="Daily Zarr store")
+    parser.add_argument('--levels', type=int, default=3, help="Coarsened levels (default: 3, i.e. 2x 4x 8x)")
+    args = parser.parse_args()
+
+    ds = xr.open_zarr(args.store)
+    converter = PRISMToZarrConverter(ds.attrs.get('resolution', '4km'))
+    variables = [name for name in ds.data_vars if ds[name].dims == ('time', 'lat', 'lon')]
+    array = zarr.open_group(str(args.store), mode='r')[variables[0]]
+    n_times = ds.sizes['time']
+    ds.close()
+
+    span = (array.shards or array.chunks)[0]
+    pyramid = PRISMPyramid(converter, args.store, variables, args.levels,
+                           span if span < n_times else None)
+    pyramid.initialize([], offset=n_times, overwrite=True)
+    pyramid.finish()
+    zarr.consolidate_metadata(str(args.store))
+
+    chunk_manifest = PRISMChunkManifest(args.store)
+    if chunk_manifest.manifest_path.exists():
+        chunk_manifest.record(chunk_manifest.hash_chunks(names=pyramid.array_names()))
+        chunk_manifest.finish()
+
+    for level in read_multiscales(args.store):
+        print(f"  level {level['level']} ({level['factor']}x): {level['path']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+PRISM Zarr Rechunker
+Converts an existing PRISM Zarr store to another chunk layout with bounded
+memory, through an intermediate store
+"""
+
+import shutil
+import argparse
+import itertools
+import concurrent.futures
+import numpy as np
+import xarray as xr
+import zarr
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple, Union
+import logging
+from tqdm import tqdm
+from prism_to_zarr import PRISMToZarrConverter, parse_memory
+from prism_manifest import PRISMChunkManifest
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class PRISMRechunker:
+    """
+    Two-pass rechunking of PRISM Zarr stores
+
+    Pass one copies source chunks into an intermediate store whose chunks
+    are no larger than either layout along each dimension, pass two
+    assembles target chunks from it. Every task writes whole chunks of its
+    destination, so tasks run in parallel without sharing chunks. Block
+    sizes and worker counts are chosen so that the blocks in flight, plus
+    the source chunk each task decodes, stay within the memory cap.
+    """
+
+    def __init__(self, max_mem: Union[int, str] = '2GB', max_workers: int = 4):
+        """
+        Initialize rechunker
+
+        Parameters:
+        -----------
+        max_mem : Union[int, str]
+            Memory cap shared by all workers, in bytes or as e.g. '2GB'
+        max_workers : int
+            Maximum number of blocks copied concurrently
+        """
+        self.max_mem = parse_memory(max_mem)
+        self.max_workers = max_workers
+
+    def target_chunks(self, dims: Tuple[str, ...], shape: Tuple[int, ...],
+                      source_chunks: Tuple[int, ...], chunks: Dict[str, int]) -> Tuple[int, ...]:
+        """
+        Resolve the target chunk shape of one array
+
+        Parameters:
+        -----------
+        dims : Tuple[str, ...]
+            Dimension names
+        shape : Tuple[int, ...]
+            Array shape
+        source_chunks : Tuple[int, ...]
+            Current chunk shape (kept for dimensions missing from chunks)
+        chunks : Dict[str, int]
+            Chunk length per dimension (-1 means the whole dimension)
+
+        Returns:
+        --------
+        Tuple[int, ...]: Target chunk shape
+        """
+        target = []
+        for dim, size, source in zip(dims, shape, source_chunks):
+            chunk = chunks.get(dim, source)
+            target.append(size if chunk == -1 else min(chunk, size))
+        return tuple(target)
+
+    def target_shards(self, dims: Tuple[str, ...], shape: Tuple[int, ...],
+                      target_chunks: Tuple[int, ...], shards: Dict[str, int]) -> Tuple[int, ...]:
+        """
+        Resolve the target shard shape of one array
+
+        Parameters:
+        -----------
+        dims : Tuple[str, ...]
+            Dimension names
+        shape : Tuple[int, ...]
+            Array shape
+        target_chunks : Tuple[int, ...]
+            Inner chunk shape (kept for dimensions missing from shards)
+        shards : Dict[str, int]
+            Shard length per dimension (-1 means the whole dimension)
+
+        Returns:
+        --------
+        Tuple[int, ...]: Shard shape, a multiple of the inner chunks
+        """
+        outer = self.target_chunks(dims, shape, target_chunks, shards)
+        return tuple(-(-shard // chunk) * chunk for shard, chunk in zip(outer, target_chunks))
+
+    def intermediate_chunks(self, shape: Tuple[int, ...], source_chunks: Tuple[int, ...],
+                            target_chunks: Tuple[int, ...]) -> Tuple[int, ...]:
+        """
+        Chunk shape of the intermediate store
+
+        The smaller of the source and target chunk along each dimension
+        (the target chunk where one source chunk spans the dimension), so
+        pass one splits source chunks and pass two only merges.
+
+        Parameters:
+        -----------
+        shape : Tuple[int, ...]
+            Array shape
+        source_chunks : Tuple[int, ...]
+            Source chunk shape
+        target_chunks : Tuple[int, ...]
+            Target chunk shape
+
+        Returns:
+        --------
+        Tuple[int, ...]: Intermediate chunk shape
+        """
+        inter = []
+        for size, source, target in zip(shape, source_chunks, target_chunks):
+            inter.append(target if source >= size else min(source, target))
+        return tuple(inter)
+
+    def fit_block(self, block: Tuple[int, ...], unit: Tuple[int, ...],
+                  itemsize: int, budget: int) -> Tuple[int, ...]:
+        """
+        Shrink a block, in whole units, until it fits a memory budget
+
+        Parameters:
+        -----------
+        block : Tuple[int, ...]
+            Preferred block shape (a multiple of unit, or the array extent)
+        unit : Tuple[int, ...]
+            Destination chunk shape; blocks are multiples of it
+        itemsize : int
+            Bytes per element
+        budget : int
+            Bytes available to one block
+
+        Returns:
+        --------
+        Tuple[int, ...]: Block shape
+        """
+        block = list(block)
+        while int(np.prod(block)) * itemsize > budget:
+            ratios = [b / u for b, u in zip(block, unit)]
+            dim = int(np.argmax(ratios))
+            if ratios[dim] <= 1:
+                raise ValueError(f"One chunk {tuple(unit)} needs "
+                                 f"{int(np.prod(unit)) * itemsize / 1024 ** 2:.0f} MB, more than the "
+                                 f"{budget / 1024 ** 2:.0f} MB memory cap; raise max_mem or choose "
+                                 f"smaller chunks")
+            block[dim] = unit[dim] * int(np.ceil(ratios[dim] / 2))
+        return tuple(block)
+
+    def plan_blocks(self, shape: Tuple[int, ...], block: Tuple[int, ...]) -> List[Tuple[slice, ...]]:
+        """
+        Tile an array with blocks
+
+        Parameters:
+        -----------
+        shape : Tuple[int, ...]
+            Array shape
+        block : Tuple[int, ...]
+            Block shape
+
+        Returns:
+        --------
+        List[Tuple[slice, ...]]: Block selections
+        """
+        ranges = [[slice(start, min(start + step, size)) for start in range(0, size, step)]
+                  for size, step in zip(shape, block)]
+        return list(itertools.product(*ranges))
+
+    def copy_blocks(self, source: zarr.Array, dest: zarr.Array, block: Tuple[int, ...],
+                    unit: Tuple[int, ...], desc: str) -> None:
+        """
+        Copy an array block by block into a differently chunked array
+
+        Parameters:
+        -----------
+        source : zarr.Array
+            Array to read
+        dest : zarr.Array
+            Array to write (same shape)
+        block : Tuple[int, ...]
+            Preferred block shape, a multiple of the destination chunks
+        unit : Tuple[int, ...]
+            Destination chunk shape
+        desc : str
+            Progress bar label
+        """
+        itemsize = source.dtype.itemsize
+        # Zarr decodes whole source chunks, even for partial reads
+        read_bytes = int(np.prod(source.chunks)) * itemsize
+        unit_bytes = int(np.prod(unit)) * itemsize
+        if read_bytes + unit_bytes > self.max_mem:
+            raise ValueError(f"{desc} needs at least {(read_bytes + unit_bytes) / 1024 ** 2:.0f} MB "
+                             f"(one source chunk plus one destination chunk), more than the "
+                             f"{self.max_mem / 1024 ** 2:.0f} MB memory cap")
+
+        # Prefer large blocks (each source chunk decoded once), then as many
+        # workers as the cap allows
+        block = self.fit_block(block, unit, itemsize, self.max_mem - read_bytes)
+
+        block_bytes = int(np.prod(block)) * itemsize
+        workers = max(1, min(self.max_workers, self.max_mem // (block_bytes + read_bytes)))
+        blocks = self.plan_blocks(source.shape, block)
+
+        logger.info(f"{desc}: {len(blocks)} blocks of {block} "
+                    f"({block_bytes / 1024 ** 2:.0f} MB) with {workers} workers")
+
+        def copy(selection):
+            dest[selection] = source[selection]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            for _ in tqdm(executor.map(copy, blocks), total=len(blocks), desc=desc):
+                pass
+
+    def rechunk(self, source: Union[str, Path], target: Union[str, Path],
+                chunks: Union[str, Dict[str, int]],
+                temp_store: Optional[Union[str, Path]] = None,
+                overwrite: bool = False) -> Path:
+        """
+        Rechunk every data variable of a store into a new store
+
+        Parameters:
+        -----------
+        source : Union[str, Path]
+            Existing Zarr store
+        target : Union[str, Path]
+            Output Zarr store
+        chunks : Union[str, Dict[str, int]]
+            Name of a PRISMToZarrConverter chunk strategy, or a chunk length
+            per dimension (-1 means the whole dimension), optionally with a
+            'shards' dict of shard lengths per dimension
+        temp_store : Optional[Union[str, Path]]
+            Intermediate store (next to target if None); removed afterwards
+        overwrite : bool
+            Replace an existing target store
+
+        Returns:
+        --------
+        Path: Path of the target store
+        """
+        source = Path(source)
+        target = Path(target)
+        temp_store = Path(temp_store) if temp_store else target.with_name(target.name + '.rechunk-tmp')
+
+        if isinstance(chunks, str):
+            chunks = PRISMToZarrConverter.CHUNK_CONFIGS[chunks]
+
+        if target.exists():
+            if not overwrite:
+                raise FileExistsError(f"Target store already exists: {target}")
+            shutil.rmtree(target)
+        if temp_store.exists():
+            shutil.rmtree(temp_store)
+
+        src_ds = xr.open_zarr(source)
+        src_group = zarr.open_group(str(source), mode='r')
+
+        # Create the target with its coordinates and metadata, but no data yet;
+        # coordinates (e.g. availability masks) are small and written eagerly
+        template = src_ds.assign_coords({name: src_ds[name].load() for name in src_ds.coords})
+        # Pyramid levels are not copied, so neither is the metadata listing them
+        template.attrs.pop('multiscales', None)
+        encoding = {}
+        layouts = {}
+        for var in src_ds.data_vars:
+            da = src_ds[var]
+            src_array = src_group[var]
+            target_chunks = self.target_chunks(da.dims, src_array.shape, src_array.chunks, chunks)
+            encoding[var] = {key: value for key, value in da.encoding.items()
+                             if key not in ('chunks', 'preferred_chunks', 'shards', 'coordinates')}
+            encoding[var]['chunks'] = target_chunks
+            if 'shards' in chunks:
+                # Shards are the units written; their inner chunks are never written alone
+                target_chunks = self.target_shards(da.dims, src_array.shape, target_chunks,
+                                                   chunks['shards'])
+                encoding[var]['shards'] = target_chunks
+            # Sharded sources are read a shard at a time
+            layouts[var] = (src_array.shards or src_array.chunks, target_chunks)
+
+            template[var] = da.chunk(dict(zip(da.dims, target_chunks)))
+
+        logger.info(f"Creating {target}")
+        template.to_zarr(target, mode='w', encoding=encoding, compute=False)
+        dst_group = zarr.open_group(str(target), mode='r+')
+        inter_group = zarr.open_group(str(temp_store), mode='w')
+
+        try:
+            for var, (source_chunks, target_chunks) in layouts.items():
+                src_array = src_group[var]
+                dst_array = dst_group[var]
+                shape = src_array.shape
+                inter_chunks = self.intermediate_chunks(shape, source_chunks, target_chunks)
+
+                # Pass one reads about one source chunk per block, rounded up to whole
+                # intermediate chunks so that no two blocks write the same chunk
+                source_block = tuple(min(size, -(-min(source, size) // inter) * inter)
+                                     for size, source, inter in zip(shape, source_chunks, inter_chunks))
+
+                if inter_chunks == target_chunks:
+                    # Target chunks are no larger than source chunks: one pass
+                    self.copy_blocks(src_array, dst_array, source_block, target_chunks,
+                                     desc=f"Rechunking {var}")
+                    continue
+
+                inter_array = inter_group.create_array(
+                    var, shape=shape, chunks=inter_chunks, dtype=src_array.dtype,
+                    fill_value=src_array.fill_value
+                )
+                self.copy_blocks(src_array, inter_array, source_block, inter_chunks,
+                                 desc=f"Rechunking {var} (pass 1/2)")
+                self.copy_blocks(inter_array, dst_array, target_chunks, target_chunks,
+                                 desc=f"Rechunking {var} (pass 2/2)")
+                del inter_group[var]
+        except BaseException:
+            # A partially written target is unusable
+            shutil.rmtree(target, ignore_errors=True)
+            raise
+        finally:
+            src_ds.close()
+            shutil.rmtree(temp_store, ignore_errors=True)
+
+        zarr.consolidate_metadata(str(target))
+        PRISMChunkManifest(target).build(max_workers=self.max_workers)
+        logger.info(f"Rechunked {source} into {target}")
+        return target
+
+
+def main():
+    """
+    Command line interface for rechunking a store
+    """
+    parser = argparse.ArgumentParser(description="Rechunk a PRISM Zarr store with bounded memory")
+    parser.add_argument('source', type=Path, help="Existing Zarr store")
+    parser.add_argument('target', type=Path, help="Output Zarr store")
+    parser.add_argument('--strategy', default='space_optimized',
+                        choices=sorted(PRISMToZarrConverter.CHUNK_CONFIGS),
+                        help="Target chunk strategy (default: space_optimized)")
+    parser.add_argument('--time', type=int, help="Custom time chunk (-1 for all time)")
+    parser.add_argument('--lat', type=int, help="Custom latitude chunk")
+    parser.add_argument('--lon', type=int, help="Custom longitude chunk")
+    parser.add_argument('--max-mem', default='2GB', help="Memory cap (default: 2GB)")
+    parser.add_argument('--workers', type=int, default=4, help="Parallel blocks (default: 4)")
+    parser.add_argument('--temp', type=Path, help="Intermediate store location")
+    parser.add_argument('--overwrite', action='store_true', help="Replace an existing target")
+    args = parser.parse_args()
+
+    chunks = dict(PRISMToZarrConverter.CHUNK_CONFIGS[args.strategy])
+    for dim in ('time', 'lat', 'lon'):
+        if getattr(args, dim) is not None:
+            chunks[dim] = getattr(args, dim)
+
+    print("="*60)
+    print("PRISM Zarr Rechunker")
+    print("="*60)
+    print(f"Source: {args.source}")
+    print(f"Target: {args.target} {chunks}")
+
+    rechunker = PRISMRechunker(max_mem=args.max_mem, max_workers=args.workers)
+    rechunker.rechunk(args.source, args.target, chunks, temp_store=args.temp,
+                      overwrite=args.overwrite)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+PRISM Virtual Zarr References
+Builds kerchunk-style reference files that expose extracted BIL files as a
+Zarr dataset, with no conversion and no copy of the data
+"""
+
+import json
+import base64
+import argparse
+import concurrent.futures
+import numpy as np
+import xarray as xr
+import zarr
+from pathlib import Path
+from datetime import datetime
+from typing import List, Dict, Optional, Union
+import logging
+from prism_to_zarr import PRISMToZarrConverter
+from prism_catalog import PRISMFileCatalog
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class PRISMReferenceBuilder:
+    """
+    Kerchunk (version 1) references over an extracted PRISM BIL archive
+
+    A .bil file is a raw little-endian float32 grid in row-major order, so
+    every band of row_chunk rows is one contiguous byte range. Each
+    (1 day, row_chunk, ncols) chunk of the virtual array refers to such a
+    range of that day's file. Single-day maps read whole files, and point
+    series read one band per day. Coordinates, attributes and availability
+    masks are inlined, and days without a valid file read as NaN.
+    """
+
+    def __init__(self, resolution: str = '4km', row_chunk: int = 27, max_workers: int = 8):
+        """
+        Initialize reference builder
+
+        Parameters:
+        -----------
+        resolution : str
+            PRISM data resolution ('4km' or '800m')
+        row_chunk : int
+            Grid rows per chunk; must divide the number of rows, because
+            uncompressed edge chunks cannot be shorter than the others
+        max_workers : int
+            Threads checking BIL headers
+        """
+        self.converter = PRISMToZarrConverter(resolution)
+        self.processor = self.converter.processor
+        self.specs = self.converter.specs
+        if self.specs['nrows'] % row_chunk:
+            raise ValueError(f"row_chunk {row_chunk} does not divide the {self.specs['nrows']} grid rows")
+        self.row_chunk = row_chunk
+        self.max_workers = max_workers
+
+    def bil_path(self, file_path: Path) -> Path:
+        """
+        Extracted .bil file of a PRISM zip
+
+        Parameters:
+        -----------
+        file_path : Path
+            PRISM zip, or a .bil file
+
+        Returns:
+        --------
+        Path: .bil path where PRISMProcessor.extract_zip puts it
+        """
+        if file_path.suffix == '.bil':
+            return file_path
+        return file_path.parent / file_path.stem / f"{file_path.stem}.bil"
+
+    def check_bil(self, bil_path: Path) -> bool:
+        """
+        Whether a .bil file holds a raw float32 little-endian grid of this
+        resolution that can be referenced as is
+
+        Parameters:
+        -----------
+        bil_path : Path
+            .bil file path
+
+        Returns:
+        --------
+        bool: True if the file can be referenced
+        """
+        hdr_path = bil_path.with_suffix('.hdr')
+        if not bil_path.exists() or not hdr_path.exists():
+            return False
+
+        header = self.processor.read_bil_header(hdr_path)
+        expected = {'nrows': self.specs['nrows'], 'ncols': self.specs['ncols'],
+                    'nbits': 32, 'pixeltype': 'FLOAT', 'byteorder': 'I'}
+        mismatched = [key for key, value in expected.items() if header.get(key, value) != value]
+        if mismatched:
+            logger.warning(f"{bil_path.name}: unexpected {', '.join(mismatched)} in header")
+            return False
+        if header.get('nodata', self.specs['nodata_value']) != self.specs['nodata_value']:
+            logger.warning(f"{bil_path.name}: unexpected nodata value")
+            return False
+
+        size = self.specs['nrows'] * self.specs['ncols'] * 4
+        if bil_path.stat().st_size != size:
+            logger.warning(f"{bil_path.name}: {bil_path.stat().st_size} bytes, expected {size}")
+            return False
+        return True
+
+    def metadata_references(self, variables: List[str], times: List,
+                            available: Dict[str, np.ndarray]) -> Dict[str, str]:
+        """
+        Zarr v2 metadata and inlined coordinates of the virtual dataset
+
+        The dataset is written by xarray to an in-memory store without its
+        data, so the time encoding and attributes match converted stores.
+
+        Parameters:
+        -----------
+        variables : List[str]
+            Variable names
+        times : List
+            Complete daily time axis
+        available : Dict[str, np.ndarray]
+            Per-day availability mask per variable
+
+        Returns:
+        --------
+        Dict[str, str]: Reference entries (JSON documents and base64 chunks)
+        """
+        import dask.array as dsa
+
+        shape = (len(times), self.specs['nrows'], self.specs['ncols'])
+        chunks = (1, self.row_chunk, self.specs['ncols'])
+        data = {variable: dsa.zeros(shape, dtype='float32', chunks=chunks) for variable in variables}
+        template = self.converter.create_batch_dataset(data, times, available)
+        template.attrs['original_format'] = 'BIL (virtual Zarr references)'
+
+        encoding = {variable: {'chunks': chunks, 'dtype': '<f4', 'compressors': None,
+                               '_FillValue': self.specs['nodata_value']}
+                    for variable in variables}
+        store_dict = {}
+        store = zarr.storage.MemoryStore(store_dict)
+        template.to_zarr(store, zarr_format=2, encoding=encoding, compute=False)
+
+        refs = {}
+        for key, buffer in store_dict.items():
+            raw = buffer.to_bytes()
+            if key.rsplit('/', 1)[-1].startswith('.z'):
+                refs[key] = raw.decode()
+            else:
+                refs[key] = 'base64:' + base64.b64encode(raw).decode()
+        return refs
+
+    def build(self, input_dir: Path, variables: Union[str, List[str]],
+              start_date: datetime, end_date: datetime, output_json: Path,
+              catalog: Optional[PRISMFileCatalog] = None, extract: bool = False) -> Path:
+        """
+        Write a reference file for the daily files of one or more variables
+
+        Parameters:
+        -----------
+        input_dir : Path
+            Directory containing PRISM zips (or per-variable subdirectories)
+            next to their extracted directories
+        variables : Union[str, List[str]]
+            Variable name, or several variables sharing one time axis
+        start_date : datetime
+            Start date
+        end_date : datetime
+            End date
+        output_json : Path
+            Reference file to write
+        catalog : Optional[PRISMFileCatalog]
+            File catalog to look the files up in
+        extract : bool
+            Extract zips whose .bil file is missing
+
+        Returns:
+        --------
+        Path: Path of the reference file
+        """
+        variables = [variables] if isinstance(variables, str) else list(variables)
+        files = {variable: self.converter.find_files(input_dir, variable, start_date, end_date, catalog)
+                 for variable in variables}
+        files = {variable: entries for variable, entries in files.items() if entries}
+        if not files:
+            raise ValueError(f"No {', '.join(variables)} files between {start_date:%Y-%m-%d} "
+                             f"and {end_date:%Y-%m-%d}")
+        variables = list(files)
+        days, times = self.converter.build_time_axis(files)
+
+        if extract:
+            for variable in variables:
+                for file_path, _ in files[variable]:
+                    if not self.bil_path(file_path).exists() and file_path.suffix == '.zip':
+                        self.processor.extract_zip(file_path)
+
+        # Each distinct directory becomes a template, so paths are not repeated per chunk
+        templates = {}
+        band_bytes = self.row_chunk * self.specs['ncols'] * 4
+        n_bands = self.specs['nrows'] // self.row_chunk
+        refs, available = {}, {}
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for variable in variables:
+                bil_paths = [self.bil_path(file_path) if file_path else None for file_path, _ in days[variable]]
+                valid = list(executor.map(lambda path: path is not None and self.check_bil(path), bil_paths))
+                available[variable] = np.array(valid, dtype=bool)
+
+                for i, (bil_path, ok) in enumerate(zip(bil_paths, valid)):
+                    if not ok:
+                        continue
+                    directory = str(bil_path.parent.parent.resolve())
+                    name = templates.setdefault(directory, f"d{len(templates)}")
+                    url = f"{{{{{name}}}}}/{bil_path.parent.name}/{bil_path.name}"
+                    for band in range(n_bands):
+                        refs[f"{variable}/{i}.{band}.0"] = [url, band * band_bytes, band_bytes]
+
+                expected = sum(file_path is not None for file_path, _ in days[variable])
+                if available[variable].sum() < expected:
+                    logger.warning(f"{expected - int(available[variable].sum())} {variable} files "
+                                   f"have no usable extracted .bil; they read as NaN")
+
+        refs.update(self.metadata_references(variables, times, available))
+
+        output_json = Path(output_json)
+        with open(output_json, 'w') as f:
+            json.dump({'version': 1, 'templates': {name: directory for directory, name in templates.items()},
+                       'refs': refs}, f, separators=(',', ':'))
+
+        logger.info(f"Wrote {output_json}: {len(times)} days of {', '.join(variables)} "
+                    f"referencing {int(sum(mask.sum() for mask in available.values()))} files")
+        return output_json
+
+
+def open_references(reference_path: Union[str, Path], **kwargs) -> xr.Dataset:
+    """
+    Open a reference file as a lazy xarray dataset
+
+    Parameters:
+    -----------
+    reference_path : Union[str, Path]
+        Reference JSON written by PRISMReferenceBuilder
+    **kwargs
+        Passed to xr.open_zarr (e.g. chunks)
+
+    Returns:
+    --------
+    xr.Dataset: Dataset reading straight from the BIL files
+    """
+    return xr.open_zarr('reference://', storage_options={'fo': str(reference_path)}, **kwargs)
+
+
+def main():
+    """
+    Command line interface for building reference files
+    """
+    parser = argparse.ArgumentParser(description="Build virtual Zarr references over extracted PRISM BIL files")
+    parser.add_argument('input_dir', type=Path, help="Directory of PRISM zips and their extracted directories")
+    parser.add_argument('output', type=Path, help="Reference JSON to write")
+    parser.add_argument('--variables', nargs='+', default=['tmin', 'tmax'], help="Variables (default: tmin tmax)")
+    parser.add_argument('--start', default='1981-01-01', help="Start date (default: 1981-01-01)")
+    parser.add_argument('--end', default='2000-12-31', help="End date (default: 2000-12-31)")
+    parser.add_argument('--row-chunk', type=int, default=27, help="Grid rows per chunk (default: 27)")
+    parser.add_argument('--extract', action='store_true', help="Extract zips without an extracted .bil")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("PRISM Virtual Zarr References")
+    print("="*60)
+
+    builder = PRISMReferenceBuilder(row_chunk=args.row_chunk)
+    builder.build(args.input_dir, args.variables, datetime.fromisoformat(args.start),
+                  datetime.fromisoformat(args.end), args.output, extract=args.extract)
+
+    ds = open_references(args.output)
+    print(ds)
+    ds.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+PRISM Year Stacks
+Consolidates each variable-year of daily zips into one memory-mappable
+float32 stack, used as an intermediate cache for repeated conversions
+"""
+
+import os
+import json
+import calendar
+import concurrent.futures
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Tuple, Union
+import logging
+from tqdm import tqdm
+from process_prism_data import PRISMProcessor
+from prism_catalog import PRISMFileCatalog
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class PRISMYearStack:
+    """
+    One uncompressed (day, lat, lon) float32 .npy file per variable-year
+
+    Day i of a stack is January 1 + i, so the index is pure arithmetic.
+    Nodata cells and days without a source file are stored as NaN. A
+    <stack>.json sidecar records the source file (name and mtime) and the
+    availability of every day, so stacks built from an older file set are
+    recognised as stale.
+    """
+
+    def __init__(self, stack_dir: Union[str, Path], resolution: str = '4km'):
+        """
+        Initialize stack cache
+
+        Parameters:
+        -----------
+        stack_dir : Union[str, Path]
+            Directory holding the stacks (one subdirectory per variable)
+        resolution : str
+            PRISM data resolution ('4km' or '800m')
+        """
+        self.stack_dir = Path(stack_dir)
+        self.processor = PRISMProcessor(resolution)
+        self.resolution = resolution
+        self.specs = self.processor.specs
+        # Sidecar contents and staleness checks per (variable, year)
+        self.sidecars = {}
+        self.fresh = {}
+
+    def stack_path(self, variable: str, year: int) -> Path:
+        """Path of the stack for one variable-year"""
+        return self.stack_dir / variable / f"PRISM_{variable}_{self.resolution}_{year}_stack.npy"
+
+    def sidecar_path(self, variable: str, year: int) -> Path:
+        """Path of the sources and availability sidecar of a stack"""
+        return self.stack_path(variable, year).with_suffix('.json')
+
+    @staticmethod
+    def sources(files: List[Tuple[Optional[Path], datetime]], year: int) -> Dict[str, List]:
+        """
+        Source file name and mtime per day of the year
+
+        Parameters:
+        -----------
+        files : List[Tuple[Optional[Path], datetime]]
+            (file path, date) pairs; dates outside the year and days
+            without a file are left out
+
+        Returns:
+        --------
+        Dict[str, List]: {day of year (from 0, as a string): [name, mtime_ns]}
+        """
+        jan1 = datetime(year, 1, 1)
+        return {str((date - jan1).days): [Path(path).name, os.stat(path).st_mtime_ns]
+                for path, date in files if path is not None and date is not None and date.year == year}
+
+    def load_sidecar(self, variable: str, year: int) -> Optional[Dict]:
+        """Sidecar of a stack, or None for stacks built without one"""
+        key = (variable, year)
+        if key not in self.sidecars:
+            path = self.sidecar_path(variable, year)
+            if not path.exists():
+                return None
+            with open(path) as f:
+                self.sidecars[key] = json.load(f)
+        return self.sidecars[key]
+
+    def has(self, variable: str, year: int,
+            files: Optional[List[Tuple[Optional[Path], datetime]]] = None) -> bool:
+        """
+        Check whether an up-to-date stack exists for one variable-year
+
+        Parameters:
+        -----------
+        variable : str
+            Variable name
+        year : int
+            Calendar year
+        files : Optional[List[Tuple[Optional[Path], datetime]]]
+            Current (file path, date) pairs of the year, None for days
+            without a file. The stack is stale if its sources differ on any
+            of these days (added, removed or modified zips). The result is
+            remembered, so later calls without files return it.
+
+        Returns:
+        --------
+        bool: True if the stack can be read instead of the zips
+        """
+        key = (variable, year)
+        if not self.stack_path(variable, year).exists():
+            return False
+        sidecar = self.load_sidecar(variable, year)
+        if files is None:
+            return self.fresh.get(key, sidecar is not None)
+
+        if sidecar is None:
+            logger.warning(f"Stack {self.stack_path(variable, year)} has no sidecar; treating it as stale")
+            self.fresh[key] = False
+            return False
+        jan1 = datetime(year, 1, 1)
+        current = self.sources(files, year)
+        days = {str((date - jan1).days) for _, date in files if date is not None and date.year == year}
+        changed = sorted(int(day) for day in days if sidecar['sources'].get(day) != current.get(day))
+        if changed:
+            logger.warning(f"Stack {self.stack_path(variable, year)} is stale: {len(changed)} days "
+                           f"changed since it was built (first "
+                           f"{(jan1 + timedelta(days=changed[0])).date()})")
+        self.fresh[key] = not changed
+        return not changed
+
+    def available(self, variable: str, date: datetime) -> bool:
+        """Whether a stack holds decoded data for a date (False if no sidecar)"""
+        sidecar = self.load_sidecar(variable, date.year)
+        if sidecar is None:
+            return False
+        return bool(sidecar['available'][(date - datetime(date.year, 1, 1)).days])
+
+    def consolidate(self, files: List[Tuple[Path, datetime]], variable: str, year: int,
+                    overwrite: bool = False, max_workers: int = 4) -> Path:
+        """
+        Decode one year of daily zips into a single stack file
+
+        Parameters:
+        -----------
+        files : List[Tuple[Path, datetime]]
+            (file path, date) pairs, e.g. from PRISMFileCatalog.lookup;
+            dates outside the year are ignored
+        variable : str
+            Variable name
+        year : int
+            Calendar year
+        overwrite : bool
+            Rebuild the stack even if it is up to date (stale stacks are
+            always rebuilt)
+        max_workers : int
+            Number of threads decoding zips
+
+        Returns:
+        --------
+        Path: Path of the stack file
+        """
+        output_path = self.stack_path(variable, year)
+        n_days = 366 if calendar.isleap(year) else 365
+        jan1 = datetime(year, 1, 1)
+        day_files = {(date - jan1).days: path for path, date in files if date.year == year}
+        year_files = [(day_files.get(day), jan1 + timedelta(days=day)) for day in range(n_days)]
+        if not overwrite and self.has(variable, year, year_files):
+            logger.info(f"Stack already exists: {output_path}")
+            return output_path
+
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        shape = (n_days, self.specs['nrows'], self.specs['ncols'])
+        nodata = self.specs['nodata_value']
+        sidecar_path = self.sidecar_path(variable, year)
+        sidecar_path.unlink(missing_ok=True)
+        self.sidecars.pop((variable, year), None)
+
+        tmp_path = output_path.with_name(output_path.name + '.tmp')
+        stack = np.lib.format.open_memmap(tmp_path, mode='w+', dtype='<f4', shape=shape)
+
+        def decode(day):
+            out = stack[day]
+            if day not in day_files:
+                out[:] = np.nan
+                return False
+            try:
+                if day_files[day].name.endswith('_bil.zip'):
+                    self.processor.read_bil_from_zip(day_files[day], out=out)
+                else:
+                    data = self.processor.read_prism_dataset(day_files[day], in_memory=True)['data']
+                    out[:] = np.ma.filled(data, nodata)
+            except Exception as e:
+                logger.error(f"Error reading {day_files[day]}: {e}")
+                out[:] = np.nan
+                return False
+            out[out == nodata] = np.nan
+            return True
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            available = list(tqdm(executor.map(decode, range(n_days)), total=n_days,
+                                  desc=f"Stacking {variable} {year}"))
+
+        stack.flush()
+        del stack
+        os.replace(tmp_path, output_path)
+
+        # The sidecar goes last: a stack without one is never trusted
+        sidecar = {'variable': variable, 'year': year, 'sources': self.sources(year_files, year),
+                   'available': [bool(flag) for flag in available]}
+        tmp_path = sidecar_path.with_name(sidecar_path.name + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(sidecar, f)
+        os.replace(tmp_path, sidecar_path)
+        self.sidecars[(variable, year)] = sidecar
+        self.fresh[(variable, year)] = True
+
+        logger.info(f"Wrote {output_path} ({sum(available)}/{n_days} days available)")
+        return output_path
+
+    def consolidate_range(self, catalog: PRISMFileCatalog, variable: str,
+                          start_year: int, end_year: int, overwrite: bool = False,
+                          max_workers: int = 4) -> List[Path]:
+        """
+        Build stacks for every year of a range from the file catalog
+
+        Parameters:
+        -----------
+        catalog : PRISMFileCatalog
+            Catalog of the raw archive
+        variable : str
+            Variable name
+        start_year : int
+            First year
+        end_year : int
+            Last year (inclusive)
+        overwrite : bool
+            Rebuild existing stacks
+        max_workers : int
+            Number of threads decoding zips
+
+        Returns:
+        --------
+        List[Path]: Stack files
+        """
+        paths = []
+        for year in range(start_year, end_year + 1):
+            files = catalog.lookup(variable, datetime(year, 1, 1), datetime(year, 12, 31),
+                                   resolution=self.resolution)
+            if not files:
+                logger.warning(f"No files for {variable} {year}, skipping")
+                continue
+            paths.append(self.consolidate(files, variable, year, overwrite, max_workers))
+        return paths
+
+    def open(self, variable: str, year: int) -> np.ndarray:
+        """
+        Memory-map a stack read-only
+
+        Parameters:
+        -----------
+        variable : str
+            Variable name
+        year : int
+            Calendar year
+
+        Returns:
+        --------
+        np.ndarray: (day, lat, lon) memory map
+        """
+        return np.load(self.stack_path(variable, year), mmap_mode='r')
+
+    def read_day(self, variable: str, date: datetime) -> np.ndarray:
+        """
+        Read one day from its year stack
+
+        Parameters:
+        -----------
+        variable : str
+            Variable name
+        date : datetime
+            Date to read
+
+        Returns:
+        --------
+        np.ndarray: 2D array with NaN for nodata
+        """
+        stack = self.open(variable, date.year)
+        return np.array(stack[(date - datetime(date.year, 1, 1)).days])
+
+    def extract_point(self, variable: str, lat: float, lon: float,
+                      start_year: int, end_year: int) -> pd.DataFrame:
+        """
+        Extract a daily point time series across year stacks
+
+        Parameters:
+        -----------
+        variable : str
+            Variable name
+        lat : float
+            Latitude
+        lon : float
+            Longitude
+        start_year : int
+            First year
+        end_year : int
+            Last year (inclusive)
+
+        Returns:
+        --------
+        pd.DataFrame: Time series with 'time' and variable columns
+        """
+        col = int((lon - self.specs['xllcorner']) / self.specs['cellsize'])
+        row = int((self.specs['yllcorner'] + self.specs['nrows'] * self.specs['cellsize'] - lat)
+                  / self.specs['cellsize'])
+        if not (0 <= row < self.specs['nrows'] and 0 <= col < self.specs['ncols']):
+            raise ValueError(f"Location ({lat}, {lon}) is outside the grid")
+
+        frames = []
+        for year in range(start_year, end_year + 1):
+            if not self.has(variable, year):
+                logger.warning(f"No stack for {variable} {year}")
+                continue
+            values = np.array(self.open(variable, year)[:, row, col])
+            frames.append(pd.DataFrame({
+                'time': pd.date_range(f"{year}-01-01", periods=len(values), freq='D'),
+                variable: values
+            }))
+
+        if not frames:
+            return pd.DataFrame(columns=['time', variable])
+        return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    """
+    Example usage of the year stack cache
+    """
+    print("="*60)
+    print("PRISM Year Stacks")
+    print("="*60)
+
+    input_base = Path("./prism_daily_temp_1981_2000")
+    if not input_base.exists():
+        print(f"Archive not found at {input_base}")
+        print("Please run the download scripts first")
+        return
+
+    catalog = PRISMFileCatalog(input_base / "prism_catalog.sqlite")
+    catalog.update(input_base)
+
+    stacks = PRISMYearStack("./prism_stacks")
+    stacks.consolidate_range(catalog, 'tmin', 1981, 1982)
+
+    # Kansas City, MO
+    df = stacks.extract_point('tmin', 39.0997, -94.5786, 1981, 1982)
+    print(f"\nTime points: {len(df)}")
+    print(f"Mean tmin: {df['tmin'].mean():.2f}°C")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+PRISM Zarr Storage Locations
+Stores and their sidecar files on local disk or behind fsspec URLs
+(s3://, gs://, az://, memory://, ...)
+"""
+
+import os
+import json
+import argparse
+from pathlib import Path
+from typing import Dict, Optional, Union
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# A store location: a local path, or an fsspec URL kept as a string
+Location = Union[str, Path]
+
+
+def is_remote(location: Location) -> bool:
+    """Whether a location is an fsspec URL rather than a local path"""
+    return isinstance(location, str) and '://' in location and not location.startswith('file://')
+
+
+def as_location(location: Location) -> Location:
+    """URLs stay strings (pathlib would fold their '//'); everything else becomes a Path"""
+    if is_remote(location):
+        return location.rstrip('/')
+    if isinstance(location, str) and location.startswith('file://'):
+        return Path(location[len('file://'):])
+    return Path(location)
+
+
+def protocol(location: Location) -> str:
+    """URL scheme of a location ('file' for local paths)"""
+    return location.split('://', 1)[0] if is_remote(location) else 'file'
+
+
+def store_name(location: Location) -> str:
+    """Last component of a location, e.g. 'tmin_1981_2000.zarr'"""
+    return location.rsplit('/', 1)[-1] if is_remote(location) else Path(location).name
+
+
+def join(location: Location, name: str) -> Location:
+    """Child of a location, e.g. a store inside an output prefix"""
+    if is_remote(location):
+        return f"{location.rstrip('/')}/{name}"
+    return Path(location) / name
+
+
+def with_name(location: Location, name: str) -> Location:
+    """Sibling of a location with another last component"""
+    if is_remote(location):
+        return f"{location.rsplit('/', 1)[0]}/{name}"
+    return Path(location).with_name(name)
+
+
+def remote_options(location: Location, storage_options: Optional[Dict] = None,
+                   multipart_concurrency: Optional[int] = None) -> Dict:
+    """
+    fsspec options for a location
+
+    Parameters:
+    -----------
+    location : Location
+        Store location
+    storage_options : Optional[Dict]
+        Filesystem options (credentials, endpoint_url, ...)
+    multipart_concurrency : Optional[int]
+        Parts of one object uploaded at once by s3fs multipart uploads
+        (its max_concurrency), unless storage_options sets it
+
+    Returns:
+    --------
+    Dict: Options to pass to fsspec (empty for local paths)
+    """
+    if not is_remote(location):
+        return {}
+    options = dict(storage_options or {})
+    if multipart_concurrency and protocol(location) in ('s3', 's3a'):
+        options.setdefault('max_concurrency', multipart_concurrency)
+    return options
+
+
+def zarr_store(location: Location, storage_options: Optional[Dict] = None, read_only: bool = False):
+    """
+    What zarr and xarray should open for a location
+
+    Parameters:
+    -----------
+    location : Location
+        Store location
+    storage_options : Optional[Dict]
+        fsspec options for URLs
+    read_only : bool
+        Open URLs read-only
+
+    Returns:
+    --------
+    Union[str, zarr.storage.FsspecStore]: Local path string, or an fsspec
+                                          store (async where the
+                                          filesystem supports it)
+    """
+    if not is_remote(location):
+        return str(location)
+    from zarr.storage import FsspecStore
+    return FsspecStore.from_url(location, storage_options=storage_options or {}, read_only=read_only)
+
+
+def filesystem(location: Location, storage_options: Optional[Dict] = None):
+    """fsspec filesystem and path of a location"""
+    import fsspec
+    return fsspec.core.url_to_fs(str(location), **(storage_options or {}))
+
+
+def store_exists(location: Location, storage_options: Optional[Dict] = None) -> bool:
+    """
+    Whether a Zarr store exists at a location
+
+    Object stores have no directories, so a remote store exists when its
+    root metadata document does.
+
+    Parameters:
+    -----------
+    location : Location
+        Store location
+    storage_options : Optional[Dict]
+        fsspec options for URLs
+
+    Returns:
+    --------
+    bool: True if the store exists
+    """
+    if not is_remote(location):
+        return Path(location).exists()
+    fs, path = filesystem(location, storage_options)
+    return any(fs.exists(f"{path}/{key}") for key in ('zarr.json', '.zgroup'))
+
+
+def file_exists(location: Location, storage_options: Optional[Dict] = None) -> bool:
+    """Whether a single file (or object) exists"""
+    if not is_remote(location):
+        return Path(location).exists()
+    fs, path = filesystem(location, storage_options)
+    return fs.exists(path)
+
+
+def read_json(location: Location, storage_options: Optional[Dict] = None) -> Optional[Dict]:
+    """
+    Read a JSON sidecar file
+
+    Parameters:
+    -----------
+    location : Location
+        File location
+    storage_options : Optional[Dict]
+        fsspec options for URLs
+
+    Returns:
+    --------
+    Optional[Dict]: Contents, or None if the file does not exist
+    """
+    if not is_remote(location):
+        if not Path(location).exists():
+            return None
+        with open(location) as f:
+            return json.load(f)
+    fs, path = filesystem(location, storage_options)
+    if not fs.exists(path):
+        return None
+    return json.loads(fs.cat_file(path))
+
+
+def write_json(location: Location, data: Dict, storage_options: Optional[Dict] = None,
+               indent: Optional[int] = 2) -> None:
+    """
+    Replace a JSON sidecar file in one step
+
+    Local files are written to a temporary file and renamed; an object
+    PUT replaces the object atomically by itself.
+
+    Parameters:
+    -----------
+    location : Location
+        File location
+    data : Dict
+        Contents
+    storage_options : Optional[Dict]
+        fsspec options for URLs
+    indent : Optional[int]
+        JSON indentation
+    """
+    text = json.dumps(data, indent=indent, sort_keys=indent == 0)
+    if not is_remote(location):
+        tmp_path = Path(location).with_name(Path(location).name + '.tmp')
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, location)
+        return
+    fs, path = filesystem(location, storage_options)
+    fs.pipe_file(path, text.encode())
+
+
+def remove_file(location: Location, storage_options: Optional[Dict] = None) -> None:
+    """Delete a single file (or object) if it exists"""
+    if not is_remote(location):
+        Path(location).unlink(missing_ok=True)
+        return
+    fs, path = filesystem(location, storage_options)
+    if fs.exists(path):
+        fs.rm_file(path)
+
+
+def main():
+    """
+    Show how a location would be opened
+    """
+    parser = argparse.ArgumentParser(description="Check a PRISM Zarr store location (path or fsspec URL)")
+    parser.add_argument('location', help="Local path, or URL such as s3://bucket/prism/tmin.zarr")
+    parser.add_argument('--endpoint-url', help="S3-compatible endpoint (e.g. a local MinIO)")
+    args = parser.parse_args()
+
+    location = as_location(args.location)
+    options = {'endpoint_url': args.endpoint_url} if args.endpoint_url else {}
+    options = remote_options(location, options)
+    print(f"Location:  {location} ({'remote, ' + protocol(location) if is_remote(location) else 'local'})")
+    print(f"Options:   {options}")
+    print(f"Exists:    {store_exists(location, options)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,25 +5,58 @@ Converts PRISM BIL format data to efficient Zarr stores for analysis
 """
 
 import os
+import re
 import sys
 import zipfile
+import concurrent.futures
 import numpy as np
 import xarray as xr
 import zarr
-from numcodecs import Blosc
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, List, Dict, Optional, Tuple, Union
 import logging
 from tqdm import tqdm
-import json
 import shutil
 from process_prism_data import PRISMProcessor
+from prism_catalog import ARCHIVE_SUFFIXES, PRISMFileCatalog
+from prism_stack import PRISMYearStack
+from prism_manifest import PRISMChunkManifest
+from prism_aggregates import PRISMAggregator
+from prism_pyramid import PRISMPyramid
+from prism_storage import (Location, as_location, is_remote, join, remote_options, store_exists,
+                           store_name, with_name, zarr_store, read_json, write_json, remove_file,
+                           file_exists)
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
+def parse_memory(value: Union[int, str]) -> int:
+    """
+    Parse a memory size such as '2GB' or '512MB' into bytes
+
+    Parameters:
+    -----------
+    value : Union[int, str]
+        Size in bytes, or a number with a B/KB/MB/GB/TB suffix
+
+    Returns:
+    --------
+    int: Size in bytes
+    """
+    if isinstance(value, int):
+        return value
+
+    match = re.fullmatch(r'\s*([\d.]+)\s*([KMGT]?B?)\s*', value.upper())
+    if not match:
+        raise ValueError(f"Invalid memory size: {value}")
+
+    units = {'': 1, 'B': 1, 'K': 1024, 'KB': 1024, 'M': 1024 ** 2, 'MB': 1024 ** 2,
+             'G': 1024 ** 3, 'GB': 1024 ** 3, 'T': 1024 ** 4, 'TB': 1024 ** 4}
+    return int(float(match.group(1)) * units[match.group(2)])
+
+
 class PRISMToZarrConverter:
     """
     Converts PRISM BIL format data to Zarr stores
@@ -44,10 +77,55 @@ class PRISMToZarrConverter:
     CHUNK_CONFIGS = {
         'time_optimized': {'time': 365, 'lat': 621, 'lon': 1405},  # Full spatial, 1 year temporal
         'space_optimized': {'time': -1, 'lat': 155, 'lon': 351},  # All time, spatial quarters
-        'balanced': {'time': 30, 'lat': 207, 'lon': 468}  # Monthly chunks, spatial thirds
+        'balanced': {'time': 30, 'lat': 207, 'lon': 468},  # Monthly chunks, spatial thirds
+        'calendar_year': {'time': 366, 'lat': 621, 'lon': 1405},  # One chunk per calendar year
+        # Sharded: one object per year holding small inner chunks that are read individually
+        'sharded_daily': {'time': 1, 'lat': 621, 'lon': 1405,  # Single-day maps
+                          'shards': {'time': 365, 'lat': 621, 'lon': 1405}},
+        'sharded_tiles': {'time': 365, 'lat': 27, 'lon': 32,  # Point time series
+                          'shards': {'time': 365, 'lat': 621, 'lon': 1440}}
+    }
+
+    # Share of max_mem planned for batches and workers; the rest absorbs
+    # decoder scratch buffers, temporaries and allocator overhead
+    MEMORY_HEADROOM = 0.8
+
+    # Calendar of the padded time axis used by the 'calendar_year' strategy
+    CALENDAR_YEAR_CALENDAR = 'all_leap'
+
+    # Per-day availability masks are stored as '<variable>_available' time coordinates
+    AVAILABILITY_SUFFIX = '_available'
+
+    # Codec pipelines ('default' keeps zarr's default, zstd level 0 without shuffle)
+    CODEC_CONFIGS = {
+        'default': {},
+        'zstd': {'compressor': 'zstd', 'level': 5},
+        'blosc_zstd': {'compressor': 'blosc', 'cname': 'zstd', 'level': 5, 'shuffle': 'shuffle'},
+        'blosc_zstd_bitshuffle': {'compressor': 'blosc', 'cname': 'zstd', 'level': 5, 'shuffle': 'bitshuffle'},
+        'blosc_lz4': {'compressor': 'blosc', 'cname': 'lz4', 'level': 5, 'shuffle': 'shuffle'}  # Fastest reads
     }
 
-    def __init__(self, resolution: str = '4km', chunk_strategy: str = 'time_optimized'):
+    # Packed encodings: integer scale/offset ('scale_offset'), whose error is
+    # at most half the scale factor (0.005 units, 0.01 mm for ppt), or
+    # mantissa rounding ('bitround'), keeping errors below 0.005 units
+    PACKING_CONFIGS = {
+        'tmin': {'dtype': 'int16', 'scale_factor': 0.01, 'add_offset': 0.0, 'keepbits': 12},
+        'tmax': {'dtype': 'int16', 'scale_factor': 0.01, 'add_offset': 0.0, 'keepbits': 12},
+        'tmean': {'dtype': 'int16', 'scale_factor': 0.01, 'add_offset': 0.0, 'keepbits': 12},
+        'tdmean': {'dtype': 'int16', 'scale_factor': 0.01, 'add_offset': 0.0, 'keepbits': 12},
+        'ppt': {'dtype': 'uint16', 'scale_factor': 0.02, 'add_offset': 0.0, 'keepbits': 17},  # Up to 1310 mm
+        'vpdmin': {'dtype': 'uint16', 'scale_factor': 0.01, 'add_offset': 0.0, 'keepbits': 14},
+        'vpdmax': {'dtype': 'uint16', 'scale_factor': 0.01, 'add_offset': 0.0, 'keepbits': 14}
+    }
+
+    def __init__(self, resolution: str = '4km', chunk_strategy: str = 'time_optimized',
+                 codec_strategy: Union[str, Dict] = 'default',
+                 variable_codecs: Optional[Dict[str, Union[str, Dict]]] = None,
+                 packing: Optional[str] = None,
+                 max_mem: Optional[Union[int, str]] = None,
+                 storage_options: Optional[Dict] = None,
+                 max_in_flight: Optional[int] = None,
+                 multipart_concurrency: int = 4):
         """
         Initialize converter
 
@@ -56,11 +134,57 @@ class PRISMToZarrConverter:
         resolution : str
             PRISM data resolution ('4km' or '800m')
         chunk_strategy : str
-            Chunking strategy ('time_optimized', 'space_optimized', 'balanced')
+            Chunking strategy ('time_optimized', 'space_optimized', 'balanced',
+            'calendar_year', 'sharded_daily', 'sharded_tiles'). 'calendar_year'
+            stores every year as 366 steps on an all_leap calendar, so each
+            year is exactly one time chunk. The sharded strategies store one
+            Zarr v3 shard object per year and grid, holding 1-day maps or
+            365-day tiles as inner chunks; readers fetch only the inner
+            chunks they need, writers always write whole shards.
+        codec_strategy : Union[str, Dict]
+            Name of a CODEC_CONFIGS pipeline, or a pipeline dict with keys
+            'compressor' ('zstd', 'blosc' or None), 'cname' (blosc: 'zstd',
+            'lz4', 'lz4hc', 'zlib', 'blosclz'), 'level', 'shuffle'
+            ('noshuffle', 'shuffle', 'bitshuffle') and 'delta' (bool)
+        variable_codecs : Optional[Dict[str, Union[str, Dict]]]
+            Per-variable pipelines overriding codec_strategy
+        packing : Optional[str]
+            Lossy packing from PACKING_CONFIGS: 'scale_offset' stores
+            int16/uint16 with scale_factor/add_offset and a _FillValue
+            sentinel, 'bitround' keeps float32 but zeroes unneeded mantissa
+            bits. Decoding stays transparent in xarray; the measured maximum
+            error is recorded in the 'quantization_max_error' attribute.
+        max_mem : Optional[Union[int, str]]
+            Memory cap for conversions, in bytes or as e.g. '8GB'. Batch
+            lengths, queued batches and thread or process counts are fitted
+            to it (see memory_plan). New stores get a shorter time chunk
+            when one chunk-aligned slab of the full grid would not fit, as
+            with 365-day chunks at 800m or the whole-axis chunks of
+            'space_optimized'. No cap if None.
+        storage_options : Optional[Dict]
+            fsspec options for stores given as URLs (e.g. s3://bucket/prism/
+            tmin.zarr): credentials, endpoint_url for S3-compatible servers
+        max_in_flight : Optional[int]
+            Chunk reads and writes zarr keeps in flight at once against a
+            store (its async.concurrency, 10 by default). Object stores are
+            latency-bound, so 32-64 usually pays off there
+        multipart_concurrency : int
+            Parts of one large chunk object uploaded at once by s3fs
+            multipart uploads (unless storage_options sets max_concurrency)
         """
         self.processor = PRISMProcessor(resolution)
         self.resolution = resolution
         self.chunk_config = self.CHUNK_CONFIGS[chunk_strategy]
+        self.calendar_years = chunk_strategy == 'calendar_year'
+        self.max_mem = parse_memory(max_mem) if max_mem is not None else None
+        self.storage_options = dict(storage_options or {})
+        self.max_in_flight = max_in_flight
+        self.multipart_concurrency = multipart_concurrency
+        self.codec_strategy = codec_strategy
+        self.variable_codecs = variable_codecs or {}
+        if packing not in (None, 'scale_offset', 'bitround'):
+            raise ValueError(f"Unknown packing: {packing}")
+        self.packing = packing
 
         # Grid specifications from processor
         self.specs = self.processor.specs
@@ -81,20 +205,224 @@ class PRISMToZarrConverter:
         # Reverse latitude to have it in descending order (north to south)
         self.lat = self.lat[::-1]
 
-    def read_bil_file(self, file_path: Path) -> Tuple[np.ndarray, Dict]:
+    def codec_encoding(self, variable: str, dtype: str = 'float32') -> Dict:
+        """
+        Build the zarr codec encoding of one variable
+
+        Parameters:
+        -----------
+        variable : str
+            Variable name
+        dtype : str
+            Stored data type
+
+        Returns:
+        --------
+        Dict: 'compressors' and 'filters' encoding entries (empty for the
+              zarr default)
+        """
+        from zarr.codecs import BloscCodec, BloscShuffle, ZstdCodec
+
+        spec = self.variable_codecs.get(variable, self.codec_strategy)
+        if isinstance(spec, str):
+            spec = self.CODEC_CONFIGS[spec]
+        if not spec:
+            return {}
+
+        encoding = {}
+        compressor = spec.get('compressor')
+        if compressor == 'zstd':
+            encoding['compressors'] = (ZstdCodec(level=spec.get('level', 3)),)
+        elif compressor == 'blosc':
+            encoding['compressors'] = (BloscCodec(
+                cname=spec.get('cname', 'zstd'),
+                clevel=spec.get('level', 5),
+                shuffle=BloscShuffle(spec.get('shuffle', 'shuffle')),
+                typesize=np.dtype(dtype).itemsize
+            ),)
+        elif compressor is None:
+            encoding['compressors'] = None
+        else:
+            raise ValueError(f"Unknown compressor: {compressor}")
+
+        if spec.get('delta'):
+            # Float deltas do not round-trip exactly
+            if not np.issubdtype(np.dtype(dtype), np.integer):
+                raise ValueError(f"Delta filter is only lossless for integer data, not {dtype}")
+            from zarr.codecs import Delta
+            encoding['filters'] = (Delta(dtype=np.dtype(dtype).str),)
+
+        return encoding
+
+    def packing_encoding(self, variable: str) -> Dict:
+        """
+        Build the packed-encoding entries of one variable
+
+        Parameters:
+        -----------
+        variable : str
+            Variable name
+
+        Returns:
+        --------
+        Dict: xarray encoding entries (empty without packing)
+        """
+        if self.packing is None:
+            return {}
+
+        config = self.PACKING_CONFIGS[variable]
+        if self.packing == 'bitround':
+            from zarr.codecs import BitRound
+            return {'filters': (BitRound(keepbits=config['keepbits']),)}
+
+        sentinel = np.iinfo(config['dtype']).min if config['dtype'] == 'int16' else np.iinfo(config['dtype']).max
+        return {
+            'dtype': config['dtype'],
+            'scale_factor': config['scale_factor'],
+            'add_offset': config['add_offset'],
+            '_FillValue': sentinel,
+            # Chunks never written (preallocated stores) must decode as NaN too
+            'fill_value': sentinel
+        }
+
+    def check_packing(self, variable: str, data: np.ndarray) -> float:
+        """
+        Measure the packing error of a batch before it is written
+
+        Parameters:
+        -----------
+        variable : str
+            Variable name
+        data : np.ndarray
+            float32 values with NaN for nodata
+
+        Returns:
+        --------
+        float: Maximum absolute error introduced by packing (0 without packing)
+        """
+        if self.packing is None or not np.isfinite(data).any():
+            return 0.0
+
+        config = self.PACKING_CONFIGS[variable]
+        if self.packing == 'bitround':
+            from numcodecs import BitRound
+            packed = BitRound(keepbits=config['keepbits']).encode(data.copy()).view(data.dtype)
+            return float(np.nanmax(np.abs(packed.reshape(data.shape) - data)))
+
+        scale, offset = config['scale_factor'], config['add_offset']
+        packed = np.round((data - offset) / scale)
+
+        # The sentinel is reserved for NaN
+        limits = np.iinfo(config['dtype'])
+        low = limits.min + 1 if config['dtype'] == 'int16' else limits.min
+        high = limits.max if config['dtype'] == 'int16' else limits.max - 1
+        if np.nanmin(packed) < low or np.nanmax(packed) > high:
+            raise ValueError(f"{variable} values {np.nanmin(data):.2f}..{np.nanmax(data):.2f} "
+                             f"do not fit {config['dtype']} with scale_factor {scale}")
+
+        return float(np.nanmax(np.abs(packed * scale + offset - data)))
+
+    def store_options(self, location: Location) -> Dict:
+        """fsspec options for a store location (empty for local paths)"""
+        return remote_options(location, self.storage_options, self.multipart_concurrency)
+
+    def zarr_store(self, location: Location, read_only: bool = False):
+        """
+        What to hand zarr and xarray for a store location
+
+        Parameters:
+        -----------
+        location : Location
+            Local path or fsspec URL
+        read_only : bool
+            Open URLs read-only
+
+        Returns:
+        --------
+        Union[str, zarr.storage.FsspecStore]: Path string, or fsspec store
+        """
+        return zarr_store(location, self.store_options(location), read_only)
+
+    def zarr_config(self, write_workers: Optional[int] = None) -> Dict:
+        """zarr settings for writes: compression threads and requests in flight"""
+        config = {}
+        if write_workers is not None:
+            config['threading.max_workers'] = write_workers
+        if self.max_in_flight is not None:
+            config['async.concurrency'] = self.max_in_flight
+        return config
+
+    def record_packing(self, output_zarr: Location, errors: Dict[str, float]) -> None:
+        """
+        Record packing and the verified maximum error in variable attributes
+
+        Parameters:
+        -----------
+        output_zarr : Location
+            Zarr store path
+        errors : Dict[str, float]
+            Maximum error measured per variable in this run
+        """
+        if self.packing is None:
+            return
+
+        group = zarr.open_group(self.zarr_store(output_zarr), mode='r+')
+        for variable, error in errors.items():
+            attrs = group[variable].attrs
+            attrs.update({
+                'packing': self.packing,
+                'quantization_max_error': max(error, attrs.get('quantization_max_error', 0.0))
+            })
+
+    def variable_encoding(self, variable: str, time_chunk: int) -> Dict:
+        """
+        Chunk, packing and codec encoding used when creating a variable
+
+        Parameters:
+        -----------
+        variable : str
+            Variable name
+        time_chunk : int
+            Time chunk length (inner chunk length of sharded strategies)
+
+        Returns:
+        --------
+        Dict: xarray encoding for the variable
+        """
+        encoding = {'chunks': (time_chunk, self.chunk_config['lat'], self.chunk_config['lon'])}
+        shards = self.chunk_config.get('shards')
+        if shards:
+            encoding['shards'] = (shards['time'], shards['lat'], shards['lon'])
+        packing = self.packing_encoding(variable)
+        codecs = self.codec_encoding(variable, packing.get('dtype', 'float32'))
+
+        encoding.update(packing)
+        encoding.update(codecs)
+        if 'filters' in packing and 'filters' in codecs:
+            encoding['filters'] = packing['filters'] + codecs['filters']
+        return encoding
+
+    def read_bil_file(self, file_path: Path,
+                      bounds: Optional[Tuple[float, float, float, float]] = None,
+                      overview_level: Optional[int] = None) -> Tuple[np.ndarray, Dict]:
         """
-        Read a PRISM BIL file and return data with metadata
+        Read a PRISM BIL (or COG) file and return data with metadata
 
         Parameters:
         -----------
         file_path : Path
-            Path to BIL zip or bil file
+            Path to BIL zip, bil file or COG
+        bounds : Optional[Tuple[float, float, float, float]]
+            (min_lon, min_lat, max_lon, max_lat) window, COG inputs only
+        overview_level : Optional[int]
+            Internal overview level, COG inputs only
 
         Returns:
         --------
         Tuple[np.ndarray, Dict]: Data array and metadata
         """
-        dataset = self.processor.read_prism_dataset(file_path)
+        dataset = self.processor.read_prism_dataset(file_path, bounds=bounds,
+                                                    overview_level=overview_level)
         data = dataset['data']
         metadata = dataset['metadata']
 
@@ -142,6 +470,19 @@ class PRISMToZarrConverter:
         # Convert to dataset
         ds = da.to_dataset()
 
+        self.set_attributes(ds)
+
+        return ds
+
+    def set_attributes(self, ds: xr.Dataset) -> None:
+        """
+        Set global and coordinate attributes on a converted dataset
+
+        Parameters:
+        -----------
+        ds : xr.Dataset
+            Dataset with time, lat and lon coordinates
+        """
         # Add global attributes
         ds.attrs = {
             'source': 'PRISM Climate Group, Oregon State University',
@@ -170,47 +511,271 @@ class PRISMToZarrConverter:
             'standard_name': 'time'
         }
 
+    def read_day_into(self, out: np.ndarray, file_path: Optional[Path],
+                      file_date: Optional[datetime], variable: str,
+                      stacks: Optional[PRISMYearStack] = None) -> bool:
+        """
+        Decode one day directly into a (lat, lon) slice of a batch buffer
+
+        Parameters:
+        -----------
+        out : np.ndarray
+            C-contiguous float32 (lat, lon) destination
+        file_path : Optional[Path]
+            Source file (zip, bil or COG); None if the day has no file
+        file_date : Optional[datetime]
+            Date of the day; None for calendar padding steps (February 29
+            of non-leap years)
+        variable : str
+            Variable name
+        stacks : Optional[PRISMYearStack]
+            Year stack cache to read from where available
+
+        Returns:
+        --------
+        bool: True if the day was read; False leaves the slice untouched
+        """
+        # Days without a source file stay unavailable even where a stack covers them
+        if file_date is None or file_path is None:
+            return False
+
+        # Stale stacks (see check_stacks) and days the stack could not decode read the zip
+        if stacks is not None and stacks.has(variable, file_date.year) and \
+                stacks.available(variable, file_date):
+            out[:] = stacks.open(variable, file_date.year)[(file_date - datetime(file_date.year, 1, 1)).days]
+            return True
+
+        # PRISM's BIL zips are known by name, so only other zips are opened to check
+        try:
+            if file_path.name.endswith('_bil.zip') or \
+                    (file_path.suffix == '.zip' and not self.processor.is_cog_zip(file_path)):
+                self.processor.read_bil_from_zip(file_path, out=out)
+            else:
+                data, _ = self.read_bil_file(file_path)
+                out[:] = np.ma.filled(data, self.specs['nodata_value'])
+        except Exception as e:
+            logger.error(f"Error processing {file_path}: {e}")
+            return False
+
+        out[out == self.specs['nodata_value']] = np.nan
+        return True
+
+    def check_stacks(self, stacks: Optional[PRISMYearStack],
+                     days: Dict[str, List[Tuple[Optional[Path], Optional[datetime]]]]) -> None:
+        """
+        Check the year stacks against the files about to be converted
+
+        Stacks whose sources differ from the current files on any converted
+        day are marked stale, and those years are read from the zips.
+
+        Parameters:
+        -----------
+        stacks : Optional[PRISMYearStack]
+            Year stack cache (nothing to do if None)
+        days : Dict[str, List[Tuple[Optional[Path], Optional[datetime]]]]
+            (file path, date) for every time step, per variable
+        """
+        if stacks is None:
+            return
+        for variable, entries in days.items():
+            years = {}
+            for file_path, file_date in entries:
+                if file_date is not None:
+                    years.setdefault(file_date.year, []).append((file_path, file_date))
+            for year, files in years.items():
+                stacks.has(variable, year, files)
+
+    def read_batch(self, days: List[Tuple[Optional[Path], Optional[datetime]]], variable: str,
+                   stacks: Optional[PRISMYearStack] = None,
+                   read_workers: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Decode a batch of days into one preallocated (time, lat, lon) buffer
+
+        Parameters:
+        -----------
+        days : List[Tuple[Optional[Path], Optional[datetime]]]
+            (file path, date) pairs in date order
+        variable : str
+            Variable name
+        stacks : Optional[PRISMYearStack]
+            Year stack cache to read from where available
+        read_workers : int
+            Number of threads decoding days (inflate releases the GIL)
+
+        Returns:
+        --------
+        Tuple[np.ndarray, np.ndarray]: float32 buffer with NaN for nodata and
+                                       unread days, and a boolean mask of the
+                                       days that were read
+        """
+        data = np.full((len(days), len(self.lat), len(self.lon)), np.nan, dtype='float32')
+        available = np.zeros(len(days), dtype=bool)
+
+        def read(i):
+            file_path, file_date = days[i]
+            return self.read_day_into(data[i], file_path, file_date, variable, stacks)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=read_workers) as executor:
+            for i, ok in enumerate(tqdm(executor.map(read, range(len(days))),
+                                        total=len(days), desc=f"Reading {variable} files")):
+                available[i] = ok
+
+        return data, available
+
+    def iter_batches(self, batches: List[Dict[str, List[Tuple[Optional[Path], Optional[datetime]]]]],
+                     variables: List[str], stacks: Optional[PRISMYearStack] = None,
+                     read_workers: int = 4, queue_size: int = 1):
+        """
+        Read batches on a background thread, ahead of the consumer
+
+        While the caller encodes and writes one batch, the next ones are
+        decoded by the read pool. At most queue_size decoded batches wait
+        in the queue, which bounds memory to queue_size + 2 batch buffers.
+
+        Parameters:
+        -----------
+        batches : List[Dict[str, List[Tuple[Optional[Path], Optional[datetime]]]]]
+            Batches of (file path, date) pairs per variable
+        variables : List[str]
+            Variable names
+        stacks : Optional[PRISMYearStack]
+            Year stack cache to read from where available
+        read_workers : int
+            Number of threads decoding days
+        queue_size : int
+            Number of decoded batches allowed to wait for the writer
+
+        Yields:
+        -------
+        Tuple[Dict, Dict, Dict]: The batch, and the data buffer and mask of
+                                 days read per variable
+        """
+        import queue
+        import threading
+
+        pending = queue.Queue(maxsize=max(1, queue_size))
+        stop = threading.Event()
+        done = object()
+
+        def produce():
+            try:
+                for batch in batches:
+                    if stop.is_set():
+                        return
+                    data, available = {}, {}
+                    for variable in variables:
+                        data[variable], available[variable] = self.read_batch(
+                            batch[variable], variable, stacks, read_workers)
+                    pending.put((batch, data, available))
+                pending.put(done)
+            except BaseException as e:
+                pending.put(e)
+
+        reader = threading.Thread(target=produce, name=f"prism-read-{'-'.join(variables)}", daemon=True)
+        reader.start()
+
+        try:
+            while True:
+                item = pending.get()
+                if item is done:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # Unblock the reader if the consumer stops early
+            stop.set()
+            while reader.is_alive():
+                try:
+                    pending.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            reader.join()
+
+    def create_batch_dataset(self, data: Dict[str, np.ndarray], times: List,
+                             available: Optional[Dict[str, np.ndarray]] = None) -> xr.Dataset:
+        """
+        Wrap (time, lat, lon) buffers in a Dataset without copying them
+
+        Parameters:
+        -----------
+        data : Dict[str, np.ndarray]
+            3D data array in date order per variable
+        times : List
+            Time stamps of the buffers (datetimes, or cftime dates on a
+            calendar-year axis)
+        available : Optional[Dict[str, np.ndarray]]
+            Per-day masks of the days read, stored as '<variable>_available'
+            time coordinates
+
+        Returns:
+        --------
+        xr.Dataset: Dataset with shared coordinates and attributes
+        """
+        ds = xr.Dataset(
+            {variable: (('time', 'lat', 'lon'), values, self.VARIABLE_INFO.get(variable, {}))
+             for variable, values in data.items()},
+            coords={'time': list(times), 'lat': self.lat, 'lon': self.lon}
+        )
+        for variable, mask in (available or {}).items():
+            ds.coords[self.availability_name(variable)] = ('time', mask, self.availability_attrs(variable))
+        self.set_attributes(ds)
+
         return ds
 
-    def process_time_series(self, input_dir: Path, variable: str,
-                          start_date: datetime, end_date: datetime,
-                          output_zarr: Path, batch_days: int = 365) -> None:
+    def availability_name(self, variable: str) -> str:
+        """Name of the per-day availability mask of a variable"""
+        return f"{variable}{self.AVAILABILITY_SUFFIX}"
+
+    def availability_attrs(self, variable: str) -> Dict:
+        """Attributes of the per-day availability mask of a variable"""
+        return {'long_name': f"{variable} file read for this day",
+                'description': 'False for days filled with NaN (missing, unreadable or calendar padding)'}
+
+    def find_files(self, input_dir: Path, variable: str,
+                   start_date: datetime, end_date: datetime,
+                   catalog: Optional[PRISMFileCatalog] = None) -> List[Tuple[Path, datetime]]:
         """
-        Process a time series of PRISM files and write to Zarr
+        Resolve the stable daily files of a variable within a date range
+
+        BIL zips and COGs written by PRISMCOGExporter ('..._cog.tif') are
+        both found; where a date has both, the zip is used.
 
         Parameters:
         -----------
         input_dir : Path
-            Directory containing PRISM files
+            Directory containing PRISM files, or per-variable subdirectories
+            (ignored when a catalog is given)
         variable : str
-            Variable name to process
+            Variable name
         start_date : datetime
             Start date
         end_date : datetime
             End date
-        output_zarr : Path
-            Output Zarr store path
-        batch_days : int
-            Number of days to process at once
-        """
-        logger.info(f"Processing {variable} from {start_date.date()} to {end_date.date()}")
+        catalog : Optional[PRISMFileCatalog]
+            File catalog to look the files up in
 
-        # Create output directory
-        output_zarr.parent.mkdir(parents=True, exist_ok=True)
+        Returns:
+        --------
+        List[Tuple[Path, datetime]]: (file path, date) pairs in date order
+        """
+        if catalog is not None:
+            return catalog.lookup(variable, start_date, end_date, resolution=self.resolution)
 
-        # Check if zarr store exists for appending
-        append_mode = output_zarr.exists()
+        if (input_dir / variable).is_dir():
+            input_dir = input_dir / variable
 
-        # Get list of files to process
-        pattern = f"PRISM_{variable}_stable_4km*_bil.zip"
-        all_files = sorted(input_dir.glob(pattern))
+        # BIL zips come last, so they win over COGs exported from them
+        patterns = [f"PRISM_{variable}_stable_{self.resolution}*{suffix}"
+                    for suffix in reversed(ARCHIVE_SUFFIXES)]
+        all_files = [path for pattern in patterns for path in sorted(input_dir.glob(pattern))]
 
         if not all_files:
-            logger.warning(f"No files found matching pattern: {pattern}")
-            return
+            logger.warning(f"No files found matching patterns: {', '.join(patterns)}")
+            return []
 
         # Filter files by date range
-        files_to_process = []
+        by_date = {}
         for file_path in all_files:
             try:
                 # Parse date from filename
@@ -218,81 +783,1129 @@ class PRISMToZarrConverter:
                 if 'year' in metadata and 'month' in metadata and 'day' in metadata:
                     file_date = datetime(metadata['year'], metadata['month'], metadata['day'])
                     if start_date <= file_date <= end_date:
-                        files_to_process.append((file_path, file_date))
+                        by_date[file_date] = file_path
             except Exception as e:
                 logger.warning(f"Could not parse date from {file_path.name}: {e}")
 
-        if not files_to_process:
-            logger.warning(f"No files found in date range {start_date.date()} to {end_date.date()}")
-            return
+        return [(by_date[file_date], file_date) for file_date in sorted(by_date)]
 
-        logger.info(f"Found {len(files_to_process)} files to process")
+    def build_time_axis(self, files: Dict[str, List[Tuple[Path, datetime]]],
+                        start: Optional[datetime] = None
+                        ) -> Tuple[Dict[str, List[Tuple[Optional[Path], Optional[datetime]]]], List]:
+        """
+        Lay the files of all variables out on one shared, complete daily axis
 
-        # Track if any data was written
-        data_written = False
+        The axis holds every day from the first to the last file of any
+        variable, so a date's index is plain arithmetic; days without a
+        file get NaN. With the 'calendar_year' strategy the axis instead
+        covers whole years of the all_leap calendar (366 steps each), and
+        February 29 of non-leap years is a NaN padding step.
 
-        # Process in batches
-        for i in range(0, len(files_to_process), batch_days):
-            batch = files_to_process[i:i + batch_days]
-            logger.info(f"Processing batch {i//batch_days + 1}/{(len(files_to_process) + batch_days - 1)//batch_days}")
+        Parameters:
+        -----------
+        files : Dict[str, List[Tuple[Path, datetime]]]
+            (file path, date) pairs per variable
+        start : Optional[datetime]
+            First day of the axis when it must continue an existing store
+            (the first file date if None)
 
-            # Collect datasets for this batch
-            datasets = []
-            for file_path, file_date in tqdm(batch, desc=f"Reading {variable} files"):
+        Returns:
+        --------
+        Tuple[Dict, List]: (file path, date) for every step per variable
+                           (either may be None), and the time coordinate values
+        """
+        by_date = {variable: {file_date: file_path for file_path, file_date in entries}
+                   for variable, entries in files.items()}
+        dates = sorted(set().union(*by_date.values()))
+        first = min(dates[0], start) if start else dates[0]
+
+        if self.calendar_years:
+            times = list(xr.date_range(f"{first.year}-01-01", f"{dates[-1].year}-12-31",
+                                       freq='D', calendar=self.CALENDAR_YEAR_CALENDAR,
+                                       use_cftime=True))
+            dates = []
+            for t in times:
                 try:
-                    data, metadata = self.read_bil_file(file_path)
-                    ds = self.create_xarray_dataset(data, metadata, variable, file_date)
-                    datasets.append(ds)
-                except Exception as e:
-                    logger.error(f"Error processing {file_path}: {e}")
-                    continue
+                    dates.append(datetime(t.year, t.month, t.day))
+                except ValueError:
+                    # February 29 of a non-leap year: padding step
+                    dates.append(None)
+        else:
+            dates = [first + timedelta(days=i) for i in range((dates[-1] - first).days + 1)]
+            times = list(dates)
+
+        days = {variable: [(paths.get(day), day) for day in dates]
+                for variable, paths in by_date.items()}
+        return days, times
+
+    def plan_batches(self, n_times: int, batch_days: int, chunk: int,
+                     offset: int = 0) -> List[Tuple[int, int]]:
+        """
+        Split the time axis into batches that start and end on chunk boundaries
+
+        batch_days is rounded to a whole number of chunks (at least one).
+        When appending to a store of length offset, the first batch only
+        fills its partial last chunk, so every chunk is written exactly once.
+
+        Parameters:
+        -----------
+        n_times : int
+            Number of time steps to write
+        batch_days : int
+            Requested batch length
+        chunk : int
+            Time chunk length of the store (shard length if sharded)
+        offset : int
+            Current length of the store along time
+
+        Returns:
+        --------
+        List[Tuple[int, int]]: (start, stop) index pairs into the new steps
+        """
+        if self.chunk_config['time'] == -1:
+            # A single chunk spans the whole axis; it cannot be written once per batch
+            step = batch_days
+            return [(start, min(start + step, n_times)) for start in range(0, n_times, step)]
+
+        step = max(1, round(batch_days / chunk)) * chunk
+        head = min((chunk - offset % chunk) % chunk, n_times)
+
+        spans = [(0, head)] if head else []
+        spans += [(start, min(start + step, n_times)) for start in range(head, n_times, step)]
+        return spans
+
+    def slab_bytes(self, n_variables: int, chunk: int) -> Tuple[int, int, int]:
+        """
+        Memory per day of a batch and per zarr write unit
+
+        Write units are whole stored chunks (or shards) even when a batch
+        covers only part of one: zarr decodes the stored chunk, fills in
+        the batch's days and encodes it again.
+
+        Parameters:
+        -----------
+        n_variables : int
+            Variables read per day
+        chunk : int
+            Time length of the store's write units (chunks, or shards)
+
+        Returns:
+        --------
+        Tuple[int, int, int]: (bytes of one float32 full-grid day of all
+                              variables, bytes of one write unit, write
+                              units per time chunk of one variable)
+        """
+        day_bytes = n_variables * len(self.lat) * len(self.lon) * 4
+        spatial = self.chunk_config.get('shards', self.chunk_config)
+        rows, cols = min(spatial['lat'], len(self.lat)), min(spatial['lon'], len(self.lon))
+        unit_bytes = chunk * rows * cols * 4
+        return day_bytes, unit_bytes, -(-len(self.lat) // rows) * -(-len(self.lon) // cols)
+
+    def batch_memory(self, n_variables: int, batch_days: int, chunk: int, buffers: int,
+                     read_workers: int, write_workers: int) -> int:
+        """
+        Estimated peak memory of converting with given batch and worker sizes
+
+        Counts the decoded batch buffers, a float64 and an integer copy of
+        the batch when scale/offset packing encodes it, a compressed and a
+        decoded day per read thread and an uncompressed plus a compressed
+        write unit per write thread (at most as many as the batch touches).
+
+        Parameters:
+        -----------
+        n_variables : int
+            Variables read per day
+        batch_days : int
+            Batch length
+        chunk : int
+            Time length of the store's write units (chunks, or shards)
+        buffers : int
+            Batch buffers alive at once (queued, being read, being written)
+        read_workers : int
+            Threads decoding files
+        write_workers : int
+            Threads encoding and storing chunks
+
+        Returns:
+        --------
+        int: Bytes
+        """
+        day_bytes, unit_bytes, units_per_chunk = self.slab_bytes(n_variables, chunk)
+        batch_bytes = batch_days * day_bytes
+        encode_copies = 2.5 if self.packing == 'scale_offset' else 0.0
+        units = n_variables * units_per_chunk * -(-batch_days // chunk)
+        writes = min(write_workers, units) * 2 * unit_bytes
+        return int(batch_bytes * (buffers + encode_copies) + 2 * read_workers * day_bytes // n_variables + writes)
+
+    def memory_budget(self) -> str:
+        """The memory planned against, e.g. '0.48 GB (80% of max_mem=0.6 GB)'"""
+        return (f"{self.max_mem * self.MEMORY_HEADROOM / 1024 ** 3:.2f} GB "
+                f"({self.MEMORY_HEADROOM:.0%} of max_mem={self.max_mem / 1024 ** 3:.1f} GB)")
+
+    def extra_memory(self, aggregator: Optional[PRISMAggregator] = None,
+                     pyramid: Optional[PRISMPyramid] = None) -> Callable[[int], int]:
+        """
+        Memory held besides the batch buffers, by batch length
+
+        Parameters:
+        -----------
+        aggregator : Optional[PRISMAggregator]
+            Aggregator holding open periods for the whole run
+        pyramid : Optional[PRISMPyramid]
+            Pyramid coarsening each written block
+
+        Returns:
+        --------
+        Callable[[int], int]: Bytes for a batch (or region) of the given days
+        """
+        def extra(days: int) -> int:
+            return (aggregator.memory() if aggregator else 0) + (pyramid.memory(days) if pyramid else 0)
+        return extra
+
+    def fit_time_chunk(self, n_variables: int, n_times: int, buffers: int = 3,
+                       extra_bytes: Optional[Callable[[int], int]] = None) -> None:
+        """
+        Shorten the time chunk of a new store until one chunk-aligned batch
+        of the full grid fits in max_mem
+
+        A chunk spanning the whole axis ('space_optimized') is kept only if
+        the whole axis fits in one batch; otherwise every shorter batch
+        would decode and re-encode all of its chunks, so it is replaced by
+        a fixed chunk length that fits.
+
+        Parameters:
+        -----------
+        n_variables : int
+            Variables read per day
+        n_times : int
+            Length of the time axis
+        buffers : int
+            Batch buffers alive at once (1 for a preallocated region)
+        extra_bytes : Optional[Callable[[int], int]]
+            Memory held besides the batches for a batch length (see
+            extra_memory)
+        """
+        chunk = self.time_shard(n_times)
+        if self.max_mem is None:
+            return
+
+        def fits(days):
+            needed = self.batch_memory(n_variables, days, days, buffers, 1, 1)
+            return needed + (extra_bytes(days) if extra_bytes else 0) <= self.max_mem * self.MEMORY_HEADROOM
+
+        if fits(chunk):
+            return
+        if self.calendar_years:
+            raise ValueError(f"One calendar year of {n_variables} variables does not fit in "
+                             f"{self.memory_budget()}; raise it or choose another strategy")
+
+        fitted = chunk
+        while fitted > 1 and not fits(fitted):
+            fitted -= max(1, fitted // 8)
+        if not fits(fitted):
+            raise ValueError(f"One day of {n_variables} variables does not fit in {self.memory_budget()}")
+
+        config = dict(self.chunk_config, time=fitted if self.chunk_config['time'] == -1
+                      else min(self.chunk_config['time'], fitted))
+        if 'shards' in config:
+            config['shards'] = dict(config['shards'], time=fitted)
+            if fitted % config['time']:
+                config['time'] = fitted
+        self.chunk_config = config
+        logger.warning(f"Time chunks shortened from {chunk} to {fitted} days to fit "
+                       f"{self.memory_budget()}")
+
+    def memory_plan(self, n_variables: int, chunk: int, batch_days: int, queue_size: int,
+                    read_workers: int, write_workers: Optional[int],
+                    extra_bytes: Optional[Callable[[int], int]] = None) -> Dict[str, int]:
+        """
+        Fit the batch length, queued batches and thread counts to max_mem
+
+        Starting from the requested settings, the batch is halved (in whole
+        chunks) first, then write threads, queued batches and read threads
+        are reduced, until the estimate of batch_memory fits.
+
+        Parameters:
+        -----------
+        n_variables : int
+            Variables read per day
+        chunk : int
+            Time length of the store's write units (chunks, or shards)
+        batch_days : int
+            Requested batch length (already a whole number of chunks)
+        queue_size : int
+            Requested decoded batches waiting for the writer
+        read_workers : int
+            Requested threads decoding files
+        write_workers : Optional[int]
+            Requested threads writing chunks (CPU count if None)
+        extra_bytes : Optional[Callable[[int], int]]
+            Memory held besides the batches for a batch length (open
+            aggregate periods, pyramid coarsening; see extra_memory)
+
+        Returns:
+        --------
+        Dict[str, int]: 'batch_days', 'queue_size', 'read_workers',
+                        'write_workers' and the 'estimate' in bytes
+        """
+        plan = {'batch_days': batch_days, 'queue_size': max(1, queue_size),
+                'read_workers': read_workers, 'write_workers': write_workers or os.cpu_count() or 1}
+
+        def estimate():
+            return self.batch_memory(n_variables, plan['batch_days'], chunk, plan['queue_size'] + 2,
+                                     plan['read_workers'], plan['write_workers']) + \
+                (extra_bytes(plan['batch_days']) if extra_bytes else 0)
+
+        if self.max_mem is not None:
+            while estimate() > self.max_mem * self.MEMORY_HEADROOM:
+                if plan['batch_days'] > chunk:
+                    plan['batch_days'] = max(chunk, plan['batch_days'] // chunk // 2 * chunk)
+                elif plan['write_workers'] > 1:
+                    plan['write_workers'] //= 2
+                elif plan['queue_size'] > 1:
+                    plan['queue_size'] -= 1
+                elif plan['read_workers'] > 1:
+                    plan['read_workers'] //= 2
+                else:
+                    raise ValueError(f"Converting {chunk}-day chunks of {n_variables} variables needs "
+                                     f"{estimate() / 1024 ** 3:.2f} GB, more than the budget of "
+                                     f"{self.memory_budget()}")
+
+        plan['estimate'] = estimate()
+        return plan
+
+    def store_time_layout(self, output_zarr: Location, variables: List[str]) -> Tuple[int, int]:
+        """
+        Length and chunk length of an existing store's time axis
+
+        Parameters:
+        -----------
+        output_zarr : Location
+            Existing Zarr store path
+        variables : List[str]
+            Variables about to be appended; all must be in the store
+
+        Returns:
+        --------
+        Tuple[int, int]: (number of time steps, time length of the
+                         store's chunks, or of its shards if sharded)
+        """
+        group = zarr.open_group(self.zarr_store(output_zarr), mode='r')
+        missing = [variable for variable in variables if variable not in group]
+        if missing:
+            raise ValueError(f"Existing store {output_zarr} has no {', '.join(missing)}; "
+                             f"variables cannot be added while appending")
+        array = group[variables[0]]
+
+        store_calendar = group['time'].attrs.get('calendar', 'proleptic_gregorian')
+        if (store_calendar == self.CALENDAR_YEAR_CALENDAR) != self.calendar_years:
+            raise ValueError(f"Existing store {output_zarr} uses the {store_calendar} calendar; "
+                             f"append with a matching chunk strategy")
+        if self.calendar_years and array.shape[0] % self.chunk_config['time']:
+            raise ValueError(f"Existing store {output_zarr} does not end on a calendar year")
+        if array.attrs.get('packing') != self.packing:
+            raise ValueError(f"Existing store {output_zarr} uses packing "
+                             f"{array.attrs.get('packing')}; append with the same packing")
+        if any(self.availability_name(variable) not in group for variable in variables):
+            raise ValueError(f"Existing store {output_zarr} has no availability masks; "
+                             f"it predates the complete daily axis, convert it anew")
+
+        return array.shape[0], (array.shards or array.chunks)[0]
+
+    def checkpoint_path(self, output_zarr: Location) -> Location:
+        """Location of the progress checkpoint kept next to a store"""
+        return with_name(output_zarr, store_name(output_zarr) + '.checkpoint.json')
+
+    def load_checkpoint(self, output_zarr: Location) -> Optional[Dict]:
+        """
+        Load the progress checkpoint of a store
+
+        A checkpoint without its store is stale (the store was removed)
+        and is discarded.
+
+        Parameters:
+        -----------
+        output_zarr : Location
+            Zarr store path
 
-            if not datasets:
-                logger.warning("No valid datasets in this batch")
+        Returns:
+        --------
+        Optional[Dict]: Checkpoint contents, or None
+        """
+        path = self.checkpoint_path(output_zarr)
+        options = self.store_options(output_zarr)
+        if not file_exists(path, options):
+            return None
+        if not store_exists(output_zarr, options):
+            logger.info(f"Discarding checkpoint of missing store: {path}")
+            remove_file(path, options)
+            return None
+
+        return read_json(path, options)
+
+    def save_checkpoint(self, output_zarr: Location, checkpoint: Dict) -> None:
+        """
+        Atomically replace the progress checkpoint of a store
+
+        Parameters:
+        -----------
+        output_zarr : Location
+            Zarr store path
+        checkpoint : Dict
+            Checkpoint contents
+        """
+        write_json(self.checkpoint_path(output_zarr), dict(checkpoint, updated=datetime.now().isoformat()),
+                   self.store_options(output_zarr))
+
+    def resume_append(self, output_zarr: Location, checkpoint: Optional[Dict]) -> bool:
+        """
+        Roll an existing store back to its last committed batch
+
+        An interrupted append can leave arrays resized past the data that
+        was written, or variables of different lengths. Every time-dimensioned
+        array (pyramid levels included) is truncated to the length recorded after the last complete
+        batch.
+
+        Parameters:
+        -----------
+        output_zarr : Location
+            Existing Zarr store path
+        checkpoint : Optional[Dict]
+            Checkpoint of the store (the store is trusted as-is if None)
+
+        Returns:
+        --------
+        bool: False if no batch was ever committed (the store must be recreated)
+        """
+        if checkpoint is None or checkpoint.get('mode') != 'append':
+            return True
+
+        length = checkpoint['length']
+        if length == 0:
+            logger.warning(f"No batch of {output_zarr} was committed; recreating the store")
+            return False
+
+        group = zarr.open_group(self.zarr_store(output_zarr), mode='r+', use_consolidated=False)
+        rolled_back = False
+        for name, array in group.members(max_depth=None):
+            if not isinstance(array, zarr.Array):
                 continue
+            dims = array.metadata.dimension_names or ()
+            if dims and dims[0] == 'time' and array.shape[0] != length:
+                logger.warning(f"Rolling {name} back from {array.shape[0]} to {length} time steps")
+                array.resize((length,) + array.shape[1:])
+                rolled_back = True
+
+        if rolled_back:
+            zarr.consolidate_metadata(self.zarr_store(output_zarr))
+        return True
+
+    def resume_points(self, output_zarr: Location, variables: List[str]
+                      ) -> Tuple[Dict[Tuple[int, int, int], int], int, Dict[str, int], Dict[str, np.ndarray]]:
+        """
+        Where each variable resumes in an existing store
 
-            # Concatenate datasets along time dimension
-            batch_ds = xr.concat(datasets, dim='time')
+        A variable resumes after its last day with data, read from its
+        availability mask. Steps after that point are still open even
+        though they are on the axis: the padded rest of a calendar year,
+        or trailing days whose files were missing.
 
-            # Sort by time
-            batch_ds = batch_ds.sortby('time')
+        Parameters:
+        -----------
+        output_zarr : Location
+            Existing Zarr store path
+        variables : List[str]
+            Variables about to be appended
 
-            # Set encoding for chunking (let xarray handle compression by default)
-            encoding = {
-                variable: {
-                    'chunks': (min(self.chunk_config['time'], len(batch_ds.time)),
-                              self.chunk_config['lat'],
-                              self.chunk_config['lon'])
-                }
-            }
+        Returns:
+        --------
+        Tuple[Dict, int, Dict, Dict]: Time index of every (year, month, day)
+                                      on the axis, the length of the axis,
+                                      the index each variable resumes at,
+                                      and each variable's availability mask
+        """
+        ds = xr.open_zarr(self.zarr_store(output_zarr, read_only=True), chunks=None)
+        positions = {(t.year, t.month, t.day): i for i, t in enumerate(ds.indexes['time'])}
+        resume, masks = {}, {}
+        for variable in variables:
+            masks[variable] = ds[self.availability_name(variable)].values
+            present = np.flatnonzero(masks[variable])
+            resume[variable] = int(present[-1]) + 1 if len(present) else 0
+        length = ds.sizes['time']
+        ds.close()
+        return positions, length, resume, masks
+
+    def resume_axis_start(self, output_zarr: Location, index: int) -> Tuple[datetime, int]:
+        """
+        First day of the axis continuing a store at a time index
+
+        Parameters:
+        -----------
+        output_zarr : Location
+            Existing Zarr store path
+        index : int
+            Time index the new axis starts at (at most the store length)
+
+        Returns:
+        --------
+        Tuple[datetime, int]: Start date to pass to build_time_axis, and
+                              the leading steps of the axis it builds that
+                              come before index (calendar-year axes start
+                              on January 1)
+        """
+        ds = xr.open_zarr(self.zarr_store(output_zarr, read_only=True), chunks=None)
+        first = ds.indexes['time'][0]
+        ds.close()
+        if self.calendar_years:
+            year, lead = divmod(index, self.chunk_config['time'])
+            return datetime(first.year + year, 1, 1), lead
+        return datetime(first.year, first.month, first.day) + timedelta(days=index), 0
+
+    def process_time_series(self, input_dir: Path, variable: Union[str, List[str]],
+                          start_date: datetime, end_date: datetime,
+                          output_zarr: Location, batch_days: int = 365,
+                          catalog: Optional[PRISMFileCatalog] = None,
+                          stacks: Optional[PRISMYearStack] = None,
+                          preallocate: bool = False,
+                          max_workers: Optional[int] = None,
+                          read_workers: int = 4,
+                          write_workers: Optional[int] = None,
+                          queue_size: int = 1,
+                          manifest: bool = True,
+                          aggregates: Union[bool, Tuple[str, ...]] = False,
+                          pyramid_levels: int = 0) -> None:
+        """
+        Process a time series of PRISM files and write to Zarr
+
+        Several variables are read together, date by date, into one dataset
+        with shared coordinates and identical chunking.
+
+        Parameters:
+        -----------
+        input_dir : Path
+            Directory containing PRISM files (or per-variable subdirectories)
+        variable : Union[str, List[str]]
+            Variable name, or names, to process
+        start_date : datetime
+            Start date
+        end_date : datetime
+            End date
+        output_zarr : Location
+            Output Zarr store path, or fsspec URL (e.g. s3://bucket/prism/
+            tmin.zarr, opened with the converter's storage_options)
+        batch_days : int
+            Number of days to process at once, rounded to whole time chunks
+        catalog : Optional[PRISMFileCatalog]
+            File catalog to resolve the date range from (scans input_dir if None)
+        stacks : Optional[PRISMYearStack]
+            Year stack cache; days of years with a stack are read from it
+            instead of decoding their zips
+        preallocate : bool
+            Create the full-size store up front and let independent worker
+            processes fill chunk-aligned time regions instead of appending
+            batches (batch_days is ignored)
+        max_workers : Optional[int]
+            Number of worker processes in preallocate mode
+        read_workers : int
+            Threads decoding files; reading overlaps with writing
+        write_workers : Optional[int]
+            Threads zarr uses to compress and store chunks (zarr default if None)
+        queue_size : int
+            Decoded batches allowed to wait for the writer
+        manifest : bool
+            Record the sha256 and size of every chunk written in
+            <store>.manifest.json (see prism_manifest.py); local stores only
+        aggregates : Union[bool, Tuple[str, ...]]
+            Also accumulate monthly and annual statistics (True), or those of
+            the given frequencies, into sibling stores while converting
+            (see prism_aggregates.py)
+        pyramid_levels : int
+            Also write this many spatially coarsened levels (2x, 4x, ...)
+            into the store, with multiscales metadata (see prism_pyramid.py)
+
+        Progress is recorded in a checkpoint next to the store after every
+        batch (or region). Re-running after a crash rolls back a partially
+        appended batch, skips dates the store already holds (or completed
+        regions) and continues from there. Each variable resumes after its
+        last day with data: open days already on the axis (the rest of a
+        calendar year, trailing days without files) are written in place.
+        """
+        variables = [variable] if isinstance(variable, str) else list(variable)
+        label = ', '.join(variables)
+        logger.info(f"Processing {label} from {start_date.date()} to {end_date.date()}")
+
+        # Create output directory (object stores have none)
+        output_zarr = as_location(output_zarr)
+        if is_remote(output_zarr):
+            if manifest:
+                logger.info("Chunk manifests hash local files; skipping them for a remote store")
+                manifest = False
+        else:
+            output_zarr.parent.mkdir(parents=True, exist_ok=True)
+
+        # Check if zarr store exists for appending
+        append_mode = store_exists(output_zarr, self.store_options(output_zarr))
+        if append_mode and not preallocate:
+            append_mode = self.resume_append(output_zarr, self.load_checkpoint(output_zarr))
+
+        files_to_process = {}
+        for name in variables:
+            files = self.find_files(input_dir, name, start_date, end_date, catalog)
+            logger.info(f"Found {len(files)} {name} files to process")
+            if files:
+                files_to_process[name] = sorted(files, key=lambda entry: entry[1])
+
+        resume = {}
+        if append_mode and not preallocate and files_to_process:
+            # Days up to each variable's last day with data were converted by an earlier run
+            positions, store_length, resume, masks = self.resume_points(output_zarr, list(files_to_process))
+            n_found = sum(len(files) for files in files_to_process.values())
+            for name, files in files_to_process.items():
+                indices = [positions.get((day.year, day.month, day.day), store_length) for _, day in files]
+                gaps = sum(index < resume[name] and not masks[name][index] for index in indices)
+                if gaps:
+                    logger.warning(f"{gaps} {name} files are for days flagged missing before its last "
+                                   f"day with data; appending does not backfill them, convert anew "
+                                   f"to include them")
+                files_to_process[name] = [entry for entry, index in zip(files, indices)
+                                          if index >= resume[name]]
+            files_to_process = {name: files for name, files in files_to_process.items() if files}
+            skipped = n_found - sum(len(files) for files in files_to_process.values())
+            if skipped:
+                logger.info(f"Skipping {skipped} files already in {output_zarr}")
+            if not files_to_process:
+                logger.info(f"{output_zarr} is up to date")
+                return
+
+        if not files_to_process:
+            logger.warning(f"No files found in date range {start_date.date()} to {end_date.date()}")
+            return
+
+        missing = [name for name in variables if name not in files_to_process]
+        if missing:
+            logger.warning(f"No files for {', '.join(missing)}, skipping")
+            variables = [name for name in variables if name in files_to_process]
+
+        aggregator = None
+        if aggregates:
+            frequencies = PRISMAggregator.FREQUENCIES if aggregates is True else tuple(aggregates)
+            aggregator = PRISMAggregator(self, output_zarr, variables, frequencies)
+
+        if preallocate:
+            self._process_regions(files_to_process, variables, output_zarr, stacks,
+                                  max_workers, read_workers, manifest, aggregator, pyramid_levels)
+            return
+
+        # Appended days continue the store's axis without a gap, from the
+        # first open step of any variable; steps up to a variable's resume
+        # point keep their data and are neither read nor written
+        offset = 0
+        if append_mode:
+            offset = min(resume.get(name, store_length) for name in variables)
+            axis_start, lead = self.resume_axis_start(output_zarr, offset)
+            days, times = self.build_time_axis(files_to_process, axis_start)
+            days = {name: [(path if offset + k >= resume.get(name, store_length) else None, day)
+                           for k, (path, day) in enumerate(entries[lead:])]
+                    for name, entries in days.items()}
+            times = times[lead:]
+        else:
+            days, times = self.build_time_axis(files_to_process)
+        self.check_stacks(stacks, days)
+
+        pyramid = PRISMPyramid(self, output_zarr, variables, pyramid_levels) if pyramid_levels else None
+        extra_bytes = self.extra_memory(aggregator, pyramid)
+
+        # Line batches up with the time chunks of the (new or existing) store
+        if append_mode:
+            _, chunk = self.store_time_layout(output_zarr, variables)
+        else:
+            self.fit_time_chunk(len(variables), len(times), extra_bytes=extra_bytes)
+            chunk = self.time_shard(len(times))
+            store_length = 0
+
+        if pyramid and (self.chunk_config['time'] != -1 or append_mode):
+            # Levels are sharded like the store (yearly if it has a single time chunk)
+            pyramid.span = chunk
+
+        if self.max_mem is not None:
+            # Whole chunks per batch, so no chunk is decoded and re-encoded
+            batch_days = min(max(1, round(batch_days / chunk)) * chunk, len(times))
+            plan = self.memory_plan(len(variables), chunk, batch_days, queue_size,
+                                    read_workers, write_workers, extra_bytes)
+            batch_days, queue_size = plan['batch_days'], plan['queue_size']
+            read_workers, write_workers = plan['read_workers'], plan['write_workers']
+            logger.info(f"Memory plan: {batch_days}-day batches, {queue_size} queued, "
+                        f"{read_workers} read and {write_workers} write threads, "
+                        f"~{plan['estimate'] / 1024 ** 3:.2f} GB of {self.memory_budget()}")
+        # Batches written in place end where the store does
+        overlap = store_length - offset
+        spans = [span for start, stop in self.plan_batches(len(times), batch_days, chunk, offset)
+                 for span in ([(start, overlap), (overlap, stop)] if start < overlap < stop
+                              else [(start, stop)])]
+
+        # Track if any data was written
+        data_written = False
+        errors = {name: 0.0 for name in variables}
+
+        # Length of the store after the last complete batch
+        committed = store_length
+        checkpoint = {'mode': 'append', 'variables': variables, 'length': committed}
+        if not append_mode:
+            self.save_checkpoint(output_zarr, checkpoint)
+        chunk_manifest = PRISMChunkManifest(output_zarr) if manifest else None
+        if chunk_manifest and append_mode and not chunk_manifest.manifest_path.exists():
+            # Stores from before manifests get one covering their existing chunks
+            chunk_manifest.build()
+        if aggregator:
+            aggregator.initialize([day for _, day in days[variables[0]]], overwrite=not append_mode)
+
+        # Process in batches; the next batches are decoded while one is written
+        batches = [{name: days[name][start:stop] for name in variables} for start, stop in spans]
+        zarr_config = self.zarr_config(write_workers)
+
+        for i, ((start, stop), (batch, data, available)) in enumerate(
+                zip(spans, self.iter_batches(batches, variables, stacks, read_workers, queue_size))):
+            logger.info(f"Processing batch {i + 1}/{len(batches)}")
+
+            batch_times = times[start:stop]
+            for name in variables:
+                # Missing and unreadable days stay on the axis as NaN, flagged in the mask
+                expected = sum(file_path is not None for file_path, _ in batch[name])
+                if available[name].sum() < expected:
+                    logger.warning(f"{expected - int(available[name].sum())} {name} files "
+                                   f"could not be read; writing NaN")
+
+            for name, values in data.items():
+                errors[name] = max(errors[name], self.check_packing(name, values))
+
+            # Steps written in place skip each variable's leading days that keep their data
+            in_place = offset + start < store_length
+            kept = {name: min(max(resume.get(name, 0) - offset - start, 0), stop - start) if in_place else 0
+                    for name in variables}
+
+            batch_ds = self.create_batch_dataset(data, batch_times, available)
+
+            # Set encoding for chunking and compression
+            encoding = {name: self.variable_encoding(name, self.time_chunk(len(times)))
+                        for name in variables}
+            encoding.update({self.availability_name(name): {'chunks': (chunk,)} for name in variables})
 
             # Write to zarr
-            if i == 0 and not append_mode:
-                # First batch - create new store
-                logger.info(f"Creating new Zarr store at {output_zarr}")
-                batch_ds.to_zarr(output_zarr, mode='w', encoding=encoding)
-                data_written = True
-            else:
-                # Append to existing store - no encoding when appending!
-                logger.info(f"Appending to Zarr store at {output_zarr}")
-                batch_ds.to_zarr(output_zarr, mode='a', append_dim='time')
-                data_written = True
+            with zarr.config.set(zarr_config):
+                if not data_written and not append_mode:
+                    # First batch - create new store
+                    logger.info(f"Creating new Zarr store at {output_zarr}")
+                    batch_ds.to_zarr(self.zarr_store(output_zarr), mode='w', encoding=encoding)
+                elif in_place:
+                    # Open steps already on the axis; masks go last, so an
+                    # interrupted write leaves the days open for the next run
+                    logger.info(f"Writing open days {offset + start}:{offset + stop} of {output_zarr} in place")
+                    for name in variables:
+                        if kept[name] == stop - start:
+                            continue
+                        region = {'time': slice(offset + start + kept[name], offset + stop)}
+                        xr.Dataset({name: (('time', 'lat', 'lon'), data[name][kept[name]:])}).to_zarr(
+                            self.zarr_store(output_zarr), region=region)
+                        xr.Dataset(coords={self.availability_name(name): ('time', available[name][kept[name]:])}
+                                   ).to_zarr(self.zarr_store(output_zarr), region=region)
+                else:
+                    # Append to existing store - no encoding when appending!
+                    logger.info(f"Appending to Zarr store at {output_zarr}")
+                    batch_ds.to_zarr(self.zarr_store(output_zarr), mode='a', append_dim='time')
+            data_written = True
+
+            if pyramid:
+                if i == 0:
+                    # Levels go into the store once it exists; older stores get theirs backfilled
+                    pyramid.initialize(times[overlap:], store_length, overwrite=not append_mode)
+                    if chunk_manifest:
+                        chunk_manifest.record(chunk_manifest.hash_chunks(names=pyramid.array_names(),
+                                                                         start=0, stop=store_length))
+                for name in variables:
+                    pyramid.write({name: data[name][kept[name]:]}, offset + start + kept[name])
+
+            # Hash the chunks of this batch while they are still in the page cache
+            if chunk_manifest:
+                chunk_manifest.record(chunk_manifest.hash_chunks(start=offset + start, stop=offset + stop))
+
+            committed = max(committed, offset + stop)
+            self.save_checkpoint(output_zarr, dict(checkpoint, length=committed))
+
+            if aggregator:
+                batch_dates = [day for _, day in batch[variables[0]]]
+                for name in variables:
+                    aggregator.add(name, data[name][kept[name]:], batch_dates[kept[name]:],
+                                   available[name][kept[name]:])
 
             # Clean up memory
-            del datasets, batch_ds
+            del data, batch_ds
 
         # Only consolidate metadata if data was written
         if data_written:
+            self.record_packing(output_zarr, errors)
+
+            if pyramid:
+                pyramid.finish()
+
             # Consolidate metadata for faster reads
             logger.info("Consolidating Zarr metadata")
-            zarr.consolidate_metadata(str(output_zarr))
+            zarr.consolidate_metadata(self.zarr_store(output_zarr))
+            if chunk_manifest:
+                chunk_manifest.finish()
+            if aggregator:
+                aggregator.finish(manifest)
             logger.info(f"Successfully created Zarr store at {output_zarr}")
         else:
             logger.warning("No data was written to Zarr store")
 
-    def convert_directory(self, input_dir: Path, output_base: Path,
+    def time_chunk(self, n_times: int) -> int:
+        """
+        Time chunk length for a store with n_times steps
+
+        Parameters:
+        -----------
+        n_times : int
+            Length of the time axis
+
+        Returns:
+        --------
+        int: Chunk length (-1 in the chunk config means the whole axis). It
+             is not capped at n_times, so later appends keep the layout.
+        """
+        chunk = self.chunk_config['time']
+        return n_times if chunk == -1 else chunk
+
+    def time_shard(self, n_times: int) -> int:
+        """
+        Time length of the units written at once: shards if the strategy
+        is sharded, chunks otherwise
+
+        Parameters:
+        -----------
+        n_times : int
+            Length of the time axis
+
+        Returns:
+        --------
+        int: Shard length, or the chunk length from time_chunk
+        """
+        shards = self.chunk_config.get('shards')
+        return shards['time'] if shards else self.time_chunk(n_times)
+
+    def create_template_dataset(self, variables: List[str], times: List) -> xr.Dataset:
+        """
+        Create a lazy, NaN-filled dataset describing the full-size store
+
+        Parameters:
+        -----------
+        variables : List[str]
+            Variable names
+        times : List
+            Complete time axis of the store
+
+        Returns:
+        --------
+        xr.Dataset: Dask-backed dataset (nothing is computed on write)
+        """
+        import dask.array as dsa
+
+        shape = (len(times), len(self.lat), len(self.lon))
+        # Dask chunks match the units written at once (whole shards if sharded)
+        spatial = self.chunk_config.get('shards', self.chunk_config)
+        chunks = (self.time_shard(len(times)), spatial['lat'], spatial['lon'])
+
+        ds = xr.Dataset(
+            {variable: (('time', 'lat', 'lon'),
+                        dsa.full(shape, np.nan, dtype='float32', chunks=chunks),
+                        self.VARIABLE_INFO.get(variable, {}))
+             for variable in variables},
+            coords={'time': list(times), 'lat': self.lat, 'lon': self.lon}
+        )
+        for variable in variables:
+            ds.coords[self.availability_name(variable)] = (
+                'time', dsa.zeros(len(times), dtype=bool, chunks=chunks[0]),
+                self.availability_attrs(variable))
+        self.set_attributes(ds)
+
+        return ds
+
+    def initialize_store(self, output_zarr: Location, variables: List[str], times: List) -> None:
+        """
+        Create the full-size store up front (metadata and coordinates only)
+
+        An existing store with the same time axis is reused, so interrupted
+        conversions can be restarted without discarding written regions.
+
+        Parameters:
+        -----------
+        output_zarr : Location
+            Output Zarr store path
+        variables : List[str]
+            Variable names
+        times : List
+            Complete time axis of the store
+        """
+        template = self.create_template_dataset(variables, times)
+
+        if store_exists(output_zarr, self.store_options(output_zarr)):
+            existing = xr.open_zarr(self.zarr_store(output_zarr, read_only=True))
+            same_axis = (all(variable in existing.data_vars
+                             and self.availability_name(variable) in existing.coords
+                             and existing[variable].attrs.get('packing') == self.packing
+                             and existing[variable].encoding['chunks'][0] == self.time_chunk(len(times))
+                             for variable in variables)
+                         and existing.indexes['time'].equals(template.indexes['time']))
+            existing.close()
+            if not same_axis:
+                raise ValueError(f"Existing store {output_zarr} has a different layout; "
+                                 f"remove it or choose another output path")
+            logger.info(f"Reusing preallocated Zarr store at {output_zarr}")
+            return
+
+        encoding = {variable: self.variable_encoding(variable, self.time_chunk(len(times)))
+                    for variable in variables}
+
+        logger.info(f"Preallocating Zarr store at {output_zarr} ({len(times)} time steps)")
+        template.to_zarr(self.zarr_store(output_zarr), mode='w', encoding=encoding, compute=False)
+        zarr.consolidate_metadata(self.zarr_store(output_zarr))
+
+    def plan_regions(self, n_times: int) -> List[Tuple[int, int]]:
+        """
+        Split the time axis into chunk-aligned (shard-aligned if sharded) regions
+
+        Parameters:
+        -----------
+        n_times : int
+            Length of the time axis
+
+        Returns:
+        --------
+        List[Tuple[int, int]]: (start, stop) index pairs
+        """
+        step = self.time_shard(n_times)
+        return [(start, min(start + step, n_times)) for start in range(0, n_times, step)]
+
+    def write_region(self, output_zarr: Location, variables: List[str],
+                     days: Dict[str, List[Tuple[Optional[Path], Optional[datetime]]]], start: int,
+                     stacks: Optional[PRISMYearStack] = None,
+                     read_workers: int = 1, manifest: bool = True,
+                     aggregator: Optional[PRISMAggregator] = None,
+                     pyramid: Optional[PRISMPyramid] = None
+                     ) -> Tuple[Dict[str, int], Dict[str, float], Dict[str, Optional[List]],
+                                Optional[Tuple[Dict, Dict]]]:
+        """
+        Read the files of one region and write them into a preallocated store
+
+        Parameters:
+        -----------
+        output_zarr : Location
+            Preallocated Zarr store path
+        variables : List[str]
+            Variable names
+        days : Dict[str, List[Tuple[Optional[Path], Optional[datetime]]]]
+            (file path, date) for every time step of the region, in order,
+            per variable; steps with no file are written as NaN
+        start : int
+            Index of the first time step of the region in the store
+        stacks : Optional[PRISMYearStack]
+            Year stack cache to read from where available
+        read_workers : int
+            Number of threads decoding days
+        manifest : bool
+            Hash the region's chunks after writing them
+        aggregator : Optional[PRISMAggregator]
+            Aggregator to fold the region into; periods lying entirely in
+            the region are written, the others are handed back
+        pyramid : Optional[PRISMPyramid]
+            Pyramid whose levels are written for the region too
+
+        Returns:
+        --------
+        Tuple[Dict, Dict, Dict, Optional[Tuple]]: Number of days read
+                                 successfully and packing error per
+                                 variable, chunk manifest entries of the
+                                 region, and the aggregator's open periods
+                                 and day counts (see take_partials)
+        """
+        region_ds = xr.Dataset()
+        n_read, errors = {}, {}
+        dates = [day for _, day in days[variables[0]]]
+        for variable in variables:
+            data, available = self.read_batch(days[variable], variable, stacks, read_workers)
+            errors[variable] = self.check_packing(variable, data)
+            if aggregator:
+                aggregator.add(variable, data, dates, available)
+            region_ds[variable] = (('time', 'lat', 'lon'), data)
+            region_ds.coords[self.availability_name(variable)] = ('time', available)
+            n_read[variable] = int(available.sum())
+
+        n_times = len(days[variables[0]])
+        with zarr.config.set(self.zarr_config()):
+            region_ds.to_zarr(self.zarr_store(output_zarr), region={'time': slice(start, start + n_times)})
+        if pyramid:
+            pyramid.write({variable: region_ds[variable].values for variable in variables}, start)
+
+        entries = {}
+        if manifest:
+            entries = PRISMChunkManifest(output_zarr).hash_chunks(start=start, stop=start + n_times,
+                                                                  max_workers=read_workers)
+        return n_read, errors, entries, aggregator.take_partials() if aggregator else None
+
+    def _process_regions(self, files_to_process: Dict[str, List[Tuple[Path, datetime]]],
+                         variables: List[str], output_zarr: Location,
+                         stacks: Optional[PRISMYearStack] = None,
+                         max_workers: Optional[int] = None, read_workers: int = 1,
+                         manifest: bool = True,
+                         aggregator: Optional[PRISMAggregator] = None,
+                         pyramid_levels: int = 0) -> None:
+        """
+        Preallocate the store and fill chunk-aligned regions in parallel
+
+        Parameters:
+        -----------
+        files_to_process : Dict[str, List[Tuple[Path, datetime]]]
+            (file path, date) pairs in date order per variable
+        variables : List[str]
+            Variable names
+        output_zarr : Location
+            Output Zarr store path
+        stacks : Optional[PRISMYearStack]
+            Year stack cache to read from where available
+        max_workers : Optional[int]
+            Number of worker processes (defaults to the CPU count)
+        read_workers : int
+            Number of threads decoding days within each worker
+        manifest : bool
+            Record chunk hashes in <store>.manifest.json
+        aggregator : Optional[PRISMAggregator]
+            Aggregator filled by the region workers; periods spanning
+            regions are merged here
+        pyramid_levels : int
+            Spatially coarsened levels written by the region workers
+        """
+        days, times = self.build_time_axis(files_to_process)
+        self.check_stacks(stacks, days)
+        checkpoint = self.load_checkpoint(output_zarr)
+        reused = store_exists(output_zarr, self.store_options(output_zarr))
+
+        # Each worker process holds one region and its own open aggregate
+        # periods; the parent holds the periods merged across regions
+        pyramid = PRISMPyramid(self, output_zarr, variables, pyramid_levels) if pyramid_levels else None
+        extra_bytes = self.extra_memory(aggregator, pyramid)
+        parent_bytes = aggregator.memory() if aggregator else 0
+        self.fit_time_chunk(len(variables), len(times), buffers=1,
+                            extra_bytes=lambda days: extra_bytes(days) + parent_bytes)
+        if pyramid and self.chunk_config['time'] != -1:
+            pyramid.span = self.time_shard(len(times))
+        if self.max_mem is not None:
+            chunk = self.time_shard(len(times))
+            budget = self.max_mem * self.MEMORY_HEADROOM - parent_bytes
+            region_bytes = self.batch_memory(len(variables), chunk, chunk, 1,
+                                             read_workers, os.cpu_count() or 1) + extra_bytes(chunk)
+            if region_bytes > budget:
+                read_workers = 1
+                region_bytes = self.batch_memory(len(variables), chunk, chunk, 1, 1,
+                                                 os.cpu_count() or 1) + extra_bytes(chunk)
+            max_workers = max(1, min(max_workers or os.cpu_count() or 1, int(budget // region_bytes)))
+            logger.info(f"Memory plan: {max_workers} region workers of "
+                        f"~{region_bytes / 1024 ** 3:.2f} GB each, {self.memory_budget()}")
+        self.initialize_store(output_zarr, variables, times)
+        if aggregator:
+            aggregator.initialize([day for _, day in days[variables[0]]], overwrite=not reused)
+
+        # Regions completed by an earlier run on the same time axis are skipped
+        layout = {'mode': 'regions', 'variables': sorted(variables), 'length': len(times),
+                  'first': str(times[0]), 'last': str(times[-1])}
+        completed = set()
+        if checkpoint and all(checkpoint.get(key) == value for key, value in layout.items()):
+            completed = {tuple(region) for region in checkpoint['completed']}
+        if completed:
+            # The availability masks record which days each region had; files
+            # found since for its missing days (new downloads) reopen it
+            existing = xr.open_zarr(self.zarr_store(output_zarr, read_only=True), chunks=None)
+            masks = {variable: existing[self.availability_name(variable)].values for variable in variables}
+            existing.close()
+            reopened = {(start, stop) for start, stop in completed
+                        if any(path is not None and not masks[variable][start + k]
+                               for variable in variables
+                               for k, (path, _) in enumerate(days[variable][start:stop]))}
+            if reopened:
+                logger.info(f"Reopening {len(reopened)} completed regions with new files")
+                completed -= reopened
+
+        if pyramid and pyramid.initialize(times, overwrite=not reused):
+            # Levels new to a reused store are built from its completed regions
+            for start, stop in sorted(completed):
+                pyramid.fill(start, stop)
+
+        chunk_manifest = PRISMChunkManifest(output_zarr) if manifest else None
+        if chunk_manifest and reused and not chunk_manifest.manifest_path.exists():
+            chunk_manifest.build()
+        elif chunk_manifest:
+            chunk_manifest.record(chunk_manifest.hash_chunks(
+                names=['time', 'lat', 'lon'] + (pyramid.array_names() if pyramid else [])))
+
+        regions = [region for region in self.plan_regions(len(times)) if region not in completed]
+        if completed:
+            logger.info(f"Resuming: {len(completed)} regions already complete")
+        logger.info(f"Writing {len(regions)} regions with up to {max_workers or os.cpu_count()} workers")
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(_write_region_worker, self, output_zarr, variables,
+                                {variable: days[variable][start:stop] for variable in variables},
+                                start, stacks, read_workers, manifest, aggregator, pyramid): (start, stop)
+                for start, stop in regions
+            }
+
+            failed = 0
+            errors = {variable: 0.0 for variable in variables}
+            for future in tqdm(concurrent.futures.as_completed(futures),
+                               total=len(futures), desc=f"Writing {', '.join(variables)} regions"):
+                start, stop = futures[future]
+                try:
+                    n_read, region_errors, entries, partials = future.result()
+                    if chunk_manifest:
+                        chunk_manifest.record(entries)
+                    if partials:
+                        aggregator.merge(*partials)
+                        aggregator.flush()
+                    for variable, error in region_errors.items():
+                        errors[variable] = max(errors[variable], error)
+                    complete = True
+                    for variable in variables:
+                        expected = sum(path is not None for path, _ in days[variable][start:stop])
+                        if n_read[variable] < expected:
+                            logger.warning(f"Region {start}:{stop} is missing "
+                                           f"{expected - n_read[variable]} {variable} days")
+                            complete = False
+                    # Regions with unreadable days are retried by the next run
+                    if complete:
+                        completed.add((start, stop))
+                        self.save_checkpoint(output_zarr, dict(layout, completed=sorted(completed)))
+                except Exception as e:
+                    logger.error(f"Error writing region {start}:{stop}: {e}")
+                    failed += 1
+
+        self.record_packing(output_zarr, errors)
+        if pyramid:
+            pyramid.finish()
+        zarr.consolidate_metadata(self.zarr_store(output_zarr))
+        if chunk_manifest:
+            chunk_manifest.finish()
+        if aggregator:
+            aggregator.finish(manifest)
+
+        if failed:
+            logger.error(f"{failed} regions failed; re-run to retry them")
+        else:
+            logger.info(f"Successfully created Zarr store at {output_zarr}")
+
+    def convert_directory(self, input_dir: Path, output_base: Location,
                          start_date: Optional[datetime] = None,
-                         end_date: Optional[datetime] = None) -> None:
+                         end_date: Optional[datetime] = None,
+                         catalog: Optional[PRISMFileCatalog] = None,
+                         single_store: bool = False) -> None:
         """
         Convert all variables in a directory to Zarr stores
 
@@ -300,16 +1913,28 @@ class PRISMToZarrConverter:
         -----------
         input_dir : Path
             Input directory containing PRISM data subdirectories
-        output_base : Path
-            Base output directory for Zarr stores
+        output_base : Location
+            Base output directory (or fsspec URL prefix) for Zarr stores
         start_date : Optional[datetime]
             Start date (uses all data if None)
         end_date : Optional[datetime]
             End date (uses all data if None)
+        catalog : Optional[PRISMFileCatalog]
+            Persistent file catalog; it is refreshed from input_dir before use.
+            An in-memory catalog is built if None.
+        single_store : bool
+            Write all variables in one pass into a single
+            prism_<start>_<end>.zarr store instead of one store per variable
         """
+        if catalog is None:
+            catalog = PRISMFileCatalog(resolution=self.resolution)
+        catalog.update(input_dir)
+        output_base = as_location(output_base)
+
         # Get list of variable directories
         var_dirs = [d for d in input_dir.iterdir() if d.is_dir()]
 
+        date_ranges = {}
         for var_dir in var_dirs:
             variable = var_dir.name
             if variable not in self.VARIABLE_INFO:
@@ -317,31 +1942,30 @@ class PRISMToZarrConverter:
                 continue
 
             # Determine date range if not specified
-            if start_date is None or end_date is None:
-                files = list(var_dir.glob("*.zip"))
-                if not files:
-                    logger.warning(f"No files found for {variable}")
-                    continue
-
-                # Parse dates from filenames to find range
-                dates = []
-                for f in files[:100]:  # Sample first 100 files
-                    try:
-                        metadata = self.processor.parse_filename(f.name)
-                        if 'year' in metadata and 'month' in metadata and 'day' in metadata:
-                            dates.append(datetime(metadata['year'], metadata['month'], metadata['day']))
-                    except:
-                        continue
-
-                if dates:
-                    start_date = start_date or min(dates)
-                    end_date = end_date or max(dates)
+            date_range = catalog.date_range(variable, resolution=self.resolution)
+            if date_range is None:
+                logger.warning(f"No files found for {variable}")
+                continue
+            date_ranges[variable] = date_range
+
+        if single_store and date_ranges:
+            var_start = start_date or min(first for first, _ in date_ranges.values())
+            var_end = end_date or max(last for _, last in date_ranges.values())
+            output_zarr = join(output_base, f"prism_{var_start.year}_{var_end.year}.zarr")
+            self.process_time_series(input_dir, sorted(date_ranges), var_start, var_end,
+                                     output_zarr, catalog=catalog)
+            return
+
+        for variable, date_range in date_ranges.items():
+            var_start = start_date or date_range[0]
+            var_end = end_date or date_range[1]
 
             # Create output path
-            output_zarr = output_base / f"{variable}_{start_date.year}_{end_date.year}.zarr"
+            output_zarr = join(output_base, f"{variable}_{var_start.year}_{var_end.year}.zarr")
 
             # Process this variable
-            self.process_time_series(var_dir, variable, start_date, end_date, output_zarr)
+            self.process_time_series(input_dir / variable, variable, var_start, var_end,
+                                     output_zarr, catalog=catalog)
 
     def validate_zarr(self, zarr_path: Path, original_file: Path,
                      variable: str, tolerance: float = 1e-5) -> bool:
@@ -371,9 +1995,17 @@ class PRISMToZarrConverter:
             metadata = self.processor.parse_filename(original_file.name)
             file_date = datetime(metadata['year'], metadata['month'], metadata['day'])
 
-            # Read Zarr data for this date
+            # Read Zarr data for this date (ISO labels work on any calendar)
             ds = xr.open_zarr(zarr_path)
-            zarr_data = ds[variable].sel(time=file_date, method='nearest').values
+
+            # Packed stores are only exact to their recorded quantization error
+            tolerance = max(tolerance, ds[variable].attrs.get('quantization_max_error', 0.0) + 1e-6)
+            day = file_date.strftime('%Y-%m-%d')
+            zarr_day = ds[variable].sel(time=slice(day, day))
+            if len(zarr_day.time) == 0:
+                logger.error(f"{day} is not in {zarr_path}")
+                return False
+            zarr_data = zarr_day.isel(time=0).values
 
             # Compare shapes
             if original_data.shape != zarr_data.shape:
@@ -428,12 +2060,24 @@ class PRISMToZarrConverter:
             z = zarr.open(str(zarr_path), mode='r')
             if var in z:
                 arr = z[var]
-                info['size_mb'] += arr.nbytes_stored / (1024 * 1024)
+                stored = arr.nbytes_stored() if callable(arr.nbytes_stored) else arr.nbytes_stored
+                info['size_mb'] += stored / (1024 * 1024)
 
         ds.close()
         return info
 
 
+def _write_region_worker(converter: PRISMToZarrConverter, output_zarr: Location, variables: List[str],
+                         days: Dict[str, List[Tuple[Optional[Path], Optional[datetime]]]], start: int,
+                         stacks: Optional[PRISMYearStack] = None, read_workers: int = 1,
+                         manifest: bool = True,
+                         aggregator: Optional[PRISMAggregator] = None,
+                         pyramid: Optional[PRISMPyramid] = None) -> Tuple[Dict, Dict, Dict, Optional[Tuple]]:
+    """Process pool entry point for PRISMToZarrConverter.write_region"""
+    return converter.write_region(output_zarr, variables, days, start, stacks, read_workers,
+                                  manifest, aggregator, pyramid)
+
+
 def main():
     """
     Main function to demonstrate usage
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+PRISM Zarr Store Validation
+Compares every day of a Zarr store against its source BIL files, in chunk
+order and in parallel, to certify whole stores
+"""
+
+import sys
+import argparse
+import threading
+import concurrent.futures
+import numpy as np
+import pandas as pd
+import xarray as xr
+from pathlib import Path
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple, Union
+import logging
+from tqdm import tqdm
+from prism_to_zarr import PRISMToZarrConverter
+from prism_catalog import PRISMFileCatalog
+from prism_rechunk import parse_memory
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class PRISMStoreValidator:
+    """
+    Bulk validation of a Zarr store against the archive it was built from
+
+    Days are grouped by the store's time chunks. Each task decodes one
+    time chunk of the store once and the matching source files with a
+    thread pool, then compares them day by day. Tasks run in parallel
+    under a memory cap; chunks too large for it are split into lat/lon
+    tiles of whole store chunks (each tile re-reads the source files),
+    and then into time windows (each window re-decodes the chunk).
+    """
+
+    def __init__(self, resolution: str = '4km', tolerance: float = 1e-5,
+                 max_mem: Union[int, str] = '2GB', max_workers: int = 4,
+                 read_workers: int = 4):
+        """
+        Initialize validator
+
+        Parameters:
+        -----------
+        resolution : str
+            PRISM data resolution ('4km' or '800m')
+        tolerance : float
+            Maximum absolute difference accepted (raised to a packed
+            variable's recorded quantization_max_error)
+        max_mem : Union[int, str]
+            Memory cap shared by all tasks, in bytes or as e.g. '2GB'
+        max_workers : int
+            Maximum number of time chunks validated concurrently
+        read_workers : int
+            Threads decoding source files within a task
+        """
+        self.converter = PRISMToZarrConverter(resolution)
+        self.tolerance = tolerance
+        self.max_mem = parse_memory(max_mem)
+        self.max_workers = max_workers
+        self.read_workers = read_workers
+
+    def plan_tasks(self, ds: xr.Dataset, variable: str,
+                   files: List[Tuple[Path, datetime]]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Group source files by the store time chunk holding their day
+
+        Parameters:
+        -----------
+        ds : xr.Dataset
+            Store opened without dask
+        variable : str
+            Variable name
+        files : List[Tuple[Path, datetime]]
+            (file path, date) pairs from the catalog
+
+        Returns:
+        --------
+        Tuple[List[Dict], List[Dict]]: Tasks with 'start', 'stop' and
+                                       'days' ((index, path, date) triples),
+                                       and result rows for files whose day
+                                       is not in the store
+        """
+        index = {(t.year, t.month, t.day): i for i, t in enumerate(ds.indexes['time'])}
+        chunk = ds[variable].encoding['chunks'][0]
+        n_times = ds.sizes['time']
+
+        tasks, absent = {}, []
+        for file_path, file_date in files:
+            i = index.get((file_date.year, file_date.month, file_date.day))
+            if i is None:
+                absent.append({'variable': variable, 'date': file_date, 'time_index': -1,
+                               'path': str(file_path), 'max_error': np.nan,
+                               'nodata_mismatch': 0, 'status': 'not_in_store'})
+                continue
+            start = i // chunk * chunk
+            task = tasks.setdefault(start, {'start': start, 'stop': min(start + chunk, n_times), 'days': []})
+            task['days'].append((i, file_path, file_date))
+
+        return [tasks[start] for start in sorted(tasks)], absent
+
+    def plan_units(self, ds: xr.Dataset, variable: str) -> Tuple[int, int, int, int]:
+        """
+        Size the (time window, lat rows, lon columns) unit of a task to max_mem
+
+        A unit holds the store chunks it touches while they are decoded,
+        its stored values (float64 once unpacked), its source days, and a
+        full-grid decode buffer per read thread. Whole time chunks are
+        kept while halving the tile (in whole store chunks); only a single
+        store chunk is then cut into time windows.
+
+        Parameters:
+        -----------
+        ds : xr.Dataset
+            Store opened without dask
+        variable : str
+            Variable name
+
+        Returns:
+        --------
+        Tuple[int, int, int, int]: Window length in days, tile rows, tile
+                                   columns and bytes of one unit
+        """
+        _, n_lat, n_lon = ds[variable].shape
+        # Edge chunks are decoded at full chunk size
+        chunk_time, chunk_lat, chunk_lon = ds[variable].encoding['chunks']
+        itemsize = np.dtype(ds[variable].encoding.get('dtype', ds[variable].dtype)).itemsize
+        budget = int(self.max_mem * PRISMToZarrConverter.MEMORY_HEADROOM)
+        scratch = self.read_workers * 2 * n_lat * n_lon * 4
+
+        def unit_bytes(window, rows, cols):
+            decoded = chunk_time * -(-rows // chunk_lat) * chunk_lat * -(-cols // chunk_lon) * chunk_lon * itemsize
+            return decoded + window * rows * cols * (8 + 4) + scratch
+
+        lat_chunks, lon_chunks = -(-n_lat // chunk_lat), -(-n_lon // chunk_lon)
+        while True:
+            rows, cols = min(n_lat, lat_chunks * chunk_lat), min(n_lon, lon_chunks * chunk_lon)
+            if unit_bytes(chunk_time, rows, cols) <= budget:
+                return chunk_time, rows, cols, unit_bytes(chunk_time, rows, cols)
+            if lat_chunks == lon_chunks == 1:
+                break
+            if lon_chunks == 1 or (lat_chunks > 1 and rows >= cols):
+                lat_chunks = -(-lat_chunks // 2)
+            else:
+                lon_chunks = -(-lon_chunks // 2)
+
+        window = (budget - unit_bytes(0, rows, cols)) // (rows * cols * (8 + 4))
+        if window < 1:
+            raise ValueError(f"max_mem is too small to validate {variable}: one day of one store chunk "
+                             f"needs {unit_bytes(1, rows, cols) / 1024 ** 3:.2f} GB, more than the "
+                             f"{budget / 1024 ** 3:.2f} GB planned out of {self.max_mem / 1024 ** 3:.2f} GB")
+        return int(window), rows, cols, unit_bytes(window, rows, cols)
+
+    def split_task(self, task: Dict, window: int, rows: int, cols: int,
+                   shape: Tuple[int, int]) -> List[Dict]:
+        """
+        Split a time chunk task into windows of its days and lat/lon tiles
+
+        Parameters:
+        -----------
+        task : Dict
+            Task from plan_tasks
+        window : int
+            Maximum days spanned by a unit
+        rows, cols : int
+            Tile size
+        shape : Tuple[int, int]
+            (lat, lon) size of the grid
+
+        Returns:
+        --------
+        List[Dict]: Units with 'start', 'stop', 'days', 'rows' and 'cols'
+        """
+        units, days = [], sorted(task['days'], key=lambda day: day[0])
+        while days:
+            start = days[0][0]
+            stop = min(start + window, task['stop'])
+            in_window = [day for day in days if day[0] < stop]
+            days = days[len(in_window):]
+            for row in range(0, shape[0], rows):
+                for col in range(0, shape[1], cols):
+                    units.append({'start': start, 'stop': stop, 'days': in_window,
+                                  'rows': slice(row, row + rows), 'cols': slice(col, col + cols)})
+        return units
+
+    def validate_chunk(self, ds: xr.Dataset, variable: str, task: Dict,
+                       tolerance: float) -> List[Dict]:
+        """
+        Compare one unit of a store time chunk with its source files
+
+        Parameters:
+        -----------
+        ds : xr.Dataset
+            Store opened without dask
+        variable : str
+            Variable name
+        task : Dict
+            Unit from split_task
+        tolerance : float
+            Maximum absolute difference accepted
+
+        Returns:
+        --------
+        List[Dict]: One result row per source file, for the unit's tile
+        """
+        # One decode of the store's chunk serves every day in the window
+        stored = ds[variable].isel(time=slice(task['start'], task['stop']),
+                                   lat=task['rows'], lon=task['cols']).values
+        mask_name = self.converter.availability_name(variable)
+        flags = ds[mask_name].values[task['start']:task['stop']] if mask_name in ds.coords else None
+
+        grid = (ds.sizes['lat'], ds.sizes['lon'])
+        source = np.empty((len(task['days']), stored.shape[1], stored.shape[2]), dtype='float32')
+        tiled = source.shape[1:] != grid
+        local = threading.local()
+
+        def read(k):
+            _, file_path, file_date = task['days'][k]
+            if not tiled:
+                return self.converter.read_day_into(source[k], file_path, file_date, variable)
+            # Tiles decode the whole day into a per-thread buffer
+            if not hasattr(local, 'day'):
+                local.day = np.empty(grid, dtype='float32')
+            readable = self.converter.read_day_into(local.day, file_path, file_date, variable)
+            source[k] = local.day[task['rows'], task['cols']]
+            return readable
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.read_workers) as executor:
+            readable = list(executor.map(read, range(len(task['days']))))
+
+        rows = []
+        for k, (i, file_path, file_date) in enumerate(task['days']):
+            row = {'variable': variable, 'date': file_date, 'time_index': i, 'path': str(file_path),
+                   'max_error': np.nan, 'nodata_mismatch': 0, 'readable': readable[k],
+                   'flagged': flags is not None and not flags[i - task['start']]}
+            if readable[k]:
+                day = stored[i - task['start']]
+                expected = source[k]
+                stored_nan, source_nan = np.isnan(day), np.isnan(expected)
+                both = ~stored_nan & ~source_nan
+
+                row['nodata_mismatch'] = int(np.count_nonzero(stored_nan != source_nan))
+                row['max_error'] = float(np.abs(day[both] - expected[both]).max()) if both.any() else 0.0
+            rows.append(row)
+
+        return rows
+
+    def day_status(self, row: Dict, tolerance: float) -> Dict:
+        """
+        Set the status of a day's result row, once all its tiles are merged
+
+        Parameters:
+        -----------
+        row : Dict
+            Merged rows of validate_chunk
+        tolerance : float
+            Maximum absolute difference accepted
+
+        Returns:
+        --------
+        Dict: The row with its status
+        """
+        if not row.pop('readable'):
+            row['status'] = 'unreadable_source'
+            row['max_error'] = np.nan
+            row['nodata_mismatch'] = 0
+        elif row['flagged']:
+            row['status'] = 'flagged_missing'
+        elif row['nodata_mismatch']:
+            row['status'] = 'mask_mismatch'
+        elif row['max_error'] > tolerance:
+            row['status'] = 'value_mismatch'
+        else:
+            row['status'] = 'ok'
+        del row['flagged']
+        return row
+
+    def validate(self, zarr_path: Union[str, Path], catalog: PRISMFileCatalog,
+                 variables: Optional[List[str]] = None,
+                 start_date: Optional[datetime] = None,
+                 end_date: Optional[datetime] = None) -> pd.DataFrame:
+        """
+        Validate every cataloged day of a store
+
+        Parameters:
+        -----------
+        zarr_path : Union[str, Path]
+            Zarr store path
+        catalog : PRISMFileCatalog
+            Catalog of the archive the store was built from
+        variables : Optional[List[str]]
+            Variables to validate (all gridded variables if None)
+        start_date : Optional[datetime]
+            First date (the store's first day if None)
+        end_date : Optional[datetime]
+            Last date (the store's last day if None)
+
+        Returns:
+        --------
+        pd.DataFrame: One row per source file with the per-day maximum
+                      error, the number of nodata-mask mismatches and a
+                      status ('ok', 'value_mismatch', 'mask_mismatch',
+                      'flagged_missing', 'unreadable_source', 'not_in_store')
+        """
+        zarr_path = Path(zarr_path)
+        ds = xr.open_zarr(zarr_path, chunks=None)
+        variables = variables or [var for var in ds.data_vars if ds[var].dims == ('time', 'lat', 'lon')]
+
+        times = ds.indexes['time']
+        start_date = start_date or datetime(times[0].year, times[0].month, times[0].day)
+        end_date = end_date or datetime(times[-1].year, times[-1].month, times[-1].day)
+
+        rows = []
+        try:
+            for variable in variables:
+                files = catalog.lookup(variable, start_date, end_date,
+                                       resolution=self.converter.resolution)
+                tasks, absent = self.plan_tasks(ds, variable, files)
+                rows.extend(absent)
+                if not tasks:
+                    logger.warning(f"No {variable} files to validate")
+                    continue
+
+                # Packed variables are only as precise as their recorded quantization
+                tolerance = max(self.tolerance,
+                                ds[variable].attrs.get('quantization_max_error', 0.0) + 1e-6)
+
+                # Units (and workers) are sized so that all of them fit max_mem together
+                window, tile_rows, tile_cols, unit_bytes = self.plan_units(ds, variable)
+                units = [unit for task in tasks
+                         for unit in self.split_task(task, window, tile_rows, tile_cols,
+                                                     (ds.sizes['lat'], ds.sizes['lon']))]
+                budget = int(self.max_mem * PRISMToZarrConverter.MEMORY_HEADROOM)
+                workers = max(1, min(self.max_workers, budget // unit_bytes))
+
+                logger.info(f"Validating {len(files)} {variable} days in {len(tasks)} time chunks "
+                            f"({len(units)} units of up to {window} days x {tile_rows}x{tile_cols} cells, "
+                            f"{unit_bytes / 1024 ** 3:.2f} GB) with {workers} workers")
+                days = {}
+                with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = [executor.submit(self.validate_chunk, ds, variable, unit, tolerance)
+                               for unit in units]
+                    for future in tqdm(futures, desc=f"Validating {variable}"):
+                        for row in future.result():
+                            day = days.setdefault(row['time_index'], row)
+                            if day is not row:
+                                day['max_error'] = max(day['max_error'], row['max_error'])
+                                day['nodata_mismatch'] += row['nodata_mismatch']
+                                day['readable'] &= row['readable']
+                rows.extend(self.day_status(row, tolerance) for row in days.values())
+        finally:
+            ds.close()
+
+        results = pd.DataFrame(rows, columns=['variable', 'date', 'time_index', 'path',
+                                              'max_error', 'nodata_mismatch', 'status'])
+        return results.sort_values(['variable', 'date'], ignore_index=True)
+
+    def summary(self, results: pd.DataFrame) -> pd.DataFrame:
+        """
+        Summarize validation results per variable
+
+        Parameters:
+        -----------
+        results : pd.DataFrame
+            Output of validate
+
+        Returns:
+        --------
+        pd.DataFrame: Days checked, failures and worst error per variable
+        """
+        return results.groupby('variable').agg(
+            days=('status', 'size'),
+            ok=('status', lambda status: int((status == 'ok').sum())),
+            failed=('status', lambda status: int((status != 'ok').sum())),
+            max_error=('max_error', 'max'),
+            nodata_mismatch=('nodata_mismatch', 'sum')
+        )
+
+
+def main():
+    """
+    Command line interface for validating a whole store
+    """
+    parser = argparse.ArgumentParser(description="Validate a PRISM Zarr store against its source files")
+    parser.add_argument('store', type=Path, help="Zarr store")
+    parser.add_argument('archive', type=Path, help="Archive of PRISM zip files the store was built from")
+    parser.add_argument('--variables', nargs='+', help="Variables to validate (default: all)")
+    parser.add_argument('--tolerance', type=float, default=1e-5, help="Accepted error (default: 1e-5)")
+    parser.add_argument('--max-mem', default='2GB', help="Memory cap (default: 2GB)")
+    parser.add_argument('--workers', type=int, default=4, help="Parallel time chunks (default: 4)")
+    parser.add_argument('--output', type=Path, default=Path("validation_report.csv"),
+                        help="Per-day report (default: validation_report.csv)")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("PRISM Zarr Store Validation")
+    print("="*60)
+
+    catalog = PRISMFileCatalog(args.archive / "prism_catalog.sqlite")
+    catalog.update(args.archive)
+
+    validator = PRISMStoreValidator(tolerance=args.tolerance, max_mem=args.max_mem,
+                                    max_workers=args.workers)
+    results = validator.validate(args.store, catalog, variables=args.variables)
+    results.to_csv(args.output, index=False)
+
+    print(validator.summary(results).to_string())
+    print(f"\nPer-day report saved to {args.output}")
+
+    failed = results[results['status'] != 'ok']
+    if len(failed):
+        print(f"\n{len(failed)} days FAILED validation:")
+        print(failed.head(20).to_string(index=False))
+        sys.exit(1)
+    print("\nStore certified: every day matches its source file")
+
+
+if __name__ == "__main__":
+    main()
@@ -82,6 +82,38 @@ class PRISMProcessor:
         print(f"Extracted {len(extracted_files)} files from {zip_path.name}")
         return extracted_files
 
+    def parse_bil_header(self, text):
+        """
+        Parse the contents of a PRISM BIL header (.hdr)
+
+        Parameters:
+        -----------
+        text : str
+            Header file contents
+
+        Returns:
+        --------
+        dict : Header parameters
+        """
+        header = {}
+
+        for line in text.splitlines():
+            if line.strip():
+                parts = line.strip().split()
+                if len(parts) >= 2:
+                    key = parts[0].lower()
+                    value = ' '.join(parts[1:])
+                    try:
+                        # Try to convert to number
+                        if '.' in value:
+                            header[key] = float(value)
+                        else:
+                            header[key] = int(value)
+                    except ValueError:
+                        header[key] = value
+
+        return header
+
     def read_bil_header(self, hdr_path):
         """
         Read PRISM BIL header file (.hdr)
@@ -95,25 +127,8 @@ class PRISMProcessor:
         --------
         dict : Header parameters
         """
-        header = {}
-
         with open(hdr_path, 'r') as f:
-            for line in f:
-                if line.strip():
-                    parts = line.strip().split()
-                    if len(parts) >= 2:
-                        key = parts[0].lower()
-                        value = ' '.join(parts[1:])
-                        try:
-                            # Try to convert to number
-                            if '.' in value:
-                                header[key] = float(value)
-                            else:
-                                header[key] = int(value)
-                        except ValueError:
-                            header[key] = value
-
-        return header
+            return self.parse_bil_header(f.read())
 
     def read_bil_data(self, bil_path):
         """
@@ -155,14 +170,95 @@ class PRISMProcessor:
 
         return data
 
-    def read_prism_dataset(self, file_path):
+    def read_bil_from_zip(self, zip_path, out=None):
+        """
+        Read the .bil grid of a PRISM zip in memory, without extracting it
+
+        The member is inflated straight into the output buffer, so no
+        temporary files are written and no intermediate copies are made.
+
+        Parameters:
+        -----------
+        zip_path : Path or str
+            Path to the PRISM zip file
+        out : numpy.ndarray
+            Optional preallocated C-contiguous float32 (nrows, ncols) array
+            to decode into (e.g. one time slice of a batch buffer)
+
+        Returns:
+        --------
+        numpy.ndarray : 2D array of climate data with nodata values left
+                        in place (not masked)
+        """
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            names = zip_ref.namelist()
+            bil_members = [m for m in names if m.endswith('.bil')]
+            if not bil_members:
+                raise ValueError(f"No .bil file found in {zip_path}")
+
+            hdr_member = bil_members[0][:-len('.bil')] + '.hdr'
+            if hdr_member in names:
+                header = self.parse_bil_header(zip_ref.read(hdr_member).decode('ascii', errors='replace'))
+                shape = (header.get('nrows', self.specs['nrows']),
+                         header.get('ncols', self.specs['ncols']))
+            else:
+                shape = (self.specs['nrows'], self.specs['ncols'])
+
+            if out is None:
+                # PRISM uses 32-bit floating point, little-endian
+                out = np.empty(shape, dtype='<f4')
+            elif out.shape != shape:
+                raise ValueError(f"Grid shape {shape} in {zip_path} does not match buffer {out.shape}")
+
+            buffer = memoryview(out.view(np.uint8).reshape(-1))
+            with zip_ref.open(bil_members[0]) as member:
+                n_read = 0
+                while n_read < len(buffer):
+                    n = member.readinto(buffer[n_read:])
+                    if not n:
+                        raise ValueError(f"Truncated .bil member in {zip_path}")
+                    n_read += n
+
+        return out
+
+    def is_cog_zip(self, file_path):
+        """
+        Check whether a zip holds a GeoTIFF deliverable instead of a BIL grid
+
+        Parameters:
+        -----------
+        file_path : Path or str
+            Path to the PRISM file
+
+        Returns:
+        --------
+        bool : True for zips with a .tif member and no .bil member
+        """
+        file_path = Path(file_path)
+        if file_path.suffix != '.zip':
+            return False
+
+        with zipfile.ZipFile(file_path, 'r') as zip_ref:
+            names = [name.lower() for name in zip_ref.namelist()]
+
+        return (not any(name.endswith('.bil') for name in names)
+                and any(name.endswith(('.tif', '.tiff')) for name in names))
+
+    def read_prism_dataset(self, file_path, in_memory=False, bounds=None, overview_level=None):
         """
-        Read a PRISM dataset (handles both .zip and .bil files)
+        Read a PRISM dataset (handles .zip, .bil and COG .tif files)
 
         Parameters:
         -----------
         file_path : Path or str
             Path to the PRISM file
+        in_memory : bool
+            Decode zip files in memory instead of extracting them to disk
+        bounds : tuple
+            (min_lon, min_lat, max_lon, max_lat) window to read, expanded to
+            whole tiles (COG inputs only)
+        overview_level : int
+            Internal overview level to read (COG inputs only)
 
         Returns:
         --------
@@ -170,7 +266,26 @@ class PRISMProcessor:
         """
         file_path = Path(file_path)
 
-        if file_path.suffix == '.zip':
+        if file_path.suffix in ('.tif', '.tiff') or self.is_cog_zip(file_path):
+            from prism_cog import PRISMCOGReader
+
+            data, metadata = PRISMCOGReader(self.resolution).read(
+                file_path, bounds=bounds, overview_level=overview_level
+            )
+            return {
+                'data': data,
+                'metadata': metadata,
+                'file_path': str(file_path)
+            }
+
+        if bounds is not None or overview_level is not None:
+            raise ValueError("Windowed and overview reads require a COG input")
+
+        if file_path.suffix == '.zip' and in_memory:
+            raw = self.read_bil_from_zip(file_path)
+            data = np.ma.masked_where(raw == self.specs['nodata_value'], raw)
+            bil_path = file_path
+        elif file_path.suffix == '.zip':
             # Extract and find .bil file
             extracted = self.extract_zip(file_path)
             bil_files = [f for f in extracted if f.suffix == '.bil']
@@ -179,14 +294,13 @@ class PRISMProcessor:
                 raise ValueError(f"No .bil file found in {file_path}")
 
             bil_path = bil_files[0]
+            data = self.read_bil_data(bil_path)
         elif file_path.suffix == '.bil':
             bil_path = file_path
+            data = self.read_bil_data(bil_path)
         else:
             raise ValueError(f"Unsupported file format: {file_path.suffix}")
 
-        # Read data
-        data = self.read_bil_data(bil_path)
-
         # Parse metadata from filename
         metadata = self.parse_filename(bil_path.name)
 
@@ -248,6 +362,100 @@ class PRISMProcessor:
 
         return metadata
 
+    def parse_stx(self, text):
+        """
+        Parse an ESRI .stx band statistics sidecar
+
+        Parameters:
+        -----------
+        text : str
+            Contents of the .stx file ("band min max mean std ...")
+
+        Returns:
+        --------
+        dict : Statistics for band 1 (empty if the file cannot be parsed)
+        """
+        for line in text.splitlines():
+            parts = line.split()
+            if len(parts) < 5:
+                continue
+            try:
+                values = [float(p) for p in parts[1:5]]
+            except ValueError:
+                continue
+            return dict(zip(['min', 'max', 'mean', 'std'], values))
+
+        return {}
+
+    def read_zip_statistics(self, zip_path):
+        """
+        Read summary statistics from the sidecar files bundled in a PRISM zip
+
+        Only the small metadata members are inflated; the .bil grid is never
+        read. Sources are tried in order: the .stx band statistics, the GDAL
+        .aux.xml STATISTICS_* items and the range domain of the FGDC .xml.
+
+        Parameters:
+        -----------
+        zip_path : Path or str
+            Path to the PRISM zip file
+
+        Returns:
+        --------
+        dict : Statistics (min, max, mean, std where available) and the
+               name of the sidecar they came from under 'source'
+        """
+        import xml.etree.ElementTree as ET
+
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            # ZipFile only parses the central directory here
+            members = {Path(m).name.lower(): m for m in zip_ref.namelist()}
+
+            def read_member(suffix, exclude=None):
+                for name, member in members.items():
+                    if name.endswith(suffix) and not (exclude and name.endswith(exclude)):
+                        return zip_ref.read(member).decode('utf-8', errors='replace')
+                return None
+
+            text = read_member('.stx')
+            if text:
+                stats = self.parse_stx(text)
+                if stats:
+                    stats['source'] = 'stx'
+                    return stats
+
+            text = read_member('.aux.xml')
+            if text:
+                keys = {'STATISTICS_MINIMUM': 'min', 'STATISTICS_MAXIMUM': 'max',
+                        'STATISTICS_MEAN': 'mean', 'STATISTICS_STDDEV': 'std'}
+                stats = {}
+                try:
+                    for item in ET.fromstring(text).iter('MDI'):
+                        if item.get('key') in keys and item.text:
+                            stats[keys[item.get('key')]] = float(item.text)
+                except (ET.ParseError, ValueError):
+                    stats = {}
+                if stats:
+                    stats['source'] = 'aux.xml'
+                    return stats
+
+            text = read_member('.xml', exclude='.aux.xml')
+            if text:
+                stats = {}
+                try:
+                    root = ET.fromstring(text)
+                    rdommin = root.find('.//rdommin')
+                    rdommax = root.find('.//rdommax')
+                    if rdommin is not None and rdommax is not None:
+                        stats = {'min': float(rdommin.text), 'max': float(rdommax.text)}
+                except (ET.ParseError, TypeError, ValueError):
+                    stats = {}
+                if stats:
+                    stats['source'] = 'xml'
+                    return stats
+
+        return {}
+
     def calculate_statistics(self, data):
         """
         Calculate basic statistics for PRISM data
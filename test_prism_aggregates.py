@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Round-trip tests for prism_aggregates.py
+Aggregates written during conversion must match numpy over the daily store
+"""
+
+import numpy as np
+import pytest
+import xarray as xr
+from datetime import timedelta
+from prism_to_zarr import PRISMToZarrConverter
+from prism_aggregates import PRISMAggregator, aggregate_path
+from zarr_analysis import PRISMZarrAnalyzer
+from conftest import START, N_DAYS
+
+
+def check_aggregates(output_zarr, variables):
+    """Compare both aggregate stores with numpy statistics of the daily data"""
+    daily = xr.open_zarr(output_zarr)
+    times = daily.indexes['time']
+    for frequency in ('monthly', 'annual'):
+        aggregate = xr.open_zarr(aggregate_path(output_zarr, frequency))
+        periods = [(t.year, t.month) if frequency == 'monthly' else (t.year,)
+                   for t in aggregate.indexes['time']]
+        for i, key in enumerate(periods):
+            in_period = times.year == key[0]
+            if frequency == 'monthly':
+                in_period &= times.month == key[1]
+            for variable in variables:
+                values = daily[variable].values[in_period]
+                np.testing.assert_allclose(aggregate[f"{variable}_mean"].values[i],
+                                           np.nanmean(values, axis=0), rtol=1e-6)
+                np.testing.assert_array_equal(aggregate[f"{variable}_min"].values[i],
+                                              np.nanmin(values, axis=0))
+                np.testing.assert_array_equal(aggregate[f"{variable}_max"].values[i],
+                                              np.nanmax(values, axis=0))
+                assert aggregate[f"{variable}_days"].values[i] == \
+                    daily[f"{variable}_available"].values[in_period].sum()
+        aggregate.close()
+    daily.close()
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+@pytest.mark.parametrize('preallocate', [False, True])
+def test_aggregates_match_numpy_under_max_mem(prism_archive, tmp_path, preallocate):
+    """Aggregates fit a tight max_mem by shortening chunks, and stay exact"""
+    output_zarr = tmp_path / 'temp.zarr'
+    converter = PRISMToZarrConverter('4km', max_mem='0.6GB')
+    converter.process_time_series(prism_archive, ['tmin', 'tmax'], START,
+                                  START + timedelta(days=N_DAYS - 1), output_zarr,
+                                  aggregates=True, preallocate=preallocate, max_workers=3)
+    assert converter.chunk_config['time'] < 365
+    check_aggregates(output_zarr, ['tmin', 'tmax'])
+
+    climatology = PRISMZarrAnalyzer(output_zarr).compute_climatology('tmin')
+    assert climatology.attrs['long_name'].startswith('Monthly mean of')
+
+
+def test_merge_holds_at_most_max_partials(tmp_path):
+    """Periods merged past the bound are left for finish() to recompute"""
+    aggregator = PRISMAggregator(PRISMToZarrConverter('4km'), tmp_path / 'tmin.zarr', ['tmin'])
+    keys = [(frequency, 'tmin', (1981, month) if frequency == 'monthly' else (1981 + month,))
+            for month in range(1, 7) for frequency in ('monthly', 'annual')]
+    aggregator.merge({key: aggregator.new_partial() for key in keys}, {})
+    assert len(aggregator.partials) == aggregator.max_partials()
+    assert set(aggregator.partials) | aggregator.stale == set(keys)
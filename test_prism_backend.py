@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Round-trip tests for prism_backend.py
+The lazy dataset over the zips must equal the converted store
+"""
+
+import xarray as xr
+from datetime import timedelta
+from prism_backend import PRISMBackendEntrypoint, open_prism_dataset
+from prism_to_zarr import PRISMToZarrConverter
+from conftest import START, N_DAYS, TMIN_GAPS
+from test_prism_to_zarr import reference_store  # noqa: F401
+
+
+def test_lazy_dataset_matches_store(prism_archive, reference_store, monkeypatch):  # noqa: F811
+    """Values and masks equal the converted store, gaps are NaN, and only selected days are decoded"""
+    decoded = []
+    read_day_into = PRISMToZarrConverter.read_day_into
+    monkeypatch.setattr(PRISMToZarrConverter, 'read_day_into',
+                        lambda self, out, path, date, *args: decoded.append(date) or
+                        read_day_into(self, out, path, date, *args))
+
+    ds = open_prism_dataset(prism_archive, ['tmin', 'tmax'], START, START + timedelta(days=N_DAYS - 1),
+                            time_chunk=10)
+    assert ds['tmin'].chunks[0] == (10, 10, 10, 10, 5) and not decoded
+    assert PRISMBackendEntrypoint().guess_can_open(prism_archive)
+
+    day = ds['tmax'].sel(time=START + timedelta(days=7)).compute()
+    assert decoded == [START + timedelta(days=7)] and day.shape == (621, 1405)
+
+    expected = xr.open_zarr(reference_store)
+    xr.testing.assert_equal(ds.load(), expected.load())
+    assert ds['tmin'].isel(time=list(TMIN_GAPS)).isnull().all()
+    assert not ds['tmin_available'].values[list(TMIN_GAPS)].any()
+    expected.close()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Round-trip tests for prism_catalog.py
+Indexes must only re-read changed files and agree with the archive
+"""
+
+import numpy as np
+import pytest
+from datetime import timedelta
+from prism_catalog import PRISMFileCatalog, PRISMStatsIndex
+from conftest import START, day_values, write_archive, write_day
+
+
+def test_stats_index_updates_incrementally(tmp_path):
+    """Only new or changed zips are read; deleted ones are dropped; values come from the .stx"""
+    var_dir = write_archive(tmp_path / 'daily', 'tmin', START, 5)
+    index = PRISMStatsIndex(tmp_path / 'stats.sqlite')
+    assert index.build(tmp_path / 'daily') == 5
+    assert index.build(tmp_path / 'daily') == 0
+
+    for row, day in zip(index.query('tmin'), range(5)):
+        assert row['date'] == f"{START + timedelta(days=day):%Y-%m-%d}" and row['source'] == 'stx'
+        assert row['min'] == pytest.approx(np.nanmin(day_values(day)), abs=1e-4)
+        assert row['max'] == pytest.approx(np.nanmax(day_values(day)), abs=1e-4)
+
+    # A rewritten day, a new day and a deleted day
+    write_day(var_dir, 'tmin', START, day_values(20) - 50)
+    write_day(var_dir, 'tmin', START + timedelta(days=5), day_values(5))
+    next(var_dir.glob(f"*_{START + timedelta(days=2):%Y%m%d}_bil.zip")).unlink()
+    assert index.build(tmp_path / 'daily') == 2
+    index.close()
+
+    index = PRISMStatsIndex(tmp_path / 'stats.sqlite')
+    assert [row['date'][-2:] for row in index.query('tmin')] == ['01', '02', '04', '05', '06']
+    assert [row['date'] for row in index.query('tmin', min_below=-40)] == [f"{START:%Y-%m-%d}"]
+    summary, = index.summary('tmin')
+    assert summary['files'] == 5 and summary['missing_statistics'] == 0
+    assert summary['last_date'] == f"{START + timedelta(days=5):%Y-%m-%d}"
+    index.close()
+
+
+def test_file_catalog_updates_and_prefers_latest_label(tmp_path):
+    """Updates only parse changed files, and lookup() picks the latest dataset label per date"""
+    var_dir = write_archive(tmp_path / 'daily', 'tmin', START, 6, skip=(3,))
+    catalog = PRISMFileCatalog(tmp_path / 'catalog.sqlite', resolution='4km')
+    assert catalog.update(tmp_path / 'daily') == 5
+    assert catalog.update(tmp_path / 'daily') == 0
+
+    # An older D1 and a newer D3 label, a provisional file, another resolution and a deletion
+    for day, label in ((1, '4kmD1'), (3, '4kmD1'), (4, '4kmD3')):
+        stem = f"PRISM_tmin_stable_{label}_{START + timedelta(days=day):%Y%m%d}_bil.zip"
+        (var_dir / stem).write_bytes(b'')
+    (var_dir / f"PRISM_tmin_provisional_4kmD2_{START + timedelta(days=6):%Y%m%d}_bil.zip").write_bytes(b'')
+    (var_dir / f"PRISM_tmin_stable_800mD2_{START + timedelta(days=7):%Y%m%d}_bil.zip").write_bytes(b'')
+    next(var_dir.glob(f"*4kmD2_{START:%Y%m%d}_bil.zip")).unlink()
+    assert catalog.update(tmp_path / 'daily') == 5
+    catalog.close()
+
+    catalog = PRISMFileCatalog(tmp_path / 'catalog.sqlite', resolution='4km')
+    files = catalog.lookup('tmin', START, START + timedelta(days=10))
+    assert [date for _, date in files] == [START + timedelta(days=day) for day in (1, 2, 3, 4, 5)]
+    labels = [path.name.split('_')[3] for path, _ in files]
+    assert labels == ['4kmD2', '4kmD2', '4kmD1', '4kmD3', '4kmD2']
+    assert len(catalog.lookup('tmin', START, START + timedelta(days=10), stability=None)) == 6
+    assert len(catalog.lookup('tmin', START, START + timedelta(days=10), resolution='800m')) == 1
+    assert catalog.date_range('tmin') == (START + timedelta(days=1), START + timedelta(days=5))
+    assert catalog.variables() == ['tmin']
+    catalog.close()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Round-trip tests for prism_cog.py
+COG exports must read back as the source grids, in full, by window and
+through the converter
+"""
+
+import numpy as np
+import pytest
+import xarray as xr
+from datetime import timedelta
+from prism_to_zarr import PRISMToZarrConverter
+from prism_catalog import PRISMFileCatalog
+from conftest import START, TMIN_GAPS, day_values
+
+pytest.importorskip('rasterio')
+from prism_cog import PRISMCOGExporter, PRISMCOGReader  # noqa: E402
+
+N_COG_DAYS = 20
+
+
+@pytest.fixture(scope='module')
+def cog_archive(prism_archive, tmp_path_factory):
+    """COGs of the first tmin days, and the export results"""
+    files = PRISMToZarrConverter('4km').find_files(prism_archive, 'tmin', START,
+                                                   START + timedelta(days=N_COG_DAYS - 1))
+    output_dir = tmp_path_factory.mktemp('cogs')
+    results = PRISMCOGExporter(blocksize=256).export(files, output_dir, max_workers=2)
+    return output_dir / 'tmin' / '1981', results
+
+
+def test_read_day_into_skips_the_zip_check_for_bil_zips(prism_archive, tmp_path, monkeypatch):
+    """BIL zips are recognised by name; other zips are still opened to check for a GeoTIFF"""
+    converter = PRISMToZarrConverter('4km')
+    calls = []
+    check = converter.processor.is_cog_zip
+    monkeypatch.setattr(converter.processor, 'is_cog_zip', lambda path: calls.append(path) or check(path))
+
+    source = next((prism_archive / 'tmin').glob('*_19811201_bil.zip'))
+    out = np.empty((621, 1405), dtype='float32')
+    assert converter.read_day_into(out, source, START, 'tmin')
+    np.testing.assert_array_equal(out, day_values(0))
+    assert calls == []
+
+    renamed = tmp_path / source.name.replace('_bil.zip', '.zip')
+    renamed.write_bytes(source.read_bytes())
+    out[:] = 0
+    assert converter.read_day_into(out, renamed, START, 'tmin')
+    np.testing.assert_array_equal(out, day_values(0))
+    assert calls == [renamed]
+
+
+def test_cog_round_trip_and_tile_window(cog_archive):
+    """Full, windowed and overview reads match day_values"""
+    cog_dir, results = cog_archive
+    assert results['exported'] == N_COG_DAYS - 1 and results['failed'] == 0
+
+    reader = PRISMCOGReader('4km')
+    for day in (0, 5, N_COG_DAYS - 1):
+        data, metadata = reader.read(next(cog_dir.glob(f"*_{START + timedelta(days=day):%Y%m%d}_cog.tif")))
+        assert metadata['date_str'] == f"{START + timedelta(days=day):%Y%m%d}"
+        np.testing.assert_array_equal(data.filled(np.nan), day_values(day))
+
+    cog_path = next(cog_dir.glob('*_19811201_cog.tif'))
+    window, metadata = reader.read(cog_path, bounds=(-100, 35, -95, 40))
+    specs = reader.specs
+    top = specs['yllcorner'] + specs['nrows'] * specs['cellsize']
+    row0 = round((top - metadata['yllcorner']) / specs['cellsize']) - window.shape[0]
+    col0 = round((metadata['xllcorner'] - specs['xllcorner']) / specs['cellsize'])
+    rows, cols = window.shape
+    assert row0 % 256 == 0 and col0 % 256 == 0
+    assert (rows % 256 == 0 or row0 + rows == 621) and (cols % 256 == 0 or col0 + cols == 1405)
+    assert (rows, cols) != (621, 1405)
+    np.testing.assert_array_equal(window.filled(np.nan), day_values(0)[row0:row0 + rows, col0:col0 + cols])
+
+    overview, metadata = reader.read(cog_path, overview_level=0)
+    assert overview.shape == (621 // 2, 1405 // 2) and metadata['overview_level'] == 0
+
+
+def test_converter_reads_cog_archive(prism_archive, cog_archive, tmp_path):
+    """The converter finds exported COGs and writes the same store as from the zips"""
+    cog_dir, _ = cog_archive
+    end = START + timedelta(days=N_COG_DAYS - 1)
+    from_cogs, from_zips = tmp_path / 'cogs.zarr', tmp_path / 'zips.zarr'
+    PRISMToZarrConverter('4km').process_time_series(cog_dir, 'tmin', START, end, from_cogs)
+    PRISMToZarrConverter('4km').process_time_series(prism_archive / 'tmin', 'tmin', START, end, from_zips)
+    xr.testing.assert_equal(xr.open_zarr(from_cogs).load(), xr.open_zarr(from_zips).load())
+    assert not xr.open_zarr(from_cogs)['tmin_available'].values[TMIN_GAPS[0]]
+
+    # Cataloged side by side, the zip of a date wins over its COG
+    catalog = PRISMFileCatalog(resolution='4km')
+    catalog.update(prism_archive / 'tmin')
+    catalog.update(cog_dir)
+    files = catalog.lookup('tmin', START, end)
+    assert len(files) == N_COG_DAYS - 1
+    assert all(path.name.endswith('_bil.zip') for path, _ in files)
+
+    cogs_only = PRISMFileCatalog(resolution='4km')
+    cogs_only.update(cog_dir)
+    assert [date for _, date in cogs_only.lookup('tmin', START, end)] == [date for _, date in files]
+
+
+def test_export_skips_existing_cogs(prism_archive, cog_archive):
+    """Re-exports skip COGs that exist unless asked to overwrite; names stay parseable"""
+    cog_dir, _ = cog_archive
+    files = PRISMToZarrConverter('4km').find_files(prism_archive, 'tmin', START, START + timedelta(days=2))
+    exporter = PRISMCOGExporter(blocksize=256)
+    assert exporter.output_name(files[0][0]) == f"PRISM_tmin_stable_4kmD2_{START:%Y%m%d}_cog.tif"
+
+    assert exporter.export(files, cog_dir.parent.parent, max_workers=1)['skipped'] == len(files)
+    results = exporter.export(files, cog_dir.parent.parent, max_workers=1, overwrite=True)
+    assert results['exported'] == len(files) and results['bytes'] > 0
+    assert not list(cog_dir.glob('*.tmp'))
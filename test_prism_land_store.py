@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Round-trip tests for prism_land_store.py
+Point series from land-cell stores must equal those of the gridded store
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+from datetime import timedelta
+from prism_land_store import PRISMLandStore
+from zarr_analysis import PRISMZarrAnalyzer
+from conftest import START, day_values
+from test_prism_to_zarr import reference_store  # noqa: F401
+
+POINTS = [(40.0, -100.0), (30.2, -110.7), (47.5, -95.3), (26.0, -124.5)]
+
+
+@pytest.mark.parametrize('hot', [False, True])
+def test_point_series_match_gridded_store(reference_store, tmp_path, hot):  # noqa: F811
+    """Land points read the same series from cells (and the hot tier); ocean points are NaN"""
+    target = PRISMLandStore('0.2GB').build(reference_store, tmp_path / 'land.zarr', cell_chunk=4096,
+                                           hot_dir=tmp_path / 'hot' if hot else None)
+    land = xr.open_zarr(target)
+    assert land.attrs['layout'] == 'land_cells'
+    assert land.sizes['cell'] == np.isfinite(day_values(0)).sum()
+    land.close()
+
+    gridded, cells = PRISMZarrAnalyzer(reference_store), PRISMZarrAnalyzer(target)
+    assert sorted(cells.hot) == (['tmax', 'tmin'] if hot else [])
+    window = (START + timedelta(days=10), START + timedelta(days=20))
+    for lat, lon in POINTS:
+        for variable in ('tmin', 'tmax'):
+            pd.testing.assert_frame_equal(cells.extract_point_time_series(lat, lon, variable),
+                                          gridded.extract_point_time_series(lat, lon, variable))
+            pd.testing.assert_frame_equal(cells.extract_point_time_series(lat, lon, variable, *window),
+                                          gridded.extract_point_time_series(lat, lon, variable, *window))
+    assert cells.extract_point_time_series(*POINTS[0], 'tmax')['tmax'].notna().all()
+    assert cells.extract_point_time_series(*POINTS[-1], 'tmin')['tmin'].isna().all()
+
+    with pytest.raises(ValueError, match='needs a gridded store'):
+        cells.get_map(START, 'tmin')
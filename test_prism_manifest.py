@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Round-trip tests for prism_manifest.py
+Manifests written during conversion must match the store, and flag any
+chunk changed after it was written
+"""
+
+from datetime import timedelta
+from prism_to_zarr import PRISMToZarrConverter
+from prism_manifest import PRISMChunkManifest
+from conftest import START, N_DAYS
+
+
+def test_verify_flags_corrupted_and_missing_chunks(prism_archive, tmp_path):
+    """Batches are journaled, merged once at the end, and verify() finds damaged chunks"""
+    output_zarr = tmp_path / 'tmax.zarr'
+    PRISMToZarrConverter('4km', chunk_strategy='balanced').process_time_series(
+        prism_archive / 'tmax', 'tmax', START, START + timedelta(days=N_DAYS - 1), output_zarr)
+    manifest = PRISMChunkManifest(output_zarr)
+    assert manifest.manifest_path.exists() and not manifest.journal_path.exists()
+    assert manifest.verify().empty
+
+    chunks = manifest.load()['chunks']
+    stored = sorted(key for key, entry in chunks.items() if entry and key.startswith('tmax/c/'))
+    assert len(stored) > 2 and 'tmax/zarr.json' in chunks
+
+    # Recording only appends to the journal; the manifest is rewritten by finish()
+    before = manifest.manifest_path.read_bytes()
+    manifest.record({stored[0]: chunks[stored[0]]})
+    assert manifest.manifest_path.read_bytes() == before
+    assert manifest.load()['chunks'] == chunks
+    manifest.finish()
+    assert not manifest.journal_path.exists()
+
+    corrupted = output_zarr / stored[0]
+    data = bytearray(corrupted.read_bytes())
+    data[len(data) // 2] ^= 0xFF
+    corrupted.write_bytes(bytes(data))
+    (output_zarr / stored[1]).unlink()
+    (output_zarr / 'tmax' / 'c' / 'stray').write_bytes(b'')
+
+    problems = dict(zip(*manifest.verify().values.T))
+    assert problems == {stored[0]: 'hash_mismatch', stored[1]: 'missing', 'tmax/c/stray': 'unlisted'}
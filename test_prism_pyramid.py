@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Round-trip tests for prism_pyramid.py
+Pyramid levels must be NaN-aware block means of the daily grid
+"""
+
+import numpy as np
+import pytest
+import xarray as xr
+import zarr
+from datetime import timedelta
+from prism_to_zarr import PRISMToZarrConverter
+from prism_pyramid import read_multiscales
+from prism_rechunk import PRISMRechunker
+from prism_land_store import PRISMLandStore
+from zarr_analysis import PRISMZarrAnalyzer
+from conftest import START, N_DAYS
+
+
+def check_levels(output_zarr, variables, levels):
+    """Compare every listed level with xarray's padded block means of the base grid"""
+    daily = xr.open_zarr(output_zarr)
+    entries = read_multiscales(output_zarr)
+    assert [entry['factor'] for entry in entries] == [2 ** level for level in range(levels + 1)]
+    for entry in entries[1:]:
+        level = xr.open_zarr(output_zarr, group=entry['path'])
+        factor = entry['factor']
+        for variable in variables:
+            expected = daily[variable].coarsen(lat=factor, lon=factor, boundary='pad').mean()
+            np.testing.assert_allclose(level[variable].values, expected.values, rtol=1e-5, atol=1e-4)
+        level.close()
+    daily.close()
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_pyramid_fits_max_mem(prism_archive, tmp_path):
+    """Pyramid coarsening counts against max_mem when the chunks are sized"""
+    output_zarr = tmp_path / 'temp.zarr'
+    converter = PRISMToZarrConverter('4km', max_mem='0.6GB')
+    converter.process_time_series(prism_archive, ['tmin', 'tmax'], START,
+                                  START + timedelta(days=N_DAYS - 1), output_zarr, pyramid_levels=3)
+    assert converter.chunk_config['time'] < 365
+    check_levels(output_zarr, ['tmin', 'tmax'], 3)
+
+
+@pytest.fixture(scope='module')
+def pyramid_store(prism_archive, tmp_path_factory):
+    """tmax store with a 2-level pyramid"""
+    output_zarr = tmp_path_factory.mktemp('pyramid') / 'tmax.zarr'
+    PRISMToZarrConverter('4km').process_time_series(prism_archive / 'tmax', 'tmax', START,
+                                                    START + timedelta(days=N_DAYS - 1), output_zarr,
+                                                    pyramid_levels=2)
+    return output_zarr
+
+
+def test_get_map_rejects_dates_off_the_axis(pyramid_store):
+    """Dates before or after the store raise instead of wrapping to another day"""
+    analyzer = PRISMZarrAnalyzer(pyramid_store)
+    np.testing.assert_allclose(analyzer.get_map(START + timedelta(days=3), 'tmax', (621, 1405)).values,
+                               xr.open_zarr(pyramid_store)['tmax'].isel(time=3).values)
+    for date in (START - timedelta(days=6), START + timedelta(days=N_DAYS)):
+        with pytest.raises(ValueError, match='1981-12-01 to 1982-01-14'):
+            analyzer.get_map(date, 'tmax')
+
+
+def test_derived_stores_drop_multiscales(pyramid_store, tmp_path):
+    """Rechunked and land-cell copies do not list levels they do not contain"""
+    rechunked = PRISMRechunker('4GB').rechunk(pyramid_store, tmp_path / 'balanced.zarr', 'balanced')
+    assert 'multiscales' not in zarr.open_group(str(rechunked), mode='r').attrs
+    assert read_multiscales(rechunked) == [{'path': '.', 'level': 0, 'factor': 1}]
+    analyzer = PRISMZarrAnalyzer(rechunked)
+    assert analyzer.get_map(START, 'tmax').shape == (621, 1405)
+
+    land = PRISMLandStore('4GB').build(pyramid_store, tmp_path / 'land.zarr')
+    assert 'multiscales' not in zarr.open_group(str(land), mode='r').attrs
+
+
+def test_read_multiscales_skips_missing_levels(pyramid_store, tmp_path):
+    """Levels listed in the metadata but absent from the store are left out"""
+    plain = tmp_path / 'plain.zarr'
+    xr.open_zarr(pyramid_store).isel(time=slice(0, 3)).load().drop_encoding().to_zarr(plain)
+    group = zarr.open_group(str(plain), mode='r+')
+    group.attrs['multiscales'] = zarr.open_group(str(pyramid_store), mode='r').attrs['multiscales']
+    zarr.consolidate_metadata(str(plain))
+    assert read_multiscales(plain) == [{'path': '.', 'level': 0, 'factor': 1}]
+    assert sorted(PRISMZarrAnalyzer(plain).levels) == [0]
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Round-trip tests for prism_rechunk.py
+Rechunked stores must hold exactly the source data in the new layout
+"""
+
+import pytest
+import zarr
+from prism_rechunk import PRISMRechunker
+from prism_manifest import PRISMChunkManifest
+from test_prism_to_zarr import reference_store, assert_same_store  # noqa: F401
+
+
+@pytest.mark.parametrize('chunks, expected', [
+    ('space_optimized', ((45, 155, 351), None)),
+    ({'time': 7, 'lat': 100, 'lon': 100, 'shards': {'time': 14, 'lat': 300, 'lon': 300}},
+     ((7, 100, 100), (14, 300, 300))),
+])
+def test_rechunk_preserves_data(reference_store, tmp_path, chunks, expected):  # noqa: F811
+    """Blocks sized to a small max_mem reassemble the source in the target layout"""
+    target = tmp_path / 'rechunked.zarr'
+    PRISMRechunker('0.1GB', max_workers=2).rechunk(reference_store, target, chunks)
+
+    assert not target.with_name(target.name + '.rechunk-tmp').exists()
+    for name in ('tmin', 'tmax'):
+        array = zarr.open_group(str(target), mode='r')[name]
+        assert (array.chunks, array.shards) == expected
+    assert_same_store(target, reference_store)
+    assert PRISMChunkManifest(target).verify().empty
+
+    with pytest.raises(FileExistsError):
+        PRISMRechunker('0.1GB').rechunk(reference_store, target, chunks)
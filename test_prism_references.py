@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Round-trip tests for prism_references.py
+Reference files must read the extracted BIL files as the zips decode
+"""
+
+import numpy as np
+import pytest
+from datetime import timedelta
+from prism_references import PRISMReferenceBuilder, open_references
+from zarr_analysis import PRISMZarrAnalyzer
+from conftest import START, day_values, write_archive
+
+N_REF_DAYS = 8
+
+
+def test_references_match_zips(tmp_path):
+    """Referenced days equal day_values; gaps and unusable .bil files read as NaN and unavailable"""
+    pytest.importorskip('fsspec')
+    write_archive(tmp_path, 'tmin', START, N_REF_DAYS, skip=(3,))
+    write_archive(tmp_path, 'tmax', START, N_REF_DAYS)
+    end = START + timedelta(days=N_REF_DAYS - 1)
+
+    builder = PRISMReferenceBuilder('4km', row_chunk=27)
+    builder.build(tmp_path, ['tmin', 'tmax'], START, end, tmp_path / 'refs.json', extract=True)
+
+    # A truncated extraction after the fact; rebuilding without extract skips it
+    truncated = builder.bil_path(next((tmp_path / 'tmax').glob(f"*_{START + timedelta(days=5):%Y%m%d}_bil.zip")))
+    truncated.write_bytes(truncated.read_bytes()[:1000])
+    builder.build(tmp_path, ['tmin', 'tmax'], START, end, tmp_path / 'refs.json')
+
+    ds = open_references(tmp_path / 'refs.json')
+    assert ds.sizes == {'time': N_REF_DAYS, 'lat': 621, 'lon': 1405}
+    assert ds['tmin'].encoding['chunks'] == (1, 27, 1405)
+    assert ds['tmin_available'].values.tolist() == [day != 3 for day in range(N_REF_DAYS)]
+    assert ds['tmax_available'].values.tolist() == [day != 5 for day in range(N_REF_DAYS)]
+    for day in range(N_REF_DAYS):
+        for name, gap in (('tmin', 3), ('tmax', 5)):
+            values = ds[name].isel(time=day).values
+            if day == gap:
+                assert np.isnan(values).all()
+            else:
+                np.testing.assert_array_equal(values, day_values(day))
+    ds.close()
+
+    analyzer = PRISMZarrAnalyzer(tmp_path / 'refs.json')
+    assert analyzer.missing_dates('tmin') == [START + timedelta(days=3)]
+    series = analyzer.extract_point_time_series(40.0, -100.0, 'tmax')
+    assert series['tmax'].isna().tolist() == [day == 5 for day in range(N_REF_DAYS)]
+
+    with pytest.raises(ValueError, match='does not divide'):
+        PRISMReferenceBuilder('4km', row_chunk=100)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Round-trip tests for prism_stack.py
+Year stacks must notice zips added to the archive after they were built
+"""
+
+import numpy as np
+import xarray as xr
+from datetime import datetime
+from prism_to_zarr import PRISMToZarrConverter
+from prism_catalog import PRISMFileCatalog
+from prism_stack import PRISMYearStack
+from conftest import write_archive, write_day, day_values
+
+
+def test_stack_goes_stale_when_a_zip_is_added(tmp_path):
+    """A stack built from a partial year is rebuilt, and converted around, once the gap is filled"""
+    start, end = datetime(1981, 12, 1), datetime(1981, 12, 10)
+    var_dir = write_archive(tmp_path / 'daily', 'tmin', start, 10, skip=(4,))
+    catalog = PRISMFileCatalog(resolution='4km')
+    catalog.update(var_dir)
+    stacks = PRISMYearStack(tmp_path / 'stacks')
+    stacks.consolidate_range(catalog, 'tmin', 1981, 1981)
+
+    late = datetime(1981, 12, 5)
+    assert stacks.sidecar_path('tmin', 1981).exists()
+    assert not stacks.available('tmin', late)
+    assert stacks.has('tmin', 1981, catalog.lookup('tmin', start, end, resolution='4km'))
+
+    # The missing day arrives after the stack was built
+    write_day(var_dir, 'tmin', late, day_values(4))
+    catalog.update(var_dir)
+    files = catalog.lookup('tmin', start, end, resolution='4km')
+    assert not PRISMYearStack(tmp_path / 'stacks').has('tmin', 1981, files)
+
+    # The converter reads that year from the zips instead
+    output_zarr = tmp_path / 'tmin.zarr'
+    PRISMToZarrConverter('4km').process_time_series(var_dir, 'tmin', start, end, output_zarr,
+                                                    catalog=catalog,
+                                                    stacks=PRISMYearStack(tmp_path / 'stacks'))
+    ds = xr.open_zarr(output_zarr)
+    assert ds['tmin_available'].values.all()
+    np.testing.assert_array_equal(ds['tmin'].sel(time=late).values, day_values(4))
+    ds.close()
+
+    # Consolidating again rebuilds the stale stack
+    stacks = PRISMYearStack(tmp_path / 'stacks')
+    stacks.consolidate_range(catalog, 'tmin', 1981, 1981)
+    assert stacks.has('tmin', 1981, files)
+    assert stacks.available('tmin', late)
+    np.testing.assert_array_equal(stacks.read_day('tmin', late), day_values(4))
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Round-trip tests for object-store targets (prism_storage.py)
+Conversions to fsspec URLs must match the same conversion on local disk
+"""
+
+import uuid
+import pytest
+import xarray as xr
+import zarr
+from datetime import timedelta
+from prism_to_zarr import PRISMToZarrConverter
+from prism_storage import zarr_store
+from prism_aggregates import aggregate_path
+from zarr_analysis import PRISMZarrAnalyzer, open_store
+from conftest import START, N_DAYS, write_archive
+
+
+@pytest.fixture(params=['memory', 's3'])
+def object_store(request):
+    """Empty store prefix URL and its storage_options: fsspec's memory:// or S3 on a local moto server"""
+    fsspec = pytest.importorskip('fsspec')
+    prefix = f"prism-{uuid.uuid4().hex[:8]}"
+    if request.param == 'memory':
+        yield f"memory://{prefix}", {}
+        fsspec.filesystem('memory').rm(f"/{prefix}", recursive=True)
+        return
+
+    s3fs = pytest.importorskip('s3fs')
+    server = pytest.importorskip('moto.server').ThreadedMotoServer(ip_address='127.0.0.1', port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    options = {'endpoint_url': f"http://{host}:{port}", 'key': 'testing', 'secret': 'testing'}
+    s3fs.S3FileSystem(**options).mkdir(prefix)
+    yield f"s3://{prefix}", options
+    server.stop()
+
+
+def convert(archives, output_zarr, storage_options=None):
+    """Append each archive in turn, after an interrupted append left the first run's arrays too long"""
+    end = START + timedelta(days=N_DAYS - 1)
+    for i, archive in enumerate(archives):
+        converter = PRISMToZarrConverter('4km', storage_options=storage_options)
+        converter.process_time_series(archive, ['tmin', 'tmax'], START, end, output_zarr,
+                                      manifest=False, aggregates=True, pyramid_levels=1)
+        if i == 0:
+            group = zarr.open_group(zarr_store(output_zarr, storage_options), mode='r+')
+            group['tmin'].resize((group['tmin'].shape[0] + 5,) + group['tmin'].shape[1:])
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_object_store_matches_local(prism_archive, tmp_path, object_store):
+    """Appends, resumes, aggregates and pyramid levels on an object store equal a local conversion"""
+    url, options = object_store
+    partial = tmp_path / 'partial'
+    write_archive(partial, 'tmin', START, 30, skip=(14,))
+    write_archive(partial, 'tmax', START, 30)
+
+    local_zarr, remote_zarr = tmp_path / 'temp.zarr', f"{url}/temp.zarr"
+    convert([partial, prism_archive], local_zarr)
+    convert([partial, prism_archive], remote_zarr, options)
+
+    for group in (None, '1'):
+        xr.testing.assert_equal(open_store(remote_zarr, options, group=group).load(),
+                                open_store(local_zarr, group=group).load())
+    for frequency in ('monthly', 'annual'):
+        xr.testing.assert_equal(open_store(aggregate_path(remote_zarr, frequency), options).load(),
+                                open_store(aggregate_path(local_zarr, frequency)).load())
+
+    remote, local = PRISMZarrAnalyzer(remote_zarr, storage_options=options), PRISMZarrAnalyzer(local_zarr)
+    assert set(remote.aggregates) == {'monthly', 'annual'} and sorted(remote.levels) == [0, 1]
+    assert remote.missing_dates('tmin') == local.missing_dates('tmin')
+    assert remote.extract_point_time_series(40.0, -100.0, 'tmax').equals(
+        local.extract_point_time_series(40.0, -100.0, 'tmax'))
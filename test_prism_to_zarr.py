@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Round-trip tests for prism_to_zarr.py
+Convert the synthetic archive from conftest.py and read it back
+"""
+
+import threading
+import numpy as np
+import pytest
+import xarray as xr
+import zarr
+from datetime import timedelta
+from prism_to_zarr import PRISMToZarrConverter
+from prism_catalog import PRISMFileCatalog
+from prism_stack import PRISMYearStack
+from prism_manifest import PRISMChunkManifest
+from zarr_analysis import PRISMZarrAnalyzer
+from conftest import START, N_DAYS, TMIN_GAPS, day_values, write_archive
+from test_prism_aggregates import check_aggregates
+from test_prism_pyramid import check_levels
+
+
+@pytest.fixture(scope='module')
+def reference_store(prism_archive, tmp_path_factory):
+    """tmin and tmax in 30-day chunks, appended one batch at a time by a single reader"""
+    output_zarr = tmp_path_factory.mktemp('reference') / 'temp.zarr'
+    PRISMToZarrConverter('4km', chunk_strategy='balanced').process_time_series(
+        prism_archive, ['tmin', 'tmax'], START, START + timedelta(days=N_DAYS - 1), output_zarr,
+        batch_days=30, read_workers=1)
+    return output_zarr
+
+
+def assert_same_store(store, reference):
+    """Stores hold the same values, masks, coordinates and attributes (but creation dates)"""
+    ds, expected = xr.open_zarr(store), xr.open_zarr(reference)
+    assert ds.attrs.pop('creation_date') and expected.attrs.pop('creation_date')
+    xr.testing.assert_identical(ds.load(), expected.load())
+    ds.close()
+    expected.close()
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_preallocated_regions_match_append(prism_archive, reference_store, tmp_path):
+    """Worker processes filling chunk-aligned regions write the same store as appending"""
+    converter = PRISMToZarrConverter('4km', chunk_strategy='balanced')
+    assert converter.plan_regions(N_DAYS) == [(0, 30), (30, N_DAYS)]
+
+    output_zarr = tmp_path / 'temp.zarr'
+    converter.process_time_series(prism_archive, ['tmin', 'tmax'], START,
+                                  START + timedelta(days=N_DAYS - 1), output_zarr,
+                                  preallocate=True, max_workers=2)
+    assert_same_store(output_zarr, reference_store)
+    assert converter.load_checkpoint(output_zarr)['completed'] == [[0, 30], [30, N_DAYS]]
+
+
+def test_multi_variable_store_matches_single_variable_stores(prism_archive, reference_store, tmp_path):
+    """One dataset of tmin and tmax holds what separate conversions hold, chunked alike"""
+    combined = xr.open_zarr(reference_store)
+    assert sorted(combined.data_vars) == ['tmax', 'tmin']
+    assert combined['tmin'].encoding['chunks'] == combined['tmax'].encoding['chunks'] == (30, 207, 468)
+    for name in ('tmin', 'tmax'):
+        output_zarr = tmp_path / f"{name}.zarr"
+        PRISMToZarrConverter('4km', chunk_strategy='balanced').process_time_series(
+            prism_archive / name, name, START, START + timedelta(days=N_DAYS - 1), output_zarr)
+        single = xr.open_zarr(output_zarr)
+        other = f"{'tmax' if name == 'tmin' else 'tmin'}_available"
+        xr.testing.assert_identical(combined[name].drop_vars(other).load(), single[name].load())
+        assert combined[name].attrs == single[name].attrs and combined[name].attrs['units']
+        single.close()
+    combined.close()
+
+
+def test_codec_pipelines_are_lossless(prism_archive, reference_store, tmp_path):
+    """Per-variable codec pipelines are applied and decode to the same data"""
+    converter = PRISMToZarrConverter('4km', chunk_strategy='balanced', codec_strategy='zstd',
+                                     variable_codecs={'tmax': 'blosc_zstd_bitshuffle'})
+    output_zarr = tmp_path / 'temp.zarr'
+    converter.process_time_series(prism_archive, ['tmin', 'tmax'], START,
+                                  START + timedelta(days=N_DAYS - 1), output_zarr, batch_days=30)
+    assert_same_store(output_zarr, reference_store)
+
+    group = zarr.open_group(str(output_zarr), mode='r')
+    zstd = group['tmin'].metadata.to_dict()['codecs'][-1]
+    assert zstd['name'] == 'zstd' and zstd['configuration']['level'] == 5
+    blosc = group['tmax'].metadata.to_dict()['codecs'][-1]
+    assert blosc['name'] == 'blosc' and blosc['configuration']['shuffle'] == 'bitshuffle'
+
+    with pytest.raises(ValueError, match='Delta filter'):
+        PRISMToZarrConverter('4km', codec_strategy={'compressor': 'zstd', 'delta': True}).codec_encoding('tmin')
+    with pytest.raises(ValueError, match='Unknown compressor'):
+        PRISMToZarrConverter('4km', codec_strategy={'compressor': 'gzip'}).codec_encoding('tmin')
+
+
+@pytest.mark.parametrize('packing', ['scale_offset', 'bitround'])
+def test_packing_stays_within_its_error_bound(prism_archive, reference_store, tmp_path, packing):
+    """Packed stores decode within the recorded error, itself within the documented bound"""
+    converter = PRISMToZarrConverter('4km', chunk_strategy='balanced', packing=packing)
+    output_zarr = tmp_path / 'temp.zarr'
+    converter.process_time_series(prism_archive, ['tmin', 'tmax'], START,
+                                  START + timedelta(days=N_DAYS - 1), output_zarr, batch_days=30)
+
+    packed, expected = xr.open_zarr(output_zarr), xr.open_zarr(reference_store)
+    for name in ('tmin', 'tmax'):
+        assert packed[name].attrs['packing'] == packing
+        bound = packed[name].attrs['quantization_max_error']
+        assert 0 < bound < 0.005
+        error = np.abs(packed[name].values - expected[name].values)
+        assert np.nanmax(error) <= bound + 1e-6
+        np.testing.assert_array_equal(np.isnan(packed[name].values), np.isnan(expected[name].values))
+    packed.close()
+    expected.close()
+
+    # Precipitation is packed with scale_factor 0.02, so rounding reaches 0.01 mm
+    # (plus float32 rounding of the measurement)
+    ppt = np.linspace(0, 1300, 100001, dtype='float32')
+    error = converter.check_packing('ppt', ppt)
+    assert 0 < error <= (0.01 if packing == 'scale_offset' else 0.005) + 1e-4
+    if packing == 'scale_offset':
+        assert error > 0.005
+        with pytest.raises(ValueError, match='do not fit uint16'):
+            converter.check_packing('ppt', np.array([1400.0], dtype='float32'))
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+@pytest.mark.parametrize('strategy, chunks, shards', [
+    ('sharded_daily', (1, 621, 1405), (365, 621, 1405)),
+    ('sharded_tiles', (365, 27, 32), (365, 621, 1440)),
+])
+def test_sharded_layouts_match_plain_chunks(prism_archive, reference_store, tmp_path, strategy, chunks, shards):
+    """Sharded stores hold the same data, with one manifest entry per shard"""
+    output_zarr = tmp_path / 'temp.zarr'
+    PRISMToZarrConverter('4km', chunk_strategy=strategy).process_time_series(
+        prism_archive, ['tmin', 'tmax'], START, START + timedelta(days=N_DAYS - 1), output_zarr,
+        batch_days=30)
+    assert_same_store(output_zarr, reference_store)
+
+    group = zarr.open_group(str(output_zarr), mode='r')
+    for name in ('tmin', 'tmax'):
+        assert (group[name].chunks, group[name].shards) == (chunks, shards)
+    manifest = PRISMChunkManifest(output_zarr)
+    assert sorted(key for key in manifest.load()['chunks'] if key.startswith('tmin/c/')) == ['tmin/c/0/0/0']
+    assert manifest.verify().empty
+
+    analyzer = PRISMZarrAnalyzer(output_zarr)
+    np.testing.assert_array_equal(analyzer.get_map(START + timedelta(days=40), 'tmax').values, day_values(40))
+    assert analyzer.extract_point_time_series(40.0, -100.0, 'tmax').equals(
+        PRISMZarrAnalyzer(reference_store).extract_point_time_series(40.0, -100.0, 'tmax'))
+
+
+def test_threaded_pipeline_matches_single_reader(prism_archive, reference_store, tmp_path):
+    """Reading ahead on several threads writes the same store, and stopping early ends the reader"""
+    converter = PRISMToZarrConverter('4km', chunk_strategy='balanced')
+    output_zarr = tmp_path / 'temp.zarr'
+    converter.process_time_series(prism_archive, ['tmin', 'tmax'], START,
+                                  START + timedelta(days=N_DAYS - 1), output_zarr, batch_days=30,
+                                  read_workers=4, write_workers=2, queue_size=2)
+    assert_same_store(output_zarr, reference_store)
+
+    files = converter.find_files(prism_archive, 'tmax', START, START + timedelta(days=N_DAYS - 1))
+    days, _ = converter.build_time_axis({'tmax': files})
+    batches = [{'tmax': days['tmax'][start:start + 5]} for start in range(0, N_DAYS, 5)]
+    pipeline = converter.iter_batches(batches, ['tmax'], read_workers=2, queue_size=2)
+    batch, data, available = next(pipeline)
+    assert batch is batches[0] and available['tmax'].all()
+    np.testing.assert_array_equal(data['tmax'][4], day_values(4))
+    pipeline.close()
+    assert not [thread for thread in threading.enumerate() if thread.name.startswith('prism-read')]
+
+
+def test_read_batch_fills_one_buffer(prism_archive):
+    """Days decode in place into one float32 buffer; days without a file stay NaN and unavailable"""
+    converter = PRISMToZarrConverter('4km')
+    files = converter.find_files(prism_archive, 'tmin', START, START + timedelta(days=15))
+    days, _ = converter.build_time_axis({'tmin': files})
+    days = days['tmin'][12:16] + [(None, None)]
+
+    data, available = converter.read_batch(days, 'tmin', read_workers=3)
+    assert data.dtype == np.float32 and data.flags['C_CONTIGUOUS'] and data.shape == (5, 621, 1405)
+    assert available.tolist() == [True, True, False, True, False]
+    for i, day in enumerate(range(12, 16)):
+        if available[i]:
+            np.testing.assert_array_equal(data[i], day_values(day))
+        else:
+            assert np.isnan(data[i]).all()
+    assert np.isnan(data[4]).all()
+
+
+def test_availability_mask_with_gaps_and_stacks(prism_archive, tmp_path):
+    """Days without a zip are flagged missing, also where a year stack covers them"""
+    catalog = PRISMFileCatalog(resolution='4km')
+    catalog.update(prism_archive)
+    stacks = PRISMYearStack(tmp_path / 'stacks')
+    stacks.consolidate_range(catalog, 'tmin', 1981, 1981)
+
+    output_zarr = tmp_path / 'tmin.zarr'
+    converter = PRISMToZarrConverter('4km')
+    converter.process_time_series(prism_archive / 'tmin', 'tmin', START,
+                                  START + timedelta(days=N_DAYS - 1), output_zarr,
+                                  batch_days=30, catalog=catalog, stacks=stacks)
+
+    gaps = [START + timedelta(days=day) for day in TMIN_GAPS]
+    ds = xr.open_zarr(output_zarr)
+    assert ds.sizes['time'] == N_DAYS
+    assert [bool(flag) for flag in ds['tmin_available'].values] == \
+        [day not in TMIN_GAPS for day in range(N_DAYS)]
+    for day in (0, TMIN_GAPS[0] + 1, N_DAYS - 1):
+        np.testing.assert_array_equal(ds['tmin'].isel(time=day).values, day_values(day))
+    for day in TMIN_GAPS:
+        assert np.isnan(ds['tmin'].isel(time=day).values).all()
+    ds.close()
+
+    analyzer = PRISMZarrAnalyzer(output_zarr)
+    assert analyzer.missing_dates('tmin') == gaps
+    assert analyzer.time_index(START + timedelta(days=N_DAYS - 1)) == N_DAYS - 1
+    for date in (START - timedelta(days=7), START + timedelta(days=N_DAYS)):
+        with pytest.raises(ValueError, match='not on the time axis'):
+            analyzer.time_index(date)
+    assert analyzer.time_index(START - timedelta(days=7), checked=False) == -7
+    assert analyzer.time_window(START - timedelta(days=7), START + timedelta(days=2)) == slice(0, 3)
+
+
+def test_plan_batches_align_to_chunks(prism_archive):
+    """Batches are whole chunks, an append first fills the partial chunk, and calendar years pad Feb 29"""
+    converter = PRISMToZarrConverter('4km', chunk_strategy='balanced')
+    assert converter.plan_batches(100, 45, 30) == [(0, 60), (60, 100)]
+    assert converter.plan_batches(100, 10, 30) == [(0, 30), (30, 60), (60, 90), (90, 100)]
+    assert converter.plan_batches(100, 45, 30, offset=50) == [(0, 10), (10, 70), (70, 100)]
+    assert converter.plan_batches(5, 45, 30, offset=50) == [(0, 5)]
+
+    converter = PRISMToZarrConverter('4km', chunk_strategy='calendar_year')
+    files = converter.find_files(prism_archive, 'tmin', START, START + timedelta(days=N_DAYS - 1))
+    days, times = converter.build_time_axis({'tmin': files})
+    assert len(times) == 2 * 366 and (times[0].year, times[-1].year) == (1981, 1982)
+    assert times[0].calendar == converter.CALENDAR_YEAR_CALENDAR
+    padding = [i for i, (_, day) in enumerate(days['tmin']) if day is None]
+    assert padding == [31 + 28, 366 + 31 + 28]
+    assert days['tmin'][335] == (files[0][0], START)
+    assert sum(path is not None for path, _ in days['tmin']) == len(files)
+
+    chunk = converter.time_shard(len(times))
+    assert chunk == 366
+    assert converter.plan_batches(len(times), 365, chunk) == [(0, 366), (366, 732)]
+    assert converter.plan_batches(len(times) - 366, 365, chunk, offset=366) == [(0, 366)]
+
+
+def test_memory_plan_counts_whole_chunks():
+    """A whole-axis chunk that no batch can cover is shortened, and write units are whole chunks"""
+    converter = PRISMToZarrConverter('800m', chunk_strategy='space_optimized', max_mem='8GB')
+    converter.fit_time_chunk(1, 7300)
+    chunk = converter.time_shard(7300)
+    assert chunk < 7300
+
+    plan = converter.memory_plan(1, chunk, chunk, 1, 4, 16)
+    assert plan['estimate'] <= converter.max_mem * converter.MEMORY_HEADROOM
+    _, unit_bytes, _ = converter.slab_bytes(1, chunk)
+    assert unit_bytes == chunk * 155 * 351 * 4
+    assert converter.batch_memory(1, 1, chunk, 1, 1, 1) > 2 * unit_bytes
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+@pytest.mark.parametrize('preallocate', [False, True])
+def test_rerun_fills_days_without_files(prism_archive, tmp_path, preallocate):
+    """Days a variable had no files for when the store was written are filled by the next run"""
+    partial = tmp_path / 'partial'
+    write_archive(partial, 'tmin', START, N_DAYS, skip=TMIN_GAPS)
+    write_archive(partial, 'tmax', START, 30)
+
+    output_zarr = tmp_path / 'temp.zarr'
+    end = START + timedelta(days=N_DAYS - 1)
+    for archive in (partial, prism_archive):
+        PRISMToZarrConverter('4km').process_time_series(archive, ['tmin', 'tmax'], START, end, output_zarr,
+                                                        aggregates=True, pyramid_levels=1,
+                                                        preallocate=preallocate, max_workers=2)
+
+    ds = xr.open_zarr(output_zarr)
+    assert ds.sizes['time'] == N_DAYS
+    assert ds['tmax_available'].values.all()
+    for day in (29, 30, N_DAYS - 1):
+        np.testing.assert_array_equal(ds['tmax'].isel(time=day).values, day_values(day))
+        np.testing.assert_array_equal(ds['tmin'].isel(time=day).values, day_values(day))
+    ds.close()
+    check_aggregates(output_zarr, ['tmin', 'tmax'])
+    check_levels(output_zarr, ['tmin', 'tmax'], 1)
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Round-trip tests for prism_validate.py
+Validation under a tight max_mem must split chunks and still catch errors
+"""
+
+import numpy as np
+import pytest
+import xarray as xr
+import zarr
+from datetime import timedelta
+from prism_to_zarr import PRISMToZarrConverter
+from prism_catalog import PRISMFileCatalog
+from prism_validate import PRISMStoreValidator
+from conftest import START, N_DAYS, TMIN_GAPS
+
+
+def test_tiles_and_windows_fit_max_mem(prism_archive, tmp_path):
+    """Whole-time chunks are tiled and windowed to max_mem, and errors are still found"""
+    catalog = PRISMFileCatalog(resolution='4km')
+    catalog.update(prism_archive)
+    output_zarr = tmp_path / 'tmin.zarr'
+    PRISMToZarrConverter('4km', chunk_strategy='space_optimized').process_time_series(
+        prism_archive / 'tmin', 'tmin', START, START + timedelta(days=N_DAYS - 1), output_zarr)
+
+    tmin = zarr.open_group(output_zarr)['tmin']
+    tmin[5, 400, 1000] += 1
+    tmin[7, 300, 700] = np.nan
+
+    validator = PRISMStoreValidator(max_mem='0.06GB')
+    ds = xr.open_zarr(output_zarr, chunks=None)
+    window, rows, cols, unit_bytes = validator.plan_units(ds, 'tmin')
+    ds.close()
+    assert window < N_DAYS and (rows, cols) != (621, 1405)
+    assert unit_bytes <= validator.max_mem
+
+    results = validator.validate(output_zarr, catalog).set_index('time_index')
+    assert len(results) == N_DAYS - len(TMIN_GAPS)
+    assert results.loc[5, 'status'] == 'value_mismatch' and results.loc[5, 'max_error'] == 1
+    assert results.loc[7, 'status'] == 'mask_mismatch' and results.loc[7, 'nodata_mismatch'] == 1
+    assert (results.drop([5, 7])['status'] == 'ok').all()
+
+    with pytest.raises(ValueError, match='max_mem is too small'):
+        PRISMStoreValidator(max_mem='0.02GB').validate(output_zarr, catalog)
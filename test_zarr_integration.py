@@ -15,6 +15,7 @@ import cartopy.feature as cfeature
 from pathlib import Path
 from datetime import datetime
 import warnings
+from prism_pyramid import read_multiscales
 warnings.filterwarnings('ignore')
 
 
@@ -31,6 +32,14 @@ class ZarrIntegrationTest:
         self.ds = xr.open_zarr(self.zarr_path)
         self.variable = list(self.ds.data_vars)[0]  # Get first variable
 
+        # Overview maps read the coarsest pyramid level still ~150 rows high
+        self.map_ds = self.ds
+        levels = [entry for entry in read_multiscales(self.zarr_path)
+                  if len(self.ds.lat) // entry['factor'] >= 150]
+        if levels[-1]['level']:
+            self.map_ds = xr.open_zarr(self.zarr_path, group=levels[-1]['path'])
+            print(f"Overview maps use pyramid level {levels[-1]['level']} ({levels[-1]['factor']}x)")
+
     def test_data_integrity(self):
         """Test basic data integrity"""
         print("\n" + "="*60)
@@ -116,7 +125,7 @@ class ZarrIntegrationTest:
             print(f"\nProcessing {date.values}...")
 
             # Get data for this date
-            data = self.ds[self.variable].sel(time=date)
+            data = self.map_ds[self.variable].sel(time=date)
             data_values = data.values
 
             # Mask nodata
@@ -134,7 +143,7 @@ class ZarrIntegrationTest:
 
             # Plot data
             im = ax.pcolormesh(
-                self.ds.lon, self.ds.lat, data_masked,
+                self.map_ds.lon, self.map_ds.lat, data_masked,
                 transform=ccrs.PlateCarree(),
                 cmap='RdBu_r',
                 vmin=np.percentile(data_masked.compressed(), 5),
@@ -6,6 +6,7 @@ Verify the created Zarr stores for PRISM temperature data
 import xarray as xr
 from pathlib import Path
 import zarr
+from prism_manifest import PRISMChunkManifest
 
 def verify_zarr_stores():
     """
@@ -19,9 +20,7 @@ def verify_zarr_stores():
 
     # List of stores to check
     stores = [
-        "tmin_1981_2000.zarr",
-        "tmax_1981_2000.zarr",
-        "tmean_1981_2000.zarr"
+        "prism_temp_1981_2000.zarr"
     ]
 
     for store_name in stores:
@@ -63,11 +62,23 @@ def verify_zarr_stores():
                 total_size = 0
                 for array_name in z.array_keys():
                     arr = z[array_name]
-                    total_size += arr.nbytes_stored
+                    total_size += arr.nbytes_stored() if callable(arr.nbytes_stored) else arr.nbytes_stored
                 print(f"\nStore size: {total_size / (1024**2):.2f} MB")
 
                 ds.close()
 
+                # Integrity of every chunk, from raw bytes only
+                manifest = PRISMChunkManifest(store_path)
+                if manifest.manifest_path.exists():
+                    problems = manifest.verify()
+                    if len(problems):
+                        print(f"Integrity: FAILED ({len(problems)} problems)")
+                        print(problems.head(20).to_string(index=False))
+                    else:
+                        print("Integrity: OK (every chunk matches the manifest)")
+                else:
+                    print(f"Integrity: no manifest; run python3 prism_manifest.py build {store_path}")
+
             except Exception as e:
                 print(f"Error reading store: {e}")
         else:
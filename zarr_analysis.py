@@ -4,6 +4,7 @@ PRISM Zarr Analysis Utilities
 Tools for efficient analysis of PRISM climate data stored in Zarr format
 """
 
+import calendar
 import numpy as np
 import xarray as xr
 import pandas as pd
@@ -12,38 +13,274 @@ from typing import List, Dict, Tuple, Optional, Union
 from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
 import logging
+from prism_storage import Location, as_location, store_exists, store_name, zarr_store
+from prism_aggregates import PRISMAggregator, aggregate_path
+from prism_pyramid import read_multiscales
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
+def open_store(location: Location, storage_options: Optional[Dict] = None,
+               **kwargs) -> xr.Dataset:
+    """
+    Open a Zarr store, reading its consolidated metadata first
+
+    With consolidated metadata one request describes every array, which
+    matters on object stores where each metadata document is a round trip.
+    Stores without it (or with it out of date and removed) are opened by
+    listing the arrays instead.
+
+    Parameters:
+    -----------
+    location : Location
+        Store path or fsspec URL
+    storage_options : Optional[Dict]
+        fsspec options for URLs
+    **kwargs
+        Other xr.open_zarr parameters (group, chunks, ...)
+
+    Returns:
+    --------
+    xr.Dataset: Lazily loaded dataset
+    """
+    store = zarr_store(location, storage_options, read_only=True)
+    try:
+        return xr.open_zarr(store, consolidated=True, **kwargs)
+    except (KeyError, ValueError) as e:
+        logger.warning(f"No consolidated metadata in {location} ({e}); listing arrays instead")
+        return xr.open_zarr(store, consolidated=False, **kwargs)
+
+
 class PRISMZarrAnalyzer:
     """
     Analysis utilities for PRISM data in Zarr format
     """
 
-    def __init__(self, zarr_path: Union[str, Path]):
+    def __init__(self, zarr_path: Location, hot_tier: bool = True,
+                 storage_options: Optional[Dict] = None):
         """
         Initialize analyzer with a Zarr store
 
         Parameters:
         -----------
-        zarr_path : Union[str, Path]
-            Path to the Zarr store
+        zarr_path : Location
+            Path or fsspec URL of the Zarr store (gridded, or a land-cell
+            store built by prism_land_store.py), or path of a .json
+            reference file built by prism_references.py over extracted BIL
+            files
+        hot_tier : bool
+            Memory-map a land-cell store's .npy hot tier when it exists
+        storage_options : Optional[Dict]
+            fsspec options for stores given as URLs
         """
-        self.zarr_path = Path(zarr_path)
-        if not self.zarr_path.exists():
+        self.zarr_path = as_location(zarr_path)
+        self.storage_options = storage_options
+        self.references = Path(store_name(self.zarr_path)).suffix == '.json'
+        if not store_exists(self.zarr_path, storage_options):
             raise FileNotFoundError(f"Zarr store not found: {self.zarr_path}")
 
-        # Open the dataset
-        self.ds = xr.open_zarr(self.zarr_path)
+        # Open the dataset; reference files read the BIL archive in place
+        if self.references:
+            self.ds = xr.open_zarr('reference://', storage_options={'fo': str(self.zarr_path)})
+        else:
+            self.ds = open_store(self.zarr_path, storage_options)
         self.variables = list(self.ds.data_vars)
         logger.info(f"Loaded Zarr store with variables: {self.variables}")
 
+        # Stores written with a complete daily axis index dates arithmetically
+        times = self.ds.indexes['time']
+        self.time_start = datetime(times[0].year, times[0].month, times[0].day)
+        self.calendar_years = isinstance(times, xr.CFTimeIndex)
+        if self.calendar_years:
+            expected = (times[-1].year - times[0].year + 1) * 366
+        else:
+            expected = (times[-1] - times[0]).days + 1
+        self.regular_time = len(times) == expected
+
+        # Land-cell stores answer point queries without touching the grid
+        self.land_cells = self.ds.attrs.get('layout') == 'land_cells'
+        self.hot = {}
+        if self.land_cells:
+            self.cell_index = self.ds['cell_index'].values
+            self.grid_lat = self.ds['grid_lat'].values
+            self.grid_lon = self.ds['grid_lon'].values
+            self.cells = open_store(self.zarr_path, storage_options, chunks=None)
+            if hot_tier:
+                for variable, path in self.ds.attrs.get('hot_tier', {}).items():
+                    if Path(path).exists():
+                        self.hot[variable] = np.load(path, mmap_mode='r')
+            logger.info(f"Land-cell layout: {self.ds.sizes['cell']} cells, "
+                        f"hot tier for {sorted(self.hot) or 'no variables'}")
+
+        # Monthly and annual aggregates written next to the store, if they
+        # still cover its last day
+        self.aggregates = {}
+        for frequency in PRISMAggregator.FREQUENCIES:
+            path = aggregate_path(self.zarr_path, frequency)
+            if self.references or not store_exists(path, storage_options):
+                continue
+            aggregate = open_store(path, storage_options)
+            last = aggregate.indexes['time'][-1]
+            if (last.year, last.month if frequency == 'monthly' else 1) >= \
+                    (times[-1].year, times[-1].month if frequency == 'monthly' else 1):
+                self.aggregates[frequency] = aggregate
+            else:
+                logger.warning(f"{path} ends before {self.zarr_path}; not using it")
+                aggregate.close()
+        if self.aggregates:
+            logger.info(f"Aggregates available: {', '.join(self.aggregates)}")
+
+        # Spatially coarsened levels listed in the store's multiscales metadata
+        self.levels = {0: {'path': '.', 'level': 0, 'factor': 1}}
+        self.level_ds = {0: self.ds}
+        if not self.references and not self.land_cells:
+            self.levels = {entry['level']: entry
+                           for entry in read_multiscales(self.zarr_path, storage_options)}
+        if len(self.levels) > 1:
+            factors = [f"{entry['factor']}x" for entry in self.levels.values()]
+            logger.info(f"Pyramid levels: {', '.join(factors)}")
+
     def __del__(self):
         """Clean up by closing the dataset"""
         if hasattr(self, 'ds'):
             self.ds.close()
+        if hasattr(self, 'cells'):
+            self.cells.close()
+        for aggregate in getattr(self, 'aggregates', {}).values():
+            aggregate.close()
+        for level, ds in getattr(self, 'level_ds', {}).items():
+            if level:
+                ds.close()
+
+    def time_slice(self, start_date=None, end_date=None) -> slice:
+        """
+        Time slice usable on the store's calendar
+
+        Stores written with the 'calendar_year' strategy use an all_leap
+        calendar, which cannot be compared with datetime objects; their
+        bounds are passed as ISO strings instead.
+
+        Parameters:
+        -----------
+        start_date : Optional[datetime or str]
+            Start of the slice
+        end_date : Optional[datetime or str]
+            End of the slice (inclusive)
+
+        Returns:
+        --------
+        slice: Slice for .sel(time=...)
+        """
+        if not isinstance(self.ds.indexes['time'], xr.CFTimeIndex):
+            return slice(start_date, end_date)
+
+        def label(date):
+            return date.isoformat() if isinstance(date, datetime) else date
+
+        return slice(label(start_date), label(end_date))
+
+    def time_index(self, date: Union[datetime, str], checked: bool = True) -> int:
+        """
+        Index of a date on the time axis
+
+        On a complete daily axis this is arithmetic: days since the first
+        step, or 366 steps per year on the all_leap axis of calendar-year
+        stores. Older stores with gaps fall back to an index lookup.
+
+        Parameters:
+        -----------
+        date : Union[datetime, str]
+            Date (or ISO date string)
+        checked : bool
+            Raise for dates outside the store; unchecked indices of a
+            regular axis may be negative or past its end, and must not be
+            passed to .isel
+
+        Returns:
+        --------
+        int: Time index
+        """
+        date = pd.Timestamp(date).to_pydatetime()
+        times = self.ds.indexes['time']
+        if not self.regular_time:
+            try:
+                return int(times.get_loc(date.strftime('%Y-%m-%d')))
+            except KeyError:
+                index = -1
+        elif self.calendar_years:
+            # Day of year on a leap-year calendar, February 29 included
+            day_of_year = datetime(2000, date.month, date.day).timetuple().tm_yday
+            index = (date.year - self.time_start.year) * 366 + day_of_year - 1
+        else:
+            index = (date - self.time_start).days
+
+        if checked and not 0 <= index < len(times):
+            raise ValueError(f"{date:%Y-%m-%d} is not on the time axis of {self.zarr_path} "
+                             f"({times[0].strftime('%Y-%m-%d')} to {times[-1].strftime('%Y-%m-%d')})")
+        return index
+
+    def time_window(self, start_date=None, end_date=None) -> slice:
+        """
+        Positional time slice for .isel(time=...)
+
+        Parameters:
+        -----------
+        start_date : Optional[datetime or str]
+            Start of the window
+        end_date : Optional[datetime or str]
+            End of the window (inclusive)
+
+        Returns:
+        --------
+        slice: Index slice clipped to the axis
+        """
+        n_times = self.ds.sizes['time']
+        if not self.regular_time:
+            bounds = self.time_slice(start_date, end_date)
+            return self.ds.indexes['time'].slice_indexer(bounds.start, bounds.stop)
+
+        start = 0 if start_date is None else min(max(self.time_index(start_date, checked=False), 0), n_times)
+        stop = n_times if end_date is None else min(max(self.time_index(end_date, checked=False) + 1, 0), n_times)
+        return slice(start, max(start, stop))
+
+    def missing_dates(self, variable: Optional[str] = None) -> List[datetime]:
+        """
+        Dates without data for a variable
+
+        Read from the per-day '<variable>_available' mask, without touching
+        the data. Calendar padding days (February 29 of non-leap years) are
+        not reported. For older stores without a mask, the gaps in the
+        time axis are returned.
+
+        Parameters:
+        -----------
+        variable : Optional[str]
+            Variable name (uses first available if None)
+
+        Returns:
+        --------
+        List[datetime]: Missing dates
+        """
+        if variable is None:
+            variable = self.variables[0]
+
+        times = self.ds.indexes['time']
+        mask_name = f"{variable}_available"
+        if mask_name not in self.ds.coords:
+            present = {datetime(t.year, t.month, t.day) for t in times}
+            last = datetime(times[-1].year, times[-1].month, times[-1].day)
+            n_days = (last - self.time_start).days + 1
+            return [day for day in (self.time_start + timedelta(days=i) for i in range(n_days))
+                    if day not in present]
+
+        missing = []
+        for i in np.flatnonzero(~self.ds[mask_name].values):
+            t = times[i]
+            if self.calendar_years and t.month == 2 and t.day == 29 and not calendar.isleap(t.year):
+                continue
+            missing.append(datetime(t.year, t.month, t.day))
+        return missing
 
     def extract_point_time_series(self, lat: float, lon: float,
                                  variable: Optional[str] = None,
@@ -74,13 +311,16 @@ class PRISMZarrAnalyzer:
         elif variable not in self.variables:
             raise ValueError(f"Variable {variable} not found. Available: {self.variables}")
 
+        if self.land_cells:
+            return self.extract_cell_time_series(lat, lon, variable, start_date, end_date)
+
         # Select the nearest point
         point_data = self.ds[variable].sel(lat=lat, lon=lon, method='nearest')
+        point_data = point_data.drop_vars([name for name in point_data.coords if name.endswith('_available')])
 
         # Filter by date if specified
         if start_date or end_date:
-            time_slice = slice(start_date, end_date)
-            point_data = point_data.sel(time=time_slice)
+            point_data = point_data.isel(time=self.time_window(start_date, end_date))
 
         # Convert to DataFrame
         df = point_data.to_dataframe(name=variable)
@@ -97,14 +337,155 @@ class PRISMZarrAnalyzer:
         logger.info(f"Extracted {len(df)} time points for location ({actual_lat:.4f}, {actual_lon:.4f})")
         return df
 
+    def extract_cell_time_series(self, lat: float, lon: float, variable: str,
+                                 start_date: Optional[datetime] = None,
+                                 end_date: Optional[datetime] = None) -> pd.DataFrame:
+        """
+        Extract a point time series from a land-cell store
+
+        The nearest grid point is looked up in the in-memory cell index,
+        then one row is read from the hot tier, or one chunk column from
+        the store. Points off land get a NaN series.
+
+        Parameters:
+        -----------
+        lat : float
+            Latitude
+        lon : float
+            Longitude
+        variable : str
+            Variable name
+        start_date : Optional[datetime]
+            Start date for extraction
+        end_date : Optional[datetime]
+            End date for extraction
+
+        Returns:
+        --------
+        pd.DataFrame: Time series data
+        """
+        row = int(np.abs(self.grid_lat - lat).argmin())
+        col = int(np.abs(self.grid_lon - lon).argmin())
+        cell = int(self.cell_index[row, col])
+
+        times = self.ds.indexes['time']
+        window = self.time_window(start_date, end_date)
+
+        # Ocean points are all NaN, as in the gridded store
+        if cell < 0:
+            values = np.full(len(times[window]), np.nan, dtype=self.cells[variable].dtype)
+        elif variable in self.hot:
+            values = np.array(self.hot[variable][cell, window])
+        else:
+            values = self.cells[variable].isel(cell=cell, time=window).values
+
+        actual_lat = float(self.grid_lat[row])
+        actual_lon = float(self.grid_lon[col])
+        df = pd.DataFrame({
+            'time': times[window],
+            'lat': actual_lat,
+            'lon': actual_lon,
+            variable: values
+        })
+        df['actual_lat'] = actual_lat
+        df['actual_lon'] = actual_lon
+        df['requested_lat'] = lat
+        df['requested_lon'] = lon
+
+        logger.info(f"Extracted {len(df)} time points for cell {cell} ({actual_lat:.4f}, {actual_lon:.4f})")
+        return df
+
+    def require_grid(self, operation: str) -> None:
+        """
+        Reject operations that need the (lat, lon) grid on a land-cell store
+
+        Parameters:
+        -----------
+        operation : str
+            Name of the operation, for the error message
+        """
+        if self.land_cells:
+            raise ValueError(f"{operation} needs a gridded store; {self.zarr_path} is a "
+                             f"land-cell store (only point time series are supported)")
+
+    def open_level(self, level: int = 0) -> xr.Dataset:
+        """
+        Dataset of one pyramid level (0 is the store itself)
+
+        Parameters:
+        -----------
+        level : int
+            Pyramid level; level k is coarsened 2**k times
+
+        Returns:
+        --------
+        xr.Dataset: Level dataset with its own lat/lon coordinates
+        """
+        if level not in self.levels:
+            raise ValueError(f"{self.zarr_path} has no pyramid level {level}; "
+                             f"available: {sorted(self.levels)}")
+        if level not in self.level_ds:
+            self.level_ds[level] = open_store(self.zarr_path, self.storage_options,
+                                              group=self.levels[level]['path'])
+        return self.level_ds[level]
+
+    def select_level(self, min_shape: Tuple[int, int] = (150, 350)) -> int:
+        """
+        Coarsest pyramid level whose grid still has at least min_shape cells
+
+        Parameters:
+        -----------
+        min_shape : Tuple[int, int]
+            Minimum (lat, lon) size needed, e.g. the pixels of a map
+
+        Returns:
+        --------
+        int: Level number (0 if no coarser level is large enough)
+        """
+        n_lat, n_lon = self.ds.sizes['lat'], self.ds.sizes['lon']
+        good = [level for level, entry in self.levels.items()
+                if -(-n_lat // entry['factor']) >= min_shape[0] and -(-n_lon // entry['factor']) >= min_shape[1]]
+        return max(good, default=0)
+
+    def get_map(self, date: Union[datetime, str], variable: Optional[str] = None,
+                min_shape: Tuple[int, int] = (150, 350)) -> xr.DataArray:
+        """
+        Grid of one day from the smallest pyramid level good enough for a map
+
+        Parameters:
+        -----------
+        date : Union[datetime, str]
+            Day to map
+        variable : Optional[str]
+            Variable name
+        min_shape : Tuple[int, int]
+            Minimum (lat, lon) size of the map
+
+        Returns:
+        --------
+        xr.DataArray: (lat, lon) grid of the selected level
+        """
+        self.require_grid('get_map')
+        if variable is None:
+            variable = self.variables[0]
+        level = self.select_level(min_shape)
+        data = self.open_level(level)[variable].isel(time=self.time_index(date)).load()
+        logger.info(f"Read {variable} map at level {level} ({data.shape[0]} x {data.shape[1]})")
+        return data
+
     def extract_region_average(self, lat_bounds: Tuple[float, float],
                               lon_bounds: Tuple[float, float],
                               variable: Optional[str] = None,
                               start_date: Optional[datetime] = None,
-                              end_date: Optional[datetime] = None) -> pd.DataFrame:
+                              end_date: Optional[datetime] = None,
+                              level: int = 0) -> pd.DataFrame:
         """
         Extract spatial average for a region over time
 
+        Coarser pyramid levels read 4x less data per level. Their cells are
+        block means, so averages over them weight coastal blocks like full
+        ones and differ slightly from the full-resolution result.
+
         Parameters:
         -----------
         lat_bounds : Tuple[float, float]
@@ -117,23 +498,26 @@ class PRISMZarrAnalyzer:
             Start date
         end_date : Optional[datetime]
             End date
+        level : int
+            Pyramid level to average (0 is full resolution)
 
         Returns:
         --------
         pd.DataFrame: Regional average time series
         """
+        self.require_grid('extract_region_average')
         if variable is None:
             variable = self.variables[0]
 
         # Select region
-        region_data = self.ds[variable].sel(
+        region_data = self.open_level(level)[variable].sel(
             lat=slice(lat_bounds[1], lat_bounds[0]),  # Note: lat is typically in descending order
             lon=slice(lon_bounds[0], lon_bounds[1])
         )
 
         # Filter by date
         if start_date or end_date:
-            time_slice = slice(start_date, end_date)
+            time_slice = self.time_slice(start_date, end_date)
             region_data = region_data.sel(time=time_slice)
 
         # Calculate mean over space
@@ -153,11 +537,50 @@ class PRISMZarrAnalyzer:
         logger.info(f"Calculated regional average for {len(df)} time points")
         return df
 
+    def aggregate_series(self, variable: Optional[str] = None, frequency: str = 'monthly',
+                         statistic: str = 'mean', start_date=None, end_date=None) -> xr.DataArray:
+        """
+        Monthly or annual statistics, read from the aggregate stores when
+        they exist and resampled from the daily data otherwise
+
+        Parameters:
+        -----------
+        variable : Optional[str]
+            Variable name
+        frequency : str
+            'monthly' or 'annual'
+        statistic : str
+            'mean', 'min', 'max' or 'sum'
+        start_date : Optional[Union[str, datetime]]
+            First period to include
+        end_date : Optional[Union[str, datetime]]
+            Last period to include
+
+        Returns:
+        --------
+        xr.DataArray: (time, lat, lon) statistics labelled by period start
+        """
+        if variable is None:
+            variable = self.variables[0]
+        if frequency not in PRISMAggregator.FREQUENCIES:
+            raise ValueError(f"Invalid frequency: {frequency}. Use 'monthly' or 'annual'")
+
+        aggregate = self.aggregates.get(frequency)
+        name = f"{variable}_{statistic}"
+        if aggregate is not None and name in aggregate:
+            return aggregate[name].sel(time=slice(start_date, end_date))
+
+        data = self.ds[variable].sel(time=self.time_slice(start_date, end_date))
+        return getattr(data.resample(time='MS' if frequency == 'monthly' else 'YS'), statistic)()
+
     def compute_climatology(self, variable: Optional[str] = None,
                           groupby: str = 'month') -> xr.Dataset:
         """
         Compute climatology (long-term averages)
 
+        With monthly aggregates, monthly and seasonal climatologies are
+        averages of the monthly means weighted by their days with data.
+
         Parameters:
         -----------
         variable : Optional[str]
@@ -172,6 +595,16 @@ class PRISMZarrAnalyzer:
         if variable is None:
             variable = self.variables[0]
 
+        monthly = self.aggregates.get('monthly')
+        if groupby in ('month', 'season') and monthly is not None and f"{variable}_mean" in monthly:
+            mean = monthly[f"{variable}_mean"]
+            days = monthly[f"{variable}_days"].where(mean.notnull())
+            climatology = ((mean * days).groupby(f"time.{groupby}").sum(min_count=1)
+                           / days.groupby(f"time.{groupby}").sum(min_count=1))
+            climatology.attrs = dict(mean.attrs)
+            logger.info(f"Computed {groupby} climatology for {variable} from monthly aggregates")
+            return climatology.rename(variable)
+
         data = self.ds[variable]
 
         if groupby == 'month':
@@ -209,7 +642,7 @@ class PRISMZarrAnalyzer:
 
         # Calculate reference climatology
         if reference_period:
-            ref_data = data.sel(time=slice(reference_period[0], reference_period[1]))
+            ref_data = data.sel(time=self.time_slice(reference_period[0], reference_period[1]))
             climatology = ref_data.groupby('time.month').mean()
         else:
             climatology = data.groupby('time.month').mean()
@@ -244,6 +677,9 @@ class PRISMZarrAnalyzer:
         end_date : Optional[datetime]
             End date
         """
+        if lat_bounds or lon_bounds:
+            self.require_grid('export_to_netcdf with lat/lon bounds')
+
         # Select data subset
         subset = self.ds
 
@@ -257,7 +693,7 @@ class PRISMZarrAnalyzer:
             subset = subset.sel(lon=slice(lon_bounds[0], lon_bounds[1]))
 
         if start_date or end_date:
-            subset = subset.sel(time=slice(start_date, end_date))
+            subset = subset.sel(time=self.time_slice(start_date, end_date))
 
         # Export to NetCDF
         subset.to_netcdf(output_path)
@@ -284,6 +720,7 @@ class PRISMZarrAnalyzer:
             logger.error("rioxarray is required for GeoTIFF export. Install with: uv pip install rioxarray")
             return
 
+        self.require_grid('export_to_geotiff')
         if variable is None:
             variable = self.variables[0]
 
@@ -300,7 +737,7 @@ class PRISMZarrAnalyzer:
         data = data.rio.write_crs("EPSG:4269")  # NAD83
 
         # Export
-        time_str = pd.Timestamp(data.time.values).strftime('%Y%m%d')
+        time_str = data.time.dt.strftime('%Y%m%d').item()
         output_path = output_dir / f"{variable}_{time_str}.tif"
         data.rio.to_raster(output_path)
 
@@ -371,6 +808,7 @@ class PRISMZarrAnalyzer:
         --------
         Dict: Statistical summary
         """
+        self.require_grid('get_statistics')
         if variable is None:
             variable = self.variables[0]
 